@@ -0,0 +1,606 @@
+"""JSON HTTP API over the shared DataService, for scripts and mobile clients.
+
+Runs on the standard library's asyncio. Set PRODUCTIVITY_HUB_API_PORT to
+serve it from inside the Streamlit server process, sharing the working
+sets the UI uses, or run it as a process of its own:
+
+    python api.py --port 8600 --backend sqlite --db productivity_hub.db
+
+With SQLite storage it also runs alongside the UI, and as several
+workers: see cluster.py.
+
+Every endpoint but signup and login needs the "Authorization: Bearer
+<token>" header from POST /api/login. Tokens are signed rather than
+stored, so every process started with the same PRODUCTIVITY_HUB_API_SECRET
+accepts them; without it each process signs with a random secret of its
+own.
+
+    POST   /api/signup                         {username, password, email, full_name}
+    POST   /api/login                          {username, password} -> {token}
+    GET    /api/tasks                          ?status=&priority=&category=&sort=&offset=&limit=
+    POST   /api/tasks                          {text, priority, category, due_date, recurrence}
+    GET    /api/tasks/<id>
+    DELETE /api/tasks/<id>
+    POST   /api/tasks/<id>/toggle
+    POST   /api/tasks/<id>/occurrences/<day>/toggle
+    GET    /api/notes                          ?q=&offset=&limit=
+    POST   /api/notes                          {title, content, category}
+    PUT    /api/notes/<id>                     {title, content, category}
+    DELETE /api/notes/<id>
+    GET    /api/habits                         ?offset=&limit=
+    POST   /api/habits                         {name, target_frequency}
+    POST   /api/habits/<id>/complete           {date}
+    GET    /api/goals                          ?offset=&limit=
+    POST   /api/goals                          {title, description, target_date, category}
+    PUT    /api/goals/<id>/progress            {progress}
+    GET    /api/stats
+    POST   /api/batch                          {operations: [{op, ...fields}, ...]}
+
+A batch runs its operations in order under the user's lock; op is one of
+the names in MUTATIONS and takes the same fields as the single endpoint,
+plus id where the endpoint has one in its path. Every operation's fields
+are checked first: if any is invalid the batch answers 400 with an error
+per bad operation and changes nothing. GET responses carry an
+ETag that changes whenever any of the user's data changes; send it back
+in If-None-Match to get 304 Not Modified.
+"""
+import argparse
+import asyncio
+import base64
+import hashlib
+import hmac
+import json
+import os
+import re
+import secrets
+import threading
+import time
+import traceback
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date
+from http import HTTPStatus
+from itertools import islice
+from urllib.parse import parse_qs, unquote, urlsplit
+
+import invalidation
+import storage
+from recurrence import Rule
+from service import API_PORT_ENV, DataService
+from task_index import SORT_ORDERS
+
+DEFAULT_PORT = 8600
+
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 500
+MAX_BATCH = 1000
+
+# Request size limits, in bytes
+MAX_HEADER = 16 * 1024
+MAX_BODY = 1024 * 1024
+
+# Seconds an idle keep-alive connection stays open
+KEEPALIVE_TIMEOUT = 30
+
+# Threads running request handlers off the event loop. A handler waiting
+# on a user's lock, held through a whole page render in the UI, only ties
+# up its own thread
+HANDLER_THREADS = 32
+
+# Seconds a login token stays valid
+TOKEN_TTL = 24 * 3600
+
+# Key that login tokens are signed with; processes sharing it accept each other's tokens
+SECRET_ENV = 'PRODUCTIVITY_HUB_API_SECRET'
+
+PRIORITIES = ('Low', 'Medium', 'High')
+FREQUENCIES = ('daily', 'weekly', 'monthly')
+
+# Versions are only unique within a process, so ETags also name the process
+PROCESS_TAG = secrets.token_hex(4)
+
+
+class ApiError(Exception):
+    """Turned into an error response with the given HTTP status"""
+
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+
+# Field parsing
+def _text(fields, name, default=None):
+    value = fields.get(name, default)
+    if not isinstance(value, str) or not value.strip():
+        raise ApiError(400, f"'{name}' must be non-empty text")
+    return value.strip()
+
+
+def _optional_text(fields, name, default=None):
+    value = fields.get(name)
+    if value is None:
+        return default
+    if not isinstance(value, str):
+        raise ApiError(400, f"'{name}' must be text")
+    return value
+
+
+def _id(fields):
+    value = fields.get('id')
+    if not isinstance(value, str) or not value:
+        raise ApiError(400, "'id' must be non-empty text")
+    return value
+
+
+def _optional_date(fields, name):
+    value = fields.get(name)
+    if value is None or value == '':
+        return None
+    try:
+        return date.fromisoformat(value)
+    except (TypeError, ValueError):
+        raise ApiError(400, f"'{name}' must be a YYYY-MM-DD date") from None
+
+
+def _date(fields, name):
+    value = _optional_date(fields, name)
+    if value is None:
+        raise ApiError(400, f"'{name}' is required")
+    return value
+
+
+def _int_param(query, name, default, maximum=None):
+    try:
+        value = int(query.get(name, default))
+    except ValueError:
+        raise ApiError(400, f"'{name}' must be a whole number") from None
+    if value < 0:
+        raise ApiError(400, f"'{name}' must not be negative")
+    return min(value, maximum) if maximum is not None else value
+
+
+def _choice(fields, name, choices, default):
+    value = fields.get(name, default)
+    if not isinstance(value, str) or value not in choices:
+        raise ApiError(400, f"'{name}' must be one of {', '.join(choices)}")
+    return value
+
+
+def _found(record, kind):
+    if record is None:
+        raise ApiError(404, f"No such {kind}")
+    return record
+
+
+def _task_json(task):
+    data = task.to_dict()
+    if task.recurrence is not None:
+        next_due = task.next_due
+        data['next_due'] = next_due.isoformat() if next_due else None
+    return data
+
+
+# Mutations: op name -> (check, apply). check(fields) validates a request's
+# fields without touching user data and returns apply's arguments, so a
+# batch is checked in full before any of it runs; apply(data, *args)
+# returns (status, payload). Shared by the single endpoints and /api/batch.
+def _check_add_task(fields):
+    due_date = _optional_date(fields, 'due_date')
+    recurrence = _optional_text(fields, 'recurrence') or None
+    if recurrence:
+        try:
+            Rule.parse(recurrence, due_date or date.today())
+        except ValueError as exc:
+            raise ApiError(400, f"'recurrence': {exc}") from None
+    return (_text(fields, 'text'), _choice(fields, 'priority', PRIORITIES, 'Medium'),
+            _optional_text(fields, 'category') or 'General', due_date, recurrence)
+
+
+def add_task(data, text, priority, category, due_date, recurrence):
+    return 201, _task_json(data.add_task(text, priority, category, due_date, recurrence))
+
+
+def toggle_task(data, task_id):
+    return 200, _task_json(_found(data.toggle_task(task_id), "task"))
+
+
+def toggle_occurrence(data, task_id, day):
+    return 200, _task_json(_found(data.toggle_occurrence(task_id, day), "occurrence"))
+
+
+def delete_task(data, task_id):
+    _found(data.delete_task(task_id), "task")
+    return 200, {'deleted': task_id}
+
+
+def _check_note(fields):
+    return _text(fields, 'title'), _optional_text(fields, 'content', ''), _optional_text(fields, 'category') or 'General'
+
+
+def add_note(data, title, content, category):
+    return 201, data.add_note(title, content, category).to_dict()
+
+
+def update_note(data, note_id, title, content, category):
+    return 200, _found(data.update_note(note_id, title, content, category), "note").to_dict()
+
+
+def delete_note(data, note_id):
+    _found(data.delete_note(note_id), "note")
+    return 200, {'deleted': note_id}
+
+
+def add_habit(data, name, frequency):
+    return 201, data.add_habit(name, frequency).to_dict()
+
+
+def complete_habit(data, habit_id, day):
+    return 200, _found(data.mark_habit_complete(habit_id, day), "habit").to_dict()
+
+
+def _check_add_goal(fields):
+    return (_text(fields, 'title'), _optional_text(fields, 'description', ''), _date(fields, 'target_date'),
+            _optional_text(fields, 'category') or 'General')
+
+
+def add_goal(data, title, description, target_date, category):
+    return 201, data.add_goal(title, description, target_date, category).to_dict()
+
+
+def _check_progress(fields):
+    progress = fields.get('progress')
+    if not isinstance(progress, int) or isinstance(progress, bool) or not 0 <= progress <= 100:
+        raise ApiError(400, "'progress' must be a whole number from 0 to 100")
+    return _id(fields), progress
+
+
+def update_goal_progress(data, goal_id, progress):
+    return 200, _found(data.update_goal_progress(goal_id, progress), "goal").to_dict()
+
+
+MUTATIONS = {
+    'add_task': (_check_add_task, add_task),
+    'toggle_task': (lambda fields: (_id(fields),), toggle_task),
+    'toggle_occurrence': (lambda fields: (_id(fields), _date(fields, 'day')), toggle_occurrence),
+    'delete_task': (lambda fields: (_id(fields),), delete_task),
+    'add_note': (_check_note, add_note),
+    'update_note': (lambda fields: (_id(fields), *_check_note(fields)), update_note),
+    'delete_note': (lambda fields: (_id(fields),), delete_note),
+    'add_habit': (lambda fields: (_text(fields, 'name'), _choice(fields, 'target_frequency', FREQUENCIES, 'daily')),
+                  add_habit),
+    'complete_habit': (lambda fields: (_id(fields), _optional_date(fields, 'date')), complete_habit),
+    'add_goal': (_check_add_goal, add_goal),
+    'update_goal_progress': (_check_progress, update_goal_progress)
+}
+
+
+# Reads: (user data, query) -> payload, called with the user's lock held
+def list_tasks(data, query):
+    sort = query.get('sort', "Created Date")
+    if sort not in SORT_ORDERS:
+        raise ApiError(400, f"'sort' must be one of {', '.join(SORT_ORDERS)}")
+    offset = _int_param(query, 'offset', 0)
+    limit = _int_param(query, 'limit', DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE)
+    index = data.task_index
+    matching = index.filter(query.get('status', "All"), query.get('priority', "All"), query.get('category', "All"))
+    total = len(data.tasks) if matching is None else len(matching)
+    items = [_task_json(data.tasks.get(task_id)) for task_id in index.page(sort, offset, limit, matching)]
+    return _page(items, total, offset, limit)
+
+
+def list_notes(data, query):
+    offset = _int_param(query, 'offset', 0)
+    limit = _int_param(query, 'limit', DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE)
+    if query.get('q'):
+        note_ids = data.note_index.search(query['q'])
+        notes = [data.notes.get(note_id) for note_id in note_ids[offset:offset + limit]]
+        total = len(note_ids)
+    else:
+        # Newest first, as on the notes page
+        notes = list(islice(reversed(data.notes), offset, offset + limit))
+        total = len(data.notes)
+    return _page([note.to_dict() for note in notes], total, offset, limit)
+
+
+def _record_page(records, query):
+    offset = _int_param(query, 'offset', 0)
+    limit = _int_param(query, 'limit', DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE)
+    items = [record.to_dict() for record in islice(records, offset, offset + limit)]
+    return _page(items, len(records), offset, limit)
+
+
+def _page(items, total, offset, limit):
+    next_offset = offset + len(items)
+    return {'items': items, 'total': total, 'offset': offset, 'limit': limit,
+            'next_offset': next_offset if next_offset < total else None}
+
+
+class Request:
+    __slots__ = ('method', 'path', 'query', 'headers', 'body')
+
+    def __init__(self, method, target, headers, body):
+        url = urlsplit(target)
+        self.method = method
+        self.path = unquote(url.path)
+        self.query = {name: values[-1] for name, values in parse_qs(url.query).items()}
+        self.headers = headers
+        self.body = body
+
+    def json(self):
+        if not self.body:
+            return {}
+        try:
+            fields = json.loads(self.body)
+        except ValueError:
+            raise ApiError(400, "Body must be JSON") from None
+        if not isinstance(fields, dict):
+            raise ApiError(400, "Body must be a JSON object")
+        return fields
+
+
+class Api:
+    """Routes requests to the shared DataService; one instance serves every connection"""
+
+    def __init__(self, service, secret=None):
+        self.service = service
+        secret = secret or os.environ.get(SECRET_ENV)
+        self._secret = secret.encode('utf-8') if secret else secrets.token_bytes(32)
+        self._executor = ThreadPoolExecutor(HANDLER_THREADS, thread_name_prefix='api')
+        read = self._read
+        mutate = self._mutate
+        self._routes = [
+            ('POST', r'/api/signup', self._signup, False),
+            ('POST', r'/api/login', self._login, False),
+            ('GET', r'/api/tasks', read(list_tasks), True),
+            ('POST', r'/api/tasks', mutate('add_task'), True),
+            ('GET', r'/api/tasks/([^/]+)', read(lambda data, query, task_id: _task_json(
+                _found(data.tasks.get(task_id), "task"))), True),
+            ('DELETE', r'/api/tasks/([^/]+)', mutate('delete_task', 'id'), True),
+            ('POST', r'/api/tasks/([^/]+)/toggle', mutate('toggle_task', 'id'), True),
+            ('POST', r'/api/tasks/([^/]+)/occurrences/([^/]+)/toggle', mutate('toggle_occurrence', 'id', 'day'),
+             True),
+            ('GET', r'/api/notes', read(list_notes), True),
+            ('POST', r'/api/notes', mutate('add_note'), True),
+            ('PUT', r'/api/notes/([^/]+)', mutate('update_note', 'id'), True),
+            ('DELETE', r'/api/notes/([^/]+)', mutate('delete_note', 'id'), True),
+            ('GET', r'/api/habits', read(lambda data, query: _record_page(data.habits, query)), True),
+            ('POST', r'/api/habits', mutate('add_habit'), True),
+            ('POST', r'/api/habits/([^/]+)/complete', mutate('complete_habit', 'id'), True),
+            ('GET', r'/api/goals', read(lambda data, query: _record_page(data.goals, query)), True),
+            ('POST', r'/api/goals', mutate('add_goal'), True),
+            ('PUT', r'/api/goals/([^/]+)/progress', mutate('update_goal_progress', 'id'), True),
+            ('GET', r'/api/stats', read(lambda data, query: data.stats.snapshot()), True),
+            ('POST', r'/api/batch', self._batch, True)
+        ]
+        self._routes = [(method, re.compile(pattern), handler, authenticated)
+                        for method, pattern, handler, authenticated in self._routes]
+
+    # Handlers return (status, payload, extra headers)
+    def _read(self, reader):
+        def handler(request, data, *params):
+            etag = f'"{PROCESS_TAG}-{data.version}"'
+            if request.headers.get('if-none-match') == etag:
+                return 304, None, {'ETag': etag}
+            with data.lock:
+                # Read the version again under the lock so it matches the payload
+                etag = f'"{PROCESS_TAG}-{data.version}"'
+                payload = reader(data, request.query, *params)
+            return 200, payload, {'ETag': etag}
+        return handler
+
+    def _mutate(self, op, *param_names):
+        check, apply = MUTATIONS[op]
+
+        def handler(request, data, *params):
+            args = check(dict(request.json(), **dict(zip(param_names, params))))
+            status, payload = apply(data, *args)
+            return status, payload, {}
+        return handler
+
+    def _batch(self, request, data):
+        operations = request.json().get('operations')
+        if not isinstance(operations, list) or len(operations) > MAX_BATCH:
+            raise ApiError(400, f"'operations' must be a list of at most {MAX_BATCH} objects")
+        # Check every operation before running any, so a bad one leaves the user's data untouched
+        checked, errors = [], []
+        for position, fields in enumerate(operations):
+            op = fields.get('op') if isinstance(fields, dict) else None
+            mutation = MUTATIONS.get(op) if isinstance(op, str) else None
+            try:
+                if mutation is None:
+                    raise ApiError(400, f"Unknown op; use one of {', '.join(MUTATIONS)}")
+                checked.append((mutation[1], mutation[0](fields)))
+            except ApiError as exc:
+                errors.append({'index': position, 'status': exc.status, 'error': str(exc)})
+        if errors:
+            return 400, {'error': "Invalid operations; none were applied", 'errors': errors}, {}
+        results = []
+        # One lock hold for the whole batch, so other sessions see all of it or none
+        with data.lock:
+            for apply, args in checked:
+                try:
+                    status, payload = apply(data, *args)
+                    results.append({'status': status, 'result': payload})
+                except ApiError as exc:
+                    results.append({'status': exc.status, 'error': str(exc)})
+        return 200, {'results': results}, {}
+
+    async def _signup(self, request):
+        fields = request.json()
+        username, password = _text(fields, 'username'), _text(fields, 'password')
+        loop = asyncio.get_running_loop()
+        # Password hashing runs in the KDF pool; keep the event loop free meanwhile
+        success, message = await loop.run_in_executor(
+            self._executor, self.service.signup, username, password,
+            _optional_text(fields, 'email', ''), _optional_text(fields, 'full_name', username))
+        if not success:
+            raise ApiError(409, message)
+        return 201, {'message': message}, {}
+
+    async def _login(self, request):
+        fields = request.json()
+        username, password = _text(fields, 'username'), _text(fields, 'password')
+        loop = asyncio.get_running_loop()
+        success, message = await loop.run_in_executor(self._executor, self.service.authenticate, username, password)
+        if not success:
+            raise ApiError(401, message)
+        name = base64.urlsafe_b64encode(username.encode('utf-8')).decode('ascii').rstrip('=')
+        claims = f"{name}.{int(time.time()) + TOKEN_TTL}"
+        return 200, {'token': f"{claims}.{self._sign(claims)}", 'expires_in': TOKEN_TTL}, {}
+
+    # Tokens: base64 username, expiry, HMAC of both
+    def _sign(self, claims):
+        digest = hmac.new(self._secret, claims.encode('ascii'), hashlib.sha256).digest()
+        return base64.urlsafe_b64encode(digest).decode('ascii').rstrip('=')
+
+    def _username(self, token):
+        """The user a token was issued to, or None if it is forged or expired"""
+        claims, _, signature = token.rpartition('.')
+        if not claims.isascii() or not hmac.compare_digest(signature.encode('utf-8'),
+                                                           self._sign(claims).encode('ascii')):
+            return None
+        name, _, expiry = claims.partition('.')
+        if int(expiry) < time.time():
+            return None
+        return base64.urlsafe_b64decode(name + '=' * (-len(name) % 4)).decode('utf-8')
+
+    def _user(self, request):
+        scheme, _, token = request.headers.get('authorization', '').partition(' ')
+        username = self._username(token) if scheme.lower() == 'bearer' else None
+        if username is None:
+            raise ApiError(401, "Log in first and send 'Authorization: Bearer <token>'")
+        return self.service.user(username)
+
+    def _run(self, handler, request, authenticated, params):
+        """Authenticate and run a handler; on an executor thread, as loading users, locks and writes block"""
+        data = self._user(request) if authenticated else None
+        return handler(request, data, *params)
+
+    async def handle(self, request):
+        """Return (status, payload, extra headers) for a request"""
+        allowed = []
+        try:
+            for method, pattern, handler, authenticated in self._routes:
+                match = pattern.fullmatch(request.path)
+                if match is None:
+                    continue
+                if method != request.method:
+                    allowed.append(method)
+                    continue
+                if asyncio.iscoroutinefunction(handler):
+                    return await handler(request, *match.groups())
+                return await asyncio.get_running_loop().run_in_executor(
+                    self._executor, self._run, handler, request, authenticated, match.groups())
+            if allowed:
+                return 405, {'error': "Method not allowed"}, {'Allow': ", ".join(allowed)}
+            return 404, {'error': "Not found"}, {}
+        except ApiError as exc:
+            return exc.status, {'error': str(exc)}, {}
+        except Exception:
+            traceback.print_exc()
+            return 500, {'error': "Internal server error"}, {}
+
+    # HTTP/1.1 over asyncio streams
+    async def serve_connection(self, reader, writer):
+        try:
+            while True:
+                try:
+                    head = await asyncio.wait_for(reader.readuntil(b'\r\n\r\n'), KEEPALIVE_TIMEOUT)
+                except (asyncio.IncompleteReadError, asyncio.TimeoutError, ConnectionError):
+                    break
+                except asyncio.LimitOverrunError:
+                    writer.write(_response(431, {'error': "Request headers too large"}, {}, False))
+                    break
+                try:
+                    request_line, *header_lines = head.decode('latin-1').split('\r\n')
+                    method, target, version = request_line.split(' ')
+                    headers = {}
+                    for line in header_lines:
+                        if line:
+                            name, _, value = line.partition(':')
+                            headers[name.strip().lower()] = value.strip()
+                    length = int(headers.get('content-length', 0))
+                except ValueError:
+                    writer.write(_response(400, {'error': "Malformed request"}, {}, False))
+                    break
+                if 'transfer-encoding' in headers:
+                    writer.write(_response(411, {'error': "Send a Content-Length"}, {}, False))
+                    break
+                if length > MAX_BODY:
+                    writer.write(_response(413, {'error': "Request body too large"}, {}, False))
+                    break
+                body = await reader.readexactly(length) if length else b''
+                connection = headers.get('connection', '').lower()
+                keep_alive = connection != 'close' if version == 'HTTP/1.1' else connection == 'keep-alive'
+                status, payload, extra = await self.handle(Request(method, target, headers, body))
+                writer.write(_response(status, payload, extra, keep_alive))
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            writer.close()
+
+
+def _response(status, payload, extra, keep_alive):
+    body = b'' if payload is None else json.dumps(payload, separators=(',', ':')).encode('utf-8')
+    lines = [f"HTTP/1.1 {status} {HTTPStatus(status).phrase}"]
+    if payload is not None:
+        lines.append("Content-Type: application/json")
+    lines.append(f"Content-Length: {len(body)}")
+    lines.append("Connection: keep-alive" if keep_alive else "Connection: close")
+    lines.extend(f"{name}: {value}" for name, value in extra.items())
+    return ("\r\n".join(lines) + "\r\n\r\n").encode('latin-1') + body
+
+
+async def serve(service, host='127.0.0.1', port=DEFAULT_PORT, ready=None):
+    """Serve the API until cancelled; ready, if given, is a threading.Event set once listening"""
+    api = Api(service)
+    server = await asyncio.start_server(api.serve_connection, host, port, limit=MAX_HEADER)
+    if ready is not None:
+        ready.set()
+    async with server:
+        await server.serve_forever()
+
+
+_server_lock = threading.Lock()
+_server_thread = None
+
+
+def serve_in_background(service, port=None, host='127.0.0.1'):
+    """Serve the API on its own thread when PRODUCTIVITY_HUB_API_PORT is set; started once per process"""
+    global _server_thread
+    port = port or os.environ.get(API_PORT_ENV)
+    if not port:
+        return None
+    with _server_lock:
+        if _server_thread is None:
+            ready = threading.Event()
+            _server_thread = threading.Thread(target=asyncio.run, args=(serve(service, host, int(port), ready),),
+                                              name='api', daemon=True)
+            _server_thread.start()
+            ready.wait(5)
+    return _server_thread
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=int(os.environ.get(API_PORT_ENV, DEFAULT_PORT)))
+    parser.add_argument('--backend', choices=('sqlite', 'eventlog', 'memory'))
+    parser.add_argument('--db', help="database path (default: $PRODUCTIVITY_HUB_DB or the app's default)")
+    args = parser.parse_args()
+
+    service = DataService(storage.open_storage(args.backend, args.db))
+    invalidation.watch(service)
+    print(f"Serving the API on http://{args.host}:{args.port}/api")
+    try:
+        asyncio.run(serve(service, args.host, args.port))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        service.storage.close()
+
+
+if __name__ == '__main__':
+    main()
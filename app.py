@@ -1,9 +1,19 @@
 import streamlit as st
-from datetime import datetime, timedelta
-import uuid
-import time
-import plotly.express as px
-import pandas as pd
+import streamlit.components.v1 as components
+from datetime import date, datetime, timedelta
+import io
+import math
+import os
+from itertools import islice
+import charts
+import invalidation
+import pomodoro
+import profiling
+import reminders
+import storage
+from recurrence import WEEKDAY_NAMES, Rule
+from service import API_PORT_ENV, DataService
+from task_index import SORT_ORDERS
 
 # Page configuration with a professional theme
 st.set_page_config(
@@ -129,280 +139,169 @@ st.markdown(
     unsafe_allow_html=True
 )
 
+@st.cache_resource
+def get_service():
+    """Create the data service shared by every session in this server process"""
+    backend = storage.open_storage()
+    # Delivered reminders are recorded in storage, so reloads and other workers skip them
+    service = DataService(backend, reminders=reminders.ReminderScheduler.from_env(backend))
+    # Other worker processes may share the database; reload users they change
+    invalidation.watch(service)
+    # Scripts and mobile clients share these working sets over HTTP when an API port
+    # is set; the module is only loaded then
+    if os.environ.get(API_PORT_ENV):
+        import api
+        api.serve_in_background(service)
+    return service
+
+def current_user_data():
+    """Shared working set of the logged-in user"""
+    return get_service().user(st.session_state.current_user)
+
 # Initialize session state variables
 def initialize_session_state():
     """Initialize all session state variables"""
-    if 'users' not in st.session_state:
-        st.session_state.users = {}
-    
     if 'logged_in' not in st.session_state:
         st.session_state.logged_in = False
     
     if 'current_user' not in st.session_state:
         st.session_state.current_user = None
     
-    if 'user_tasks' not in st.session_state:
-        st.session_state.user_tasks = {}
-    
-    if 'user_notes' not in st.session_state:
-        st.session_state.user_notes = {}
-    
-    if 'user_habits' not in st.session_state:
-        st.session_state.user_habits = {}
-    
-    if 'user_goals' not in st.session_state:
-        st.session_state.user_goals = {}
-    
-    if 'user_preferences' not in st.session_state:
-        st.session_state.user_preferences = {}
+    if 'figure_cache' not in st.session_state:
+        st.session_state.figure_cache = charts.FigureCache()
     
     if 'pomodoro_state' not in st.session_state:
-        st.session_state.pomodoro_state = {
-            'is_running': False,
-            'start_time': None,
-            'duration': 25 * 60,
-            'session_type': 'work',
-            'sessions_completed': 0,
-            'work_duration': 25,
-            'short_break_duration': 5,
-            'long_break_duration': 15
-        }
+        st.session_state.pomodoro_state = pomodoro.new_state()
 
 # Enhanced authentication functions
 def signup_user(username, password, email, full_name):
     """Register a new user with enhanced profile"""
-    if username in st.session_state.users:
-        return False, "Username already exists!"
-    
-    user_data = {
-        'password': password,
-        'email': email,
-        'full_name': full_name,
-        'created_at': datetime.now().strftime("%Y-%m-%d %H:%M"),
-        'last_login': None,
-        'theme': 'light',
-        'productivity_streak': 0
-    }
-    
-    st.session_state.users[username] = user_data
-    st.session_state.user_tasks[username] = []
-    st.session_state.user_notes[username] = []
-    st.session_state.user_habits[username] = []
-    st.session_state.user_goals[username] = []
-    st.session_state.user_preferences[username] = {
-        'daily_goal': 5,
-        'notifications': True,
-        'work_hours': {'start': '09:00', 'end': '17:00'}
-    }
-    
-    return True, "Account created successfully!"
+    return get_service().signup(username, password, email, full_name)
 
 def login_user(username, password):
     """Authenticate user login with enhanced tracking"""
-    if username not in st.session_state.users:
-        return False, "Username not found! Please create an account first."
-    
-    if st.session_state.users[username]['password'] != password:
-        return False, "Incorrect password!"
-    
-    st.session_state.users[username]['last_login'] = datetime.now().strftime("%Y-%m-%d %H:%M")
-    
-    st.session_state.logged_in = True
-    st.session_state.current_user = username
-    return True, f"Welcome back, {st.session_state.users[username]['full_name']}! "
+    success, message = get_service().authenticate(username, password)
+    if success:
+        st.session_state.logged_in = True
+        st.session_state.current_user = username
+    return success, message
 
 def logout_user():
     """Log out the current user"""
+    if st.session_state.current_user:
+        get_service().end_session(st.session_state.current_user)
     st.session_state.logged_in = False
     st.session_state.current_user = None
+    st.session_state.pop('export_file', None)
+    st.session_state.pop('import_summary', None)
 
 # Enhanced task management
-def add_task(task_text, priority='Medium', category='General', due_date=None):
+@profiling.timed('mutation')
+def add_task(task_text, priority='Medium', category='General', due_date=None, recurrence=None):
     """Add a new task with enhanced features"""
     if st.session_state.current_user:
-        new_task = {
-            'id': str(uuid.uuid4()),
-            'text': task_text,
-            'completed': False,
-            'priority': priority,
-            'category': category,
-            'due_date': due_date.strftime("%Y-%m-%d") if due_date else None,
-            'created_at': datetime.now().strftime("%Y-%m-%d %H:%M"),
-            'completed_at': None,
-            'time_spent': 0
-        }
-        st.session_state.user_tasks[st.session_state.current_user].append(new_task)
+        current_user_data().add_task(task_text, priority, category, due_date, recurrence)
 
+@profiling.timed('mutation')
 def toggle_task(task_id):
     """Toggle task completion status"""
     if st.session_state.current_user:
-        tasks = st.session_state.user_tasks[st.session_state.current_user]
-        for task in tasks:
-            if task['id'] == task_id:
-                task['completed'] = not task['completed']
-                task['completed_at'] = datetime.now().strftime("%Y-%m-%d %H:%M") if task['completed'] else None
-                break
+        current_user_data().toggle_task(task_id)
 
+@profiling.timed('mutation')
+def toggle_occurrence(task_id, day):
+    """Toggle one occurrence of a repeating task"""
+    if st.session_state.current_user:
+        current_user_data().toggle_occurrence(task_id, day)
+
+@profiling.timed('mutation')
 def delete_task(task_id):
     """Delete a task"""
     if st.session_state.current_user:
-        tasks = st.session_state.user_tasks[st.session_state.current_user]
-        st.session_state.user_tasks[st.session_state.current_user] = [
-            task for task in tasks if task['id'] != task_id
-        ]
+        current_user_data().delete_task(task_id)
 
 # Habit tracking functions
+@profiling.timed('mutation')
 def add_habit(habit_name, target_frequency):
     """Add a new habit to track"""
     if st.session_state.current_user:
-        new_habit = {
-            'id': str(uuid.uuid4()),
-            'name': habit_name,
-            'target_frequency': target_frequency,
-            'created_at': datetime.now().strftime("%Y-%m-%d"),
-            'completions': []
-        }
-        st.session_state.user_habits[st.session_state.current_user].append(new_habit)
+        current_user_data().add_habit(habit_name, target_frequency)
 
+@profiling.timed('mutation')
 def mark_habit_complete(habit_id, date=None):
     """Mark habit as complete for a specific date"""
-    if not date:
-        date = datetime.now().strftime("%Y-%m-%d")
-    
     if st.session_state.current_user:
-        habits = st.session_state.user_habits[st.session_state.current_user]
-        for habit in habits:
-            if habit['id'] == habit_id:
-                if date not in habit['completions']:
-                    habit['completions'].append(date)
-                break
+        current_user_data().mark_habit_complete(habit_id, date)
 
 # Goal management functions
+@profiling.timed('mutation')
 def add_goal(title, description, target_date, category):
     """Add a new goal"""
     if st.session_state.current_user:
-        new_goal = {
-            'id': str(uuid.uuid4()),
-            'title': title,
-            'description': description,
-            'category': category,
-            'target_date': target_date.strftime("%Y-%m-%d"),
-            'created_at': datetime.now().strftime("%Y-%m-%d"),
-            'progress': 0,
-            'status': 'active'
-        }
-        st.session_state.user_goals[st.session_state.current_user].append(new_goal)
+        current_user_data().add_goal(title, description, target_date, category)
+
+@profiling.timed('mutation')
+def update_goal_progress(goal_id, progress):
+    """Update a goal's progress, completing it at 100%"""
+    if st.session_state.current_user:
+        current_user_data().update_goal_progress(goal_id, progress)
 
 # Analytics functions
+@profiling.timed('stats')
 def get_productivity_stats():
-    """Calculate productivity statistics"""
+    """Return the productivity statistics maintained by the mutation functions"""
     if not st.session_state.current_user:
         return {}
     
-    tasks = st.session_state.user_tasks[st.session_state.current_user]
-    habits = st.session_state.user_habits[st.session_state.current_user]
-    goals = st.session_state.user_goals[st.session_state.current_user]
-    
-    today = datetime.now().date()
-    week_start = today - timedelta(days=today.weekday())
-    
-    # Task stats
-    today_tasks = [t for t in tasks if datetime.strptime(t['created_at'][:10], "%Y-%m-%d").date() == today]
-    today_completed = [t for t in today_tasks if t['completed']]
-    
-    week_tasks = [t for t in tasks if datetime.strptime(t['created_at'][:10], "%Y-%m-%d").date() >= week_start]
-    week_completed = [t for t in week_tasks if t['completed']]
-    
-    categories = {}
-    for task in tasks:
-        cat = task.get('category', 'General')
-        categories[cat] = categories.get(cat, 0) + 1
-    
-    total_tasks = len(tasks)
-    total_completed = len([t for t in tasks if t['completed']])
-    
-    weekly_completed = {}
-    for i in range(7):
-        day = week_start + timedelta(days=i)
-        day_str = day.strftime("%Y-%m-%d")
-        weekly_completed[day_str] = len([t for t in tasks if t['completed_at'] and t['completed_at'][:10] == day_str])
-    
-    num_habits = len(habits)
-    today_habits_completed = sum(1 for h in habits if today.strftime("%Y-%m-%d") in h['completions'])
-    habit_streaks = {}
-    for habit in habits:
-        completions = sorted(habit['completions'], reverse=True)
-        current_streak = 0
-        check_date = today
-        for comp in completions:
-            if comp == check_date.strftime("%Y-%m-%d"):
-                current_streak += 1
-                check_date -= timedelta(days=1)
-            else:
-                break
-        habit_streaks[habit['name']] = current_streak
-    avg_habit_streak = sum(habit_streaks.values()) / num_habits if num_habits > 0 else 0
-    
-    num_goals = len(goals)
-    num_completed_goals = sum(1 for g in goals if g['status'] == 'completed')
-    avg_progress = sum(g['progress'] for g in goals) / num_goals if num_goals > 0 else 0
-    goal_categories = {}
-    for goal in goals:
-        cat = goal.get('category', 'General')
-        goal_categories[cat] = goal_categories.get(cat, 0) + 1
-    
-    return {
-        'today_tasks': len(today_tasks),
-        'today_completed': len(today_completed),
-        'week_tasks': len(week_tasks),
-        'week_completed': len(week_completed),
-        'total_tasks': total_tasks,
-        'total_completed': total_completed,
-        'categories': categories,
-        'weekly_completed': weekly_completed,
-        'num_habits': num_habits,
-        'today_habits_completed': today_habits_completed,
-        'avg_habit_streak': avg_habit_streak,
-        'habit_streaks': habit_streaks,
-        'num_goals': num_goals,
-        'num_completed_goals': num_completed_goals,
-        'avg_progress': avg_progress,
-        'goal_categories': goal_categories
-    }
+    user_data = current_user_data()
+    with user_data.lock:
+        return user_data.stats.snapshot()
 
 # Enhanced Notes functions
+@profiling.timed('mutation')
 def add_note(note_title, note_content, category='General'):
     """Add a new note with category"""
     if st.session_state.current_user:
-        new_note = {
-            'id': str(uuid.uuid4()),
-            'title': note_title,
-            'content': note_content,
-            'category': category,
-            'created_at': datetime.now().strftime("%Y-%m-%d %H:%M"),
-            'updated_at': datetime.now().strftime("%Y-%m-%d %H:%M")
-        }
-        st.session_state.user_notes[st.session_state.current_user].append(new_note)
+        current_user_data().add_note(note_title, note_content, category)
 
+@profiling.timed('mutation')
 def update_note(note_id, title, content, category):
     """Update an existing note"""
     if st.session_state.current_user:
-        notes = st.session_state.user_notes[st.session_state.current_user]
-        for note in notes:
-            if note['id'] == note_id:
-                note['title'] = title
-                note['content'] = content
-                note['category'] = category
-                note['updated_at'] = datetime.now().strftime("%Y-%m-%d %H:%M")
-                break
+        current_user_data().update_note(note_id, title, content, category)
 
+@profiling.timed('mutation')
 def delete_note(note_id):
     """Delete a note"""
     if st.session_state.current_user:
-        notes = st.session_state.user_notes[st.session_state.current_user]
-        st.session_state.user_notes[st.session_state.current_user] = [
-            note for note in notes if note['id'] != note_id
-        ]
+        current_user_data().delete_note(note_id)
+
+# Pagination
+TASK_PAGE_SIZES = [10, 25, 50, 100]
+DEFAULT_TASK_PAGE_SIZE = 25
+
+# Repeat choices on the new task form and their RRULE frequencies
+REPEAT_OPTIONS = {"Never": None, "Daily": 'DAILY', "Weekly": 'WEEKLY', "Monthly": 'MONTHLY'}
+
+# Days shown in the upcoming list, and at most how many entries
+UPCOMING_DAYS = 7
+UPCOMING_LIMIT = 50
+
+def pagination_controls(total_items, page_size, key):
+    """Page picker for a list of total_items; returns the selected 1-based page"""
+    total_pages = max(1, math.ceil(total_items / page_size))
+    # Keep the stored page in range after filters shrink the result
+    if st.session_state.get(key, 1) > total_pages:
+        st.session_state[key] = total_pages
+    
+    col1, col2 = st.columns([1, 3])
+    with col1:
+        page = st.number_input("Page", min_value=1, max_value=total_pages, step=1, key=key)
+    with col2:
+        first = (page - 1) * page_size + 1
+        last = min(page * page_size, total_items)
+        st.caption(f"Showing {first}-{last} of {total_items} | Page {page} of {total_pages}")
+    return page
 
 # Page functions
 def welcome_page():
@@ -527,7 +426,6 @@ def login_signup_page():
                     st.error("Password must be at least 6 characters long!")
                 else:
                     with st.spinner("Creating your account..."):
-                        time.sleep(1)
                         success, message = signup_user(username, new_password, email, full_name)
                         if success:
                             st.success(message)
@@ -552,7 +450,6 @@ def login_signup_page():
             if login_button:
                 if username and password:
                     with st.spinner("Logging in..."):
-                        time.sleep(1)
                         success, message = login_user(username, password)
                         if success:
                             st.success(message)
@@ -562,10 +459,53 @@ def login_signup_page():
                 else:
                     st.warning("Please enter both username and password")
 
+# Long-range history: days shown and the bucket each trend point covers
+HISTORY_RANGES = {"30 Days": (30, 'day'), "90 Days": (90, 'day'), "1 Year": (365, 'week')}
+
+def history_section(user_data, figures):
+    """Trends and activity heatmap drawn from the rollup buckets, never from raw records"""
+    st.subheader("History")
+    history_range = st.radio("Range", list(HISTORY_RANGES), horizontal=True, key="history_range",
+                             label_visibility="collapsed")
+    days, bucket = HISTORY_RANGES[history_range]
+    end = date.today()
+    start = end - timedelta(days=days - 1)
+    rollups = user_data.rollups
+    
+    h_col1, h_col2, h_col3, h_col4 = st.columns(4)
+    with h_col1:
+        st.metric("Tasks Completed", rollups.total('tasks_completed', start, end))
+    with h_col2:
+        st.metric("Habit Check-ins", rollups.total('habit_completions', start, end))
+    with h_col3:
+        st.metric("Goal Updates", rollups.total('goal_updates', start, end))
+    with h_col4:
+        st.metric("Goal Progress", f"{rollups.total('goal_progress', start, end):+d} pts")
+    
+    created, completed, habits = (rollups.series(metric, start, end, bucket)
+                                  for metric in ('tasks_created', 'tasks_completed', 'habit_completions'))
+    per = "per week" if bucket == 'week' else "per day"
+    trend = figures.get('history_trend',
+                        (f"Activity {per}, last {history_range.lower()}",
+                         tuple(day.isoformat() for day, _ in created),
+                         tuple(value for _, value in created),
+                         tuple(value for _, value in completed),
+                         tuple(value for _, value in habits)),
+                        charts.history_trend_figure)
+    st.plotly_chart(trend, use_container_width=True)
+    
+    weeks, rows = rollups.weekly_grid(('tasks_completed', 'habit_completions'), start, end)
+    heatmap = figures.get('activity_heatmap',
+                          ("Daily completions (tasks and habits)",
+                           tuple(week.isoformat() for week in weeks),
+                           tuple(tuple(row) for row in rows)),
+                          charts.activity_heatmap_figure)
+    st.plotly_chart(heatmap, use_container_width=True)
+
 def dashboard_page():
     """Main dashboard with professional layout"""
-    user_data = st.session_state.users[st.session_state.current_user]
-    st.title(f"Dashboard - Welcome {user_data['full_name']}!")
+    user_data = current_user_data()
+    st.title(f"Dashboard - Welcome {user_data.profile['full_name']}!")
     
     stats = get_productivity_stats()
     col1, col2, col3, col4, col5, col6 = st.columns(6)
@@ -585,142 +525,52 @@ def dashboard_page():
         st.metric("Goals Progress", f"{stats['avg_progress']:.1f}%", "🎯")
     
     st.subheader("Analytics Overview")
+    figures = st.session_state.figure_cache
     vis_col1, vis_col2 = st.columns(2)
     
     with vis_col1:
         if stats['total_tasks'] > 0:
-            task_data = pd.DataFrame({
-                'Status': ['Completed', 'Pending'],
-                'Count': [stats['total_completed'], stats['total_tasks'] - stats['total_completed']]
-            })
-            fig1 = px.pie(
-                task_data,
-                names='Status',
-                values='Count',
-                title='Task Completion Status',
-                color='Status',
-                color_discrete_map={'Completed': '#2ecc71', 'Pending': '#e74c3c'},
-                hole=0.3
-            )
-            fig1.update_traces(textinfo='percent+label', textfont_size=14)
-            fig1.update_layout(
-                title_font_size=16,
-                margin=dict(t=50, b=50, l=50, r=50),
-                plot_bgcolor='rgba(0,0,0,0)',
-                paper_bgcolor='rgba(0,0,0,0)',
-                font=dict(color='#333333')
-            )
+            fig1 = figures.get('task_status',
+                               (stats['total_completed'], stats['total_tasks'] - stats['total_completed']),
+                               charts.task_status_figure)
             st.plotly_chart(fig1, use_container_width=True)
         else:
             st.info("No tasks yet for pie chart.")
         
         if stats['num_goals'] > 0:
-            goal_data = pd.DataFrame({
-                'Category': list(stats['goal_categories'].keys()),
-                'Count': list(stats['goal_categories'].values())
-            })
-            fig3 = px.pie(
-                goal_data,
-                names='Category',
-                values='Count',
-                title='Goal Categories',
-                color_discrete_sequence=['#3498db', '#e67e22', '#9b59b6', '#f1c40f', '#1abc9c'],
-                hole=0.3
-            )
-            fig3.update_traces(textinfo='percent+label', textfont_size=14)
-            fig3.update_layout(
-                title_font_size=16,
-                margin=dict(t=50, b=50, l=50, r=50),
-                plot_bgcolor='rgba(0,0,0,0)',
-                paper_bgcolor='rgba(0,0,0,0)',
-                font=dict(color='#333333')
-            )
+            fig3 = figures.get('goal_categories',
+                               (tuple(stats['goal_categories']), tuple(stats['goal_categories'].values())),
+                               charts.goal_categories_figure)
             st.plotly_chart(fig3, use_container_width=True)
         else:
             st.info("No goals yet for pie chart.")
     
     with vis_col2:
         if stats['categories']:
-            category_data = pd.DataFrame({
-                'Category': list(stats['categories'].keys()),
-                'Count': list(stats['categories'].values())
-            })
-            fig2 = px.bar(
-                category_data,
-                x='Category',
-                y='Count',
-                title='Task Categories',
-                color_discrete_sequence=['#3498db']
-            )
-            fig2.update_layout(
-                title_font_size=16,
-                xaxis_title='',
-                yaxis_title='Count',
-                xaxis_tickangle=45,
-                margin=dict(t=50, b=50, l=50, r=50),
-                plot_bgcolor='rgba(0,0,0,0)',
-                paper_bgcolor='rgba(0,0,0,0)',
-                font=dict(color='#333333')
-            )
-            fig2.update_traces(hovertemplate='Category: %{x}<br>Count: %{y}')
+            fig2 = figures.get('task_categories',
+                               (tuple(stats['categories']), tuple(stats['categories'].values())),
+                               charts.task_categories_figure)
             st.plotly_chart(fig2, use_container_width=True)
         else:
             st.info("No categories yet for bar chart.")
         
         if stats['weekly_completed']:
-            weekly_data = pd.DataFrame({
-                'Date': list(stats['weekly_completed'].keys()),
-                'Completed Tasks': list(stats['weekly_completed'].values())
-            })
-            fig4 = px.line(
-                weekly_data,
-                x='Date',
-                y='Completed Tasks',
-                title='Weekly Completed Tasks',
-                markers=True,
-                color_discrete_sequence=['#27ae60']
-            )
-            fig4.update_layout(
-                title_font_size=16,
-                xaxis_title='',
-                yaxis_title='Completed Tasks',
-                xaxis_tickangle=45,
-                margin=dict(t=50, b=50, l=50, r=50),
-                plot_bgcolor='rgba(0,0,0,0)',
-                paper_bgcolor='rgba(0,0,0,0)',
-                font=dict(color='#333333')
-            )
-            fig4.update_traces(line=dict(width=2), marker=dict(size=8))
+            fig4 = figures.get('weekly_completed',
+                               (tuple(stats['weekly_completed']), tuple(stats['weekly_completed'].values())),
+                               charts.weekly_completed_figure)
             st.plotly_chart(fig4, use_container_width=True)
         else:
             st.info("No weekly data yet for line chart.")
     
     if stats['habit_streaks']:
         st.subheader("Habit Streaks")
-        habit_data = pd.DataFrame({
-            'Habit': list(stats['habit_streaks'].keys()),
-            'Streak Days': list(stats['habit_streaks'].values())
-        })
-        fig5 = px.bar(
-            habit_data,
-            y='Habit',
-            x='Streak Days',
-            title='Current Habit Streaks',
-            orientation='h',
-            color_discrete_sequence=['#f39c12']
-        )
-        fig5.update_layout(
-            title_font_size=16,
-            xaxis_title='Streak Days',
-            yaxis_title='',
-            margin=dict(t=50, b=50, l=50, r=50),
-            plot_bgcolor='rgba(0,0,0,0)',
-            paper_bgcolor='rgba(0,0,0,0)',
-            font=dict(color='#333333')
-        )
-        fig5.update_traces(hovertemplate='Habit: %{y}<br>Streak Days: %{x}')
+        fig5 = figures.get('habit_streaks',
+                           (tuple(stats['habit_streaks']), tuple(stats['habit_streaks'].values())),
+                           charts.habit_streaks_figure)
         st.plotly_chart(fig5, use_container_width=True)
     
+    history_section(user_data, figures)
+    
     st.subheader("Quick Actions")
     qa_col1, qa_col2, qa_col3 = st.columns(3)
     
@@ -750,11 +600,14 @@ def dashboard_page():
     with qa_col3:
         st.markdown('<div class="custom-container">', unsafe_allow_html=True)
         st.subheader("Today's Focus")
-        today_tasks = [t for t in st.session_state.user_tasks[st.session_state.current_user] 
-                      if not t['completed'] and t.get('priority') == 'High'][:3]
+        # The first pending tasks in priority order are the high-priority ones, if any
+        task_index = user_data.task_index
+        today_tasks = [user_data.tasks.get(task_id)
+                       for task_id in task_index.page("Priority", 0, 3, task_index.by_status['Pending'])]
+        today_tasks = [t for t in today_tasks if t.priority == 'High']
         if today_tasks:
             for task in today_tasks:
-                st.write(f"🔴 {task['text']}")
+                st.write(f"🔴 {task.text}")
         else:
             st.write("No high-priority tasks for today!")
         st.markdown('</div>', unsafe_allow_html=True)
@@ -762,20 +615,22 @@ def dashboard_page():
 def enhanced_todo_page():
     """Enhanced to-do list with filters and categories"""
     st.title("Task Manager")
+    task_index = current_user_data().task_index
     
     st.markdown('<div class="custom-container">', unsafe_allow_html=True)
-    col1, col2, col3, col4 = st.columns(4)
+    col1, col2, col3, col4, col5 = st.columns(5)
     
     with col1:
         filter_status = st.selectbox("Status", ["All", "Pending", "Completed"])
     with col2:
         filter_priority = st.selectbox("Priority", ["All", "High", "Medium", "Low"])
     with col3:
-        filter_category = st.selectbox("Category", 
-                                     ["All"] + list(set([t.get('category', 'General') 
-                                     for t in st.session_state.user_tasks.get(st.session_state.current_user, [])])))
+        filter_category = st.selectbox("Category", ["All"] + task_index.categories())
     with col4:
-        sort_by = st.selectbox("Sort By", ["Created Date", "Priority", "Due Date"])
+        sort_by = st.selectbox("Sort By", SORT_ORDERS)
+    with col5:
+        page_size = st.selectbox("Per Page", TASK_PAGE_SIZES,
+                                 index=TASK_PAGE_SIZES.index(DEFAULT_TASK_PAGE_SIZE))
     st.markdown('</div>', unsafe_allow_html=True)
     
     st.subheader("Create New Task")
@@ -789,58 +644,97 @@ def enhanced_todo_page():
         with col2:
             category = st.text_input("Category", placeholder="e.g., Work, Personal, Health")
             due_date = st.date_input("Due Date (Optional)", value=None)
+
+        col1, col2, col3, col4 = st.columns(4)
+        with col1:
+            repeat = st.selectbox("Repeat", list(REPEAT_OPTIONS))
+        with col2:
+            interval = st.number_input("Every", min_value=1, max_value=365, value=1)
+        with col3:
+            weekdays = st.multiselect("On (weekly)", WEEKDAY_NAMES)
+        with col4:
+            until = st.date_input("Until (Optional)", value=None)
         
         add_button = st.form_submit_button("Add Task")
         
         if add_button and new_task.strip():
-            add_task(new_task.strip(), priority, category or "General", due_date)
+            recurrence = None
+            if REPEAT_OPTIONS[repeat]:
+                # Repeating tasks start on their due date, or today
+                recurrence = str(Rule(REPEAT_OPTIONS[repeat], due_date or date.today(), int(interval),
+                                      [WEEKDAY_NAMES.index(day) for day in weekdays], until))
+            add_task(new_task.strip(), priority, category or "General", due_date, recurrence)
             st.success(f"Task added: {new_task}")
             st.rerun()
     
+    user_tasks = current_user_data().tasks
+    with st.expander(f"📅 Due in the next {UPCOMING_DAYS} days"):
+        # Occurrences of repeating tasks exist only for the window shown
+        today = date.today()
+        due = task_index.due_between(today, today + timedelta(days=UPCOMING_DAYS - 1))
+        if not due:
+            st.write("Nothing due this week.")
+        for day, task_id in due[:UPCOMING_LIMIT]:
+            task = user_tasks.get(task_id)
+            done = day in (task.completions or ()) if task.recurrence else task.completed
+            col1, col2 = st.columns([0.1, 0.9])
+            with col1:
+                if st.button("🔄" if done else "✅", key=f"due_{task_id}_{day}", help="Toggle completion"):
+                    if task.recurrence:
+                        toggle_occurrence(task_id, day)
+                    else:
+                        toggle_task(task_id)
+                    st.rerun()
+            with col2:
+                label = f"{day:%a %d %b} · {task.text}"
+                st.markdown(f"~~{label}~~" if done else label)
+        if len(due) > UPCOMING_LIMIT:
+            st.caption(f"... and {len(due) - UPCOMING_LIMIT} more")
+
     st.subheader("Your Tasks")
-    user_tasks = st.session_state.user_tasks.get(st.session_state.current_user, [])
     
-    filtered_tasks = user_tasks
-    if filter_status != "All":
-        filtered_tasks = [t for t in filtered_tasks if 
-                         (t['completed'] if filter_status == "Completed" else not t['completed'])]
-    if filter_priority != "All":
-        filtered_tasks = [t for t in filtered_tasks if t.get('priority') == filter_priority]
-    if filter_category != "All":
-        filtered_tasks = [t for t in filtered_tasks if t.get('category', 'General') == filter_category]
+    matching_ids = task_index.filter(filter_status, filter_priority, filter_category)
+    total_matching = len(user_tasks) if matching_ids is None else len(matching_ids)
     
-    if not filtered_tasks:
+    if not total_matching:
         st.info("No tasks match your current filters. Try adjusting them above!")
     else:
-        for task in filtered_tasks:
+        # Only the visible page of the filtered, sorted result becomes widgets
+        page = pagination_controls(total_matching, page_size, key="task_page")
+        page_ids = task_index.page(sort_by, (page - 1) * page_size, page_size, matching_ids)
+        for task in (user_tasks.get(task_id) for task_id in page_ids):
             priority_colors = {"High": "#ff4d4d", "Medium": "#ffd700", "Low": "#90ee90"}
-            priority_color = priority_colors.get(task.get('priority', 'Medium'), "#ffd700")
+            priority_color = priority_colors.get(task.priority, "#ffd700")
             
             st.markdown(f'<div class="custom-container" style="border-left: 5px solid {priority_color};">', unsafe_allow_html=True)
             col1, col2, col3 = st.columns([0.1, 0.7, 0.2])
             
             with col1:
-                if st.button("✅" if not task['completed'] else "🔄", 
-                           key=f"toggle_{task['id']}", 
+                if st.button("✅" if not task.completed else "🔄", 
+                           key=f"toggle_{task.id}", 
                            help="Toggle completion"):
-                    toggle_task(task['id'])
+                    toggle_task(task.id)
                     st.rerun()
             
             with col2:
-                task_style = "<s>" if task['completed'] else "<strong>"
-                st.markdown(f"{task_style}{task['text']}</{task_style.split('>')[0][1:]}>", unsafe_allow_html=True)
+                task_style = "<s>" if task.completed else "<strong>"
+                st.markdown(f"{task_style}{task.text}</{task_style.split('>')[0][1:]}>", unsafe_allow_html=True)
                 
                 metadata = []
-                metadata.append(f"📋 {task.get('category', 'General')}")
-                metadata.append(f"📅 {task['created_at'][:10]}")
-                if task.get('due_date'):
-                    metadata.append(f"⏰ Due: {task['due_date']}")
+                metadata.append(f"📋 {task.category}")
+                metadata.append(f"📅 {task.created_at:%Y-%m-%d}")
+                if task.recurrence:
+                    next_due = task.next_due
+                    metadata.append(f"🔁 {task.recurrence.describe()}")
+                    metadata.append(f"⏰ Next: {next_due}" if next_due else "⏰ All done")
+                elif task.due_date:
+                    metadata.append(f"⏰ Due: {task.due_date}")
                 
                 st.caption(" | ".join(metadata))
             
             with col3:
-                if st.button("🗑️", key=f"delete_{task['id']}", help="Delete task"):
-                    delete_task(task['id'])
+                if st.button("🗑️", key=f"delete_{task.id}", help="Delete task"):
+                    delete_task(task.id)
                     st.success("Task deleted!")
                     st.rerun()
             st.markdown('</div>', unsafe_allow_html=True)
@@ -865,44 +759,66 @@ def habits_page():
                 st.rerun()
     
     st.subheader("Your Habits")
-    user_habits = st.session_state.user_habits.get(st.session_state.current_user, [])
+    user_habits = current_user_data().habits
     
     if not user_habits:
         st.info("No habits yet! Create your first habit above to start building positive routines.")
     else:
-        today = datetime.now().strftime("%Y-%m-%d")
+        today = datetime.now().date()
+        week_start = today - timedelta(days=today.weekday())
+        month_start = today.replace(day=1)
         
         for habit in user_habits:
             st.markdown('<div class="custom-container">', unsafe_allow_html=True)
             col1, col2, col3 = st.columns([2, 1, 1])
             
             with col1:
-                st.markdown(f"<strong>{habit['name']}</strong>", unsafe_allow_html=True)
-                st.caption(f"Target: {habit['target_frequency'].title()} | Created: {habit['created_at']}")
+                st.markdown(f"<strong>{habit.name}</strong>", unsafe_allow_html=True)
+                st.caption(f"Target: {habit.target_frequency.title()} | Created: {habit.created_at}")
+                st.caption(f"This week: {habit.completions.count_between(week_start, today)} | "
+                           f"This month: {habit.completions.count_between(month_start, today)} | "
+                           f"Best streak: {habit.completions.longest} days")
             
             with col2:
-                completions = sorted(habit['completions'], reverse=True)
-                current_streak = 0
-                check_date = datetime.now().date()
-                for completion_date in completions:
-                    if completion_date == check_date.strftime("%Y-%m-%d"):
-                        current_streak += 1
-                        check_date -= timedelta(days=1)
-                    else:
-                        break
-                
-                st.metric("Streak", f"{current_streak} days")
+                st.metric("Streak", f"{habit.completions.current_streak(today)} days")
             
             with col3:
-                if today not in habit['completions']:
-                    if st.button("✅ Mark Done", key=f"habit_{habit['id']}"):
-                        mark_habit_complete(habit['id'])
+                if today not in habit.completions:
+                    if st.button("✅ Mark Done", key=f"habit_{habit.id}"):
+                        mark_habit_complete(habit.id)
                         st.success("Great job!")
                         st.rerun()
                 else:
                     st.success("Done Today!")
             st.markdown('</div>', unsafe_allow_html=True)
 
+GOAL_PAGE_SIZE = 25
+
+@st.fragment
+def goal_progress_editor():
+    """Progress slider for the selected goal only; moving it reruns just this fragment"""
+    user_data = current_user_data()
+    with user_data.lock:
+        goal_ids = [goal.id for goal in user_data.goals]
+        if not goal_ids:
+            return
+        col1, col2, col3 = st.columns([2, 3, 1])
+        with col1:
+            goal_id = st.selectbox("Goal", goal_ids, key="selected_goal",
+                                   format_func=lambda g: user_data.goals.get(g).title)
+        goal = user_data.goals.get(goal_id)
+        with col2:
+            # Keyed on the stored value too, so a change made elsewhere (another
+            # session, the API) replaces the widget instead of leaving it stale
+            progress = st.slider("Update Progress", 0, 100, goal.progress,
+                                 key=f"progress_{goal.id}_{goal.progress}")
+    with col3:
+        st.write("")
+        if st.button("Update", key="update_goal"):
+            update_goal_progress(goal.id, progress)
+            st.success("Progress updated!")
+            st.rerun()
+
 def goals_page():
     """Goal tracking page"""
     st.title("Goal Tracker")
@@ -927,35 +843,28 @@ def goals_page():
                 st.rerun()
     
     st.subheader("Your Goals")
-    user_goals = st.session_state.user_goals.get(st.session_state.current_user, [])
+    user_goals = current_user_data().goals
     
     if not user_goals:
         st.info("No goals yet! Set your first goal above to start achieving your dreams.")
     else:
-        for goal in user_goals:
-            with st.expander(f"{goal['title']} - {goal['category']}"):
+        goal_progress_editor()
+        
+        page = 1
+        if len(user_goals) > GOAL_PAGE_SIZE:
+            page = pagination_controls(len(user_goals), GOAL_PAGE_SIZE, key="goal_page")
+        start = (page - 1) * GOAL_PAGE_SIZE
+        # Expanders only show details; the one editor above holds the widgets
+        for goal in islice(user_goals, start, start + GOAL_PAGE_SIZE):
+            with st.expander(f"{goal.title} - {goal.category}"):
                 st.markdown('<div class="custom-container">', unsafe_allow_html=True)
-                st.write(f"Description: {goal['description']}")
-                st.write(f"Target Date: {goal['target_date']}")
-                st.write(f"Created: {goal['created_at']}")
+                st.write(f"Description: {goal.description}")
+                st.write(f"Target Date: {goal.target_date}")
+                st.write(f"Created: {goal.created_at}")
                 
-                progress_color = "#2ecc71" if goal['progress'] == 100 else "#3498db"
-                st.progress(goal['progress'] / 100)
-                st.markdown(f'<p style="text-align: center; color: {progress_color};">{goal["progress"]}% Complete</p>', unsafe_allow_html=True)
-                
-                progress = st.slider("Update Progress", 0, 100, goal['progress'], 
-                                   key=f"progress_{goal['id']}")
-                
-                if st.button("Update", key=f"update_{goal['id']}"):
-                    goals = st.session_state.user_goals[st.session_state.current_user]
-                    for g in goals:
-                        if g['id'] == goal['id']:
-                            g['progress'] = progress
-                            if progress == 100:
-                                g['status'] = 'completed'
-                            break
-                    st.success("Progress updated!")
-                    st.rerun()
+                progress_color = "#2ecc71" if goal.progress == 100 else "#3498db"
+                st.progress(goal.progress / 100)
+                st.markdown(f'<p style="text-align: center; color: {progress_color};">{goal.progress}% Complete</p>', unsafe_allow_html=True)
                 st.markdown('</div>', unsafe_allow_html=True)
 
 def enhanced_notes_page():
@@ -968,8 +877,8 @@ def enhanced_notes_page():
     with col1:
         search_term = st.text_input("Search Notes", placeholder="Search by title or content...")
     with col2:
-        user_notes = st.session_state.user_notes.get(st.session_state.current_user, [])
-        categories = list(set([n.get('category', 'General') for n in user_notes]))
+        user_notes = current_user_data().notes
+        categories = list(set([n.category for n in user_notes]))
         filter_category = st.selectbox("Filter by Category", ["All"] + categories)
     st.markdown('</div>', unsafe_allow_html=True)
     
@@ -992,13 +901,15 @@ def enhanced_notes_page():
             st.rerun()
     
     st.subheader("Your Notes")
-    filtered_notes = user_notes
     if search_term:
-        filtered_notes = [n for n in filtered_notes if 
-                         search_term.lower() in n['title'].lower() or 
-                         search_term.lower() in n['content'].lower()]
+        # Best matches first, straight from the search index
+        note_index = current_user_data().note_index
+        filtered_notes = [user_notes.get(note_id) for note_id in note_index.search(search_term)]
+    else:
+        # Newest first
+        filtered_notes = list(reversed(user_notes))
     if filter_category != "All":
-        filtered_notes = [n for n in filtered_notes if n.get('category', 'General') == filter_category]
+        filtered_notes = [n for n in filtered_notes if n.category == filter_category]
     
     if not filtered_notes:
         if search_term or filter_category != "All":
@@ -1006,50 +917,58 @@ def enhanced_notes_page():
         else:
             st.info("No notes yet! Create your first note above.")
     else:
-        for note in reversed(filtered_notes):
-            with st.expander(f"{note['title']} - {note.get('category', 'General')}"):
+        for note in filtered_notes:
+            with st.expander(f"{note.title} - {note.category}"):
                 st.markdown('<div class="custom-container">', unsafe_allow_html=True)
-                st.write(note['content'])
+                st.write(note.content)
                 
                 col1, col2 = st.columns(2)
                 with col1:
-                    st.caption(f"Created: {note['created_at']}")
-                    if note['updated_at'] != note['created_at']:
-                        st.caption(f"Updated: {note['updated_at']}")
+                    st.caption(f"Created: {note.created_at:%Y-%m-%d %H:%M}")
+                    if note.updated_at != note.created_at:
+                        st.caption(f"Updated: {note.updated_at:%Y-%m-%d %H:%M}")
                 
                 with col2:
-                    if st.button("🗑️ Delete", key=f"delete_note_{note['id']}"):
-                        delete_note(note['id'])
+                    if st.button("🗑️ Delete", key=f"delete_note_{note.id}"):
+                        delete_note(note.id)
                         st.success("Note deleted!")
                         st.rerun()
                 st.markdown('</div>', unsafe_allow_html=True)
 
+def announce_finished_phases(finished):
+    """Show a toast for each Pomodoro phase that ended"""
+    for session_type in finished:
+        if session_type == 'work':
+            st.toast("Work session completed! Time for a break!")
+        else:
+            st.toast("Break's over! Back to work!")
+
+def pomodoro_phase_watcher(seconds_left):
+    """Wake up once when the current phase ends and rerun the page for the next one"""
+    @st.fragment(run_every=math.ceil(seconds_left) + 1)
+    def watch_phase():
+        finished = pomodoro.advance(st.session_state.pomodoro_state)
+        if finished:
+            announce_finished_phases(finished)
+            st.rerun()
+    
+    watch_phase()
+
 def pomodoro_page():
     """Pomodoro timer for focused work sessions"""
     st.title("Pomodoro Timer")
     
+    # Catch up on phases that ended while the page was not being viewed
+    announce_finished_phases(pomodoro.advance(st.session_state.pomodoro_state))
+    
     col1, col2 = st.columns([2, 1])
     
     with col1:
         st.subheader("Focus Timer")
         
-        if st.session_state.pomodoro_state['is_running']:
-            elapsed = time.time() - st.session_state.pomodoro_state['start_time']
-            remaining = max(0, st.session_state.pomodoro_state['duration'] - elapsed)
-        else:
-            remaining = st.session_state.pomodoro_state['duration']
-        
-        minutes = int(remaining // 60)
-        seconds = int(remaining % 60)
-        
-        timer_color = "#e74c3c" if st.session_state.pomodoro_state['session_type'] == 'work' else "#27ae60"
-        st.markdown(f"""
-        <div style="text-align: center; font-size: 3em; font-weight: bold; 
-                    color: {timer_color}; margin: 1rem 0; background-color: #e9ecef; 
-                    padding: 1rem; border-radius: 8px; box-shadow: 0 2px 4px rgba(0,0,0,0.1);">
-            {minutes:02d}:{seconds:02d}
-        </div>
-        """, unsafe_allow_html=True)
+        # The countdown ticks in the browser; the server only runs again
+        # when a button is pressed or the current phase ends
+        components.html(pomodoro.countdown_html(st.session_state.pomodoro_state), height=130)
         
         session_type = st.session_state.pomodoro_state['session_type'].replace('_', ' ').title()
         st.markdown(f"<p style='text-align: center; color: #333333; font-size: 1.2em;'><strong>{session_type} Session</strong></p>", unsafe_allow_html=True)
@@ -1057,51 +976,21 @@ def pomodoro_page():
         st.markdown('<div style="display: flex; justify-content: center; gap: 1rem;">', unsafe_allow_html=True)
         if st.button("▶ Start", key="pomodoro_start"):
             if not st.session_state.pomodoro_state['is_running']:
-                st.session_state.pomodoro_state['is_running'] = True
-                st.session_state.pomodoro_state['start_time'] = time.time()
+                pomodoro.start(st.session_state.pomodoro_state)
                 st.rerun()
         
         if st.button("⏸ Pause", key="pomodoro_pause"):
             if st.session_state.pomodoro_state['is_running']:
-                elapsed = time.time() - st.session_state.pomodoro_state['start_time']
-                st.session_state.pomodoro_state['duration'] -= elapsed
-                st.session_state.pomodoro_state['is_running'] = False
-                st.session_state.pomodoro_state['start_time'] = None
+                pomodoro.pause(st.session_state.pomodoro_state)
                 st.rerun()
         
         if st.button("🔄 Reset", key="pomodoro_reset"):
-            st.session_state.pomodoro_state['is_running'] = False
-            st.session_state.pomodoro_state['start_time'] = None
-            st.session_state.pomodoro_state['duration'] = st.session_state.pomodoro_state['work_duration'] * 60
-            st.session_state.pomodoro_state['session_type'] = 'work'
-            st.session_state.pomodoro_state['sessions_completed'] = 0
+            pomodoro.reset(st.session_state.pomodoro_state)
             st.rerun()
         st.markdown('</div>', unsafe_allow_html=True)
         
         if st.session_state.pomodoro_state['is_running']:
-            if remaining > 0:
-                time.sleep(1)
-                st.rerun()
-            else:
-                st.session_state.pomodoro_state['is_running'] = False
-                st.session_state.pomodoro_state['start_time'] = None
-                current_session = st.session_state.pomodoro_state['session_type']
-                sessions_completed = st.session_state.pomodoro_state['sessions_completed']
-                
-                if current_session == 'work':
-                    st.session_state.pomodoro_state['sessions_completed'] += 1
-                    if st.session_state.pomodoro_state['sessions_completed'] % 4 == 0:
-                        st.session_state.pomodoro_state['session_type'] = 'long_break'
-                        st.session_state.pomodoro_state['duration'] = st.session_state.pomodoro_state['long_break_duration'] * 60
-                    else:
-                        st.session_state.pomodoro_state['session_type'] = 'short_break'
-                        st.session_state.pomodoro_state['duration'] = st.session_state.pomodoro_state['short_break_duration'] * 60
-                    st.success("Work session completed! Time for a break!")
-                else:
-                    st.session_state.pomodoro_state['session_type'] = 'work'
-                    st.session_state.pomodoro_state['duration'] = st.session_state.pomodoro_state['work_duration'] * 60
-                    st.success("Break's over! Back to work!")
-                st.rerun()
+            pomodoro_phase_watcher(pomodoro.remaining(st.session_state.pomodoro_state))
     
     with col2:
         st.subheader("Timer Settings")
@@ -1130,15 +1019,8 @@ def pomodoro_page():
         
         if st.button("Apply Settings", key="apply_settings"):
             if not st.session_state.pomodoro_state['is_running']:
-                st.session_state.pomodoro_state['work_duration'] = work_duration
-                st.session_state.pomodoro_state['short_break_duration'] = short_break_duration
-                st.session_state.pomodoro_state['long_break_duration'] = long_break_duration
-                if st.session_state.pomodoro_state['session_type'] == 'work':
-                    st.session_state.pomodoro_state['duration'] = work_duration * 60
-                elif st.session_state.pomodoro_state['session_type'] == 'short_break':
-                    st.session_state.pomodoro_state['duration'] = short_break_duration * 60
-                elif st.session_state.pomodoro_state['session_type'] == 'long_break':
-                    st.session_state.pomodoro_state['duration'] = long_break_duration * 60
+                pomodoro.apply_settings(st.session_state.pomodoro_state,
+                                        work_duration, short_break_duration, long_break_duration)
                 st.success("Settings updated!")
                 st.rerun()
             else:
@@ -1152,12 +1034,74 @@ def pomodoro_page():
                 "After every 4 work sessions, take a longer break to recharge!")
         st.markdown('</div>', unsafe_allow_html=True)
 
-def main():
-    initialize_session_state()
+def profiling_panel(profile):
+    """Collapsible sidebar breakdown of this rerun and of the process totals"""
+    with st.sidebar.expander("⏱️ Profiling", expanded=False):
+        st.metric("This rerun", f"{profile['total'] * 1000:.1f} ms")
+        st.caption(f"Allocated: {profile['alloc_peak'] / 1024:,.0f} KiB peak, "
+                   f"{profile['alloc_net'] / 1024:+,.0f} KiB retained")
+        st.dataframe([{'Section': f"{kind}: {name}", 'ms': round(seconds * 1000, 2)}
+                      for kind, name, seconds in profile['timings']],
+                     hide_index=True, use_container_width=True)
+        st.caption("Process totals")
+        st.dataframe([{'Section': f"{kind}: {name}", 'Calls': count,
+                       'Total ms': round(total * 1000, 1), 'Max ms': round(slowest * 1000, 2)}
+                      for kind, name, count, total, slowest in profiling.REGISTRY.totals()[:15]],
+                     hide_index=True, use_container_width=True)
+
+# Import / export
+EXPORT_MIME_TYPES = {'jsonl': 'application/x-ndjson', 'csv': 'application/zip', 'parquet': 'application/zip'}
+
+def data_transfer_panel():
+    """Sidebar backup and restore of the current user's data"""
+    # Loaded on first use, so the login page never pays for it
+    import transfer
+    username = st.session_state.current_user
+    with st.sidebar.expander("💾 Import / Export"):
+        formats = ['jsonl', 'csv'] + (['parquet'] if transfer.parquet_available() else [])
+        export_format = st.selectbox("Export Format", formats, key="export_format",
+                                     format_func=lambda x: "JSON Lines" if x == 'jsonl' else f"{x.upper()} (zip)")
+        if st.button("Prepare Export", key="prepare_export"):
+            buffer = io.BytesIO()
+            get_service().export_records(username, buffer, export_format)
+            st.session_state.export_file = (export_format, buffer.getvalue())
+        export = st.session_state.get('export_file')
+        if export and export[0] == export_format:
+            extension = 'jsonl' if export_format == 'jsonl' else 'zip'
+            st.download_button("⬇️ Download", export[1], file_name=f"productivity_hub_{username}.{extension}",
+                               mime=EXPORT_MIME_TYPES[export_format], key="download_export")
+
+        uploaded = st.file_uploader("Import File", type=['jsonl', 'zip'], key="import_file")
+        if uploaded is not None and st.button("Import", key="import_records"):
+            st.session_state.import_summary = get_service().import_records(username, uploaded)
+            st.session_state.pop('export_file', None)
+            st.rerun()
+        summary = st.session_state.get('import_summary')
+        if summary:
+            imported = ", ".join(f"{count} {kind}" for kind, count in summary['imported'].items())
+            st.success(f"Imported {imported}.")
+            if summary['skipped']:
+                st.warning(f"Skipped {summary['skipped']} invalid records:\n\n" +
+                           "\n".join(f"- {error}" for error in summary['errors']))
+
+REMINDER_ICONS = {'due_soon': "⏰", 'overdue': "⚠️"}
+
+def show_reminders():
+    """Toast the due-date reminders fired since this user's last rerun"""
+    for notification in get_service().notifications(st.session_state.current_user):
+        if notification['kind'] == 'overdue':
+            message = f"Overdue: {notification['text']} (was due {notification['due']})"
+        else:
+            message = f"Due soon: {notification['text']} (due {notification['due']})"
+        st.toast(message, icon=REMINDER_ICONS[notification['kind']])
+
+def render_app():
     if not st.session_state.logged_in:
-        login_signup_page()
+        with profiling.timer('page', "Login"):
+            login_signup_page()
     else:
-        st.sidebar.title(f"Hello, {st.session_state.users[st.session_state.current_user]['full_name']}!")
+        st.sidebar.title(f"Hello, {current_user_data().profile['full_name']}!")
+        show_reminders()
         page = st.sidebar.selectbox(
             "Navigate",
             ["Dashboard", "Tasks", "Habits", "Goals", "Notes", "Pomodoro"],
@@ -1168,21 +1112,39 @@ def main():
                                 f"📝 {x}" if x == "Notes" else 
                                 f"⏰ {x}" if x == "Pomodoro" else x
         )
-        if page == "Dashboard":
-            dashboard_page()
-        elif page == "Tasks":
-            enhanced_todo_page()
-        elif page == "Habits":
-            habits_page()
-        elif page == "Goals":
-            goals_page()
-        elif page == "Notes":
-            enhanced_notes_page()
-        elif page == "Pomodoro":
-            pomodoro_page()
+        # Sessions of the same user take turns; other users are unaffected
+        with current_user_data().lock, profiling.timer('page', page):
+            if page == "Dashboard":
+                dashboard_page()
+            elif page == "Tasks":
+                enhanced_todo_page()
+            elif page == "Habits":
+                habits_page()
+            elif page == "Goals":
+                goals_page()
+            elif page == "Notes":
+                enhanced_notes_page()
+            elif page == "Pomodoro":
+                pomodoro_page()
+        data_transfer_panel()
         if st.sidebar.button("🚪 Logout"):
             logout_user()
             st.rerun()
 
+def main():
+    initialize_session_state()
+    if not profiling.enabled(st.query_params.get('profile')):
+        render_app()
+        return
+
+    profiling.serve_metrics()
+    profiling.begin_rerun()
+    try:
+        render_app()
+    finally:
+        # Reruns cut short by st.rerun() still count towards the totals
+        profile = profiling.end_rerun()
+    profiling_panel(profile)
+
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -0,0 +1,125 @@
+import base64
+import hashlib
+import hmac
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+# scrypt cost: 2**14 iterations, 16 MiB of memory, a few tens of ms per hash
+SCRYPT_N = 2 ** 14
+SCRYPT_R = 8
+SCRYPT_P = 1
+SALT_BYTES = 16
+KEY_BYTES = 32
+
+# hashlib.scrypt releases the GIL, so a few worker threads use a few cores;
+# the pool is bounded so a burst of logins can't starve page rendering
+KDF_WORKERS = max(2, min(4, os.cpu_count() or 1))
+KDF_MAX_PENDING = 64
+
+# Login attempts: a burst of 5, then one more every 12 seconds per username
+LOGIN_BURST = 5
+LOGIN_REFILL_SECONDS = 12
+
+# Buckets tracked before fully refilled ones are dropped
+LIMITER_PRUNE_AT = 10000
+
+
+class Busy(Exception):
+    """Raised when the password hashing queue is full"""
+
+
+def _b64(data):
+    return base64.b64encode(data).decode('ascii')
+
+
+def hash_password(password, salt=None):
+    """Return a salted scrypt hash encoded as scrypt$n$r$p$salt$key"""
+    salt = salt or os.urandom(SALT_BYTES)
+    key = hashlib.scrypt(password.encode('utf-8'), salt=salt, n=SCRYPT_N, r=SCRYPT_R, p=SCRYPT_P,
+                         maxmem=256 * SCRYPT_N * SCRYPT_R, dklen=KEY_BYTES)
+    return f"scrypt${SCRYPT_N}${SCRYPT_R}${SCRYPT_P}${_b64(salt)}${_b64(key)}"
+
+
+def is_hashed(stored):
+    return stored.startswith('scrypt$')
+
+
+def verify_password(password, stored):
+    """Check a password against a stored hash in constant time.
+
+    Accounts created before hashing was added hold the plaintext password;
+    those are compared directly and should be rehashed by the caller.
+    """
+    if not is_hashed(stored):
+        return hmac.compare_digest(password.encode('utf-8'), stored.encode('utf-8'))
+    _, n, r, p, salt, key = stored.split('$')
+    expected = base64.b64decode(key)
+    actual = hashlib.scrypt(password.encode('utf-8'), salt=base64.b64decode(salt), n=int(n), r=int(r),
+                            p=int(p), maxmem=256 * int(n) * int(r), dklen=len(expected))
+    return hmac.compare_digest(actual, expected)
+
+
+class KdfPool:
+    """Bounded worker pool that runs password hashing off the script threads"""
+
+    def __init__(self, workers=KDF_WORKERS, max_pending=KDF_MAX_PENDING):
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='kdf')
+        self._slots = threading.BoundedSemaphore(max_pending)
+
+    def _submit(self, fn, *args):
+        if not self._slots.acquire(blocking=False):
+            raise Busy()
+        future = self._executor.submit(fn, *args)
+        future.add_done_callback(lambda _: self._slots.release())
+        return future
+
+    def hash(self, password):
+        """Hash a password on the pool and wait for the result"""
+        return self._submit(hash_password, password).result()
+
+    def verify(self, password, stored):
+        """Verify a password on the pool and wait for the result"""
+        return self._submit(verify_password, password, stored).result()
+
+    def shutdown(self):
+        self._executor.shutdown(wait=True)
+
+
+class TokenBucketLimiter:
+    """Per-key token buckets: `burst` attempts at once, refilled at one per `refill_seconds`"""
+
+    def __init__(self, burst=LOGIN_BURST, refill_seconds=LOGIN_REFILL_SECONDS, clock=time.monotonic):
+        self.burst = burst
+        self.refill_seconds = refill_seconds
+        self.clock = clock
+        self._buckets = {}
+        self._lock = threading.Lock()
+
+    def allow(self, key):
+        """Take one token for key; False when the bucket is empty"""
+        now = self.clock()
+        with self._lock:
+            tokens, updated = self._buckets.get(key, (self.burst, now))
+            tokens = min(self.burst, tokens + (now - updated) / self.refill_seconds)
+            allowed = tokens >= 1
+            if allowed:
+                tokens -= 1
+            self._buckets[key] = (tokens, now)
+            if len(self._buckets) > LIMITER_PRUNE_AT:
+                self._prune(now)
+            return allowed
+
+    def _prune(self, now):
+        # A bucket that has refilled completely is the same as no bucket
+        full_after = self.burst * self.refill_seconds
+        self._buckets = {k: (tokens, updated) for k, (tokens, updated) in self._buckets.items()
+                         if now - updated < full_after}
+
+    def retry_after(self, key):
+        """Seconds until key gets its next token"""
+        with self._lock:
+            tokens, updated = self._buckets.get(key, (self.burst, self.clock()))
+        elapsed = self.clock() - updated
+        return max(0.0, (1 - tokens) * self.refill_seconds - elapsed)
@@ -0,0 +1,155 @@
+"""Load test of the JSON API against a local instance.
+
+Starts `python api.py` with in-memory storage in a subprocess, signs up
+a user, creates --tasks tasks through /api/batch, then runs --connections
+keep-alive clients for --seconds. Each client loops over a mix of task
+page reads (conditional on the ETag from its last read), single task
+reads and toggles. Reports requests per second and latency percentiles
+per request type. Run from the repository root:
+
+    python benchmarks/api_load.py --connections 32 --seconds 10
+"""
+import argparse
+import asyncio
+import http.client
+import json
+import os
+import random
+import socket
+import subprocess
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def call(port, method, path, body=None, token=None):
+    conn = http.client.HTTPConnection('127.0.0.1', port, timeout=60)
+    headers = {'Content-Type': 'application/json'}
+    if token:
+        headers['Authorization'] = f"Bearer {token}"
+    conn.request(method, path, json.dumps(body) if body is not None else None, headers)
+    response = conn.getresponse()
+    payload = json.loads(response.read() or b'null')
+    conn.close()
+    if response.status >= 400:
+        raise RuntimeError(f"{method} {path}: {response.status} {payload}")
+    return payload
+
+
+def wait_for(port, process):
+    deadline = time.time() + 30
+    while time.time() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError("api.py exited during startup")
+        try:
+            socket.create_connection(('127.0.0.1', port), timeout=1).close()
+            return
+        except OSError:
+            time.sleep(0.1)
+    raise RuntimeError("api.py did not start listening")
+
+
+async def request(reader, writer, method, path, token, body=None, etag=None):
+    """Send one request on a keep-alive connection; returns (status, headers, body)"""
+    payload = json.dumps(body).encode() if body is not None else b''
+    head = f"{method} {path} HTTP/1.1\r\nHost: localhost\r\nAuthorization: Bearer {token}\r\n"
+    if etag:
+        head += f"If-None-Match: {etag}\r\n"
+    head += f"Content-Length: {len(payload)}\r\n\r\n"
+    writer.write(head.encode() + payload)
+    response = await reader.readuntil(b'\r\n\r\n')
+    status_line, *lines = response.decode('latin-1').split('\r\n')
+    headers = {}
+    for line in lines:
+        if line:
+            name, _, value = line.partition(':')
+            headers[name.lower()] = value.strip()
+    data = await reader.readexactly(int(headers.get('content-length', 0)))
+    return int(status_line.split(' ')[1]), headers, data
+
+
+async def client(port, token, task_ids, deadline, seed, latencies):
+    rng = random.Random(seed)
+    reader, writer = await asyncio.open_connection('127.0.0.1', port)
+    etag = None
+    try:
+        while time.perf_counter() < deadline:
+            roll = rng.random()
+            started = time.perf_counter()
+            if roll < 0.6:
+                kind = 'list (conditional)'
+                status, headers, _ = await request(reader, writer, 'GET', '/api/tasks?limit=25&sort=Priority',
+                                                   token, etag=etag)
+                etag = headers.get('etag', etag)
+                if status == 304:
+                    kind = 'list (304)'
+            elif roll < 0.9:
+                kind = 'get task'
+                status, _, _ = await request(reader, writer, 'GET', f"/api/tasks/{rng.choice(task_ids)}", token)
+            else:
+                kind = 'toggle'
+                status, _, _ = await request(reader, writer, 'POST', f"/api/tasks/{rng.choice(task_ids)}/toggle",
+                                             token)
+            if status >= 400:
+                raise RuntimeError(f"{kind} failed with {status}")
+            latencies.setdefault(kind, []).append(time.perf_counter() - started)
+    finally:
+        writer.close()
+
+
+async def run_clients(port, token, task_ids, connections, seconds):
+    latencies = {}
+    deadline = time.perf_counter() + seconds
+    await asyncio.gather(*(client(port, token, task_ids, deadline, seed, latencies)
+                           for seed in range(connections)))
+    return latencies
+
+
+def percentile(values, fraction):
+    return values[min(len(values) - 1, int(len(values) * fraction))]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--connections', type=int, default=32)
+    parser.add_argument('--seconds', type=float, default=10)
+    parser.add_argument('--tasks', type=int, default=2000)
+    args = parser.parse_args()
+
+    port = free_port()
+    server = subprocess.Popen([sys.executable, os.path.join(ROOT, 'api.py'), '--port', str(port),
+                               '--backend', 'memory'], cwd=ROOT, stdout=subprocess.DEVNULL)
+    try:
+        wait_for(port, server)
+        call(port, 'POST', '/api/signup', {'username': 'load', 'password': 'secret'})
+        token = call(port, 'POST', '/api/login', {'username': 'load', 'password': 'secret'})['token']
+        task_ids = []
+        for start in range(0, args.tasks, 1000):
+            operations = [{'op': 'add_task', 'text': f"task {i}", 'priority': random.choice(['Low', 'Medium', 'High'])}
+                          for i in range(start, min(start + 1000, args.tasks))]
+            results = call(port, 'POST', '/api/batch', {'operations': operations}, token)['results']
+            task_ids += [result['result']['id'] for result in results]
+
+        latencies = asyncio.run(run_clients(port, token, task_ids, args.connections, args.seconds))
+    finally:
+        server.terminate()
+        server.wait()
+
+    total = sum(len(values) for values in latencies.values())
+    print(f"{total} requests over {args.connections} connections in {args.seconds:.0f}s: "
+          f"{total / args.seconds:,.0f} requests/s")
+    for kind, values in sorted(latencies.items()):
+        values.sort()
+        print(f"  {kind:<20} {len(values):>8}   p50 {percentile(values, 0.5) * 1000:6.2f} ms   "
+              f"p99 {percentile(values, 0.99) * 1000:6.2f} ms")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,120 @@
+"""Throughput of bulk import and export through transfer.py.
+
+Writes a JSONL file of synthetic tasks, imports it into a fresh store,
+exports it back in each format and reports records per second and the
+peak Python memory of the import. With SQLite it also times parsing the
+same lines and upserting them unvalidated, the ceiling for an import on
+the machine at hand.
+
+The target is 100,000 tasks/s into SQLite, and it is not met. On the
+single-core reference host (a 10M-step Python loop takes 1.8 s), 100,000
+tasks import at 33,000-35,000 tasks/s against a floor of about 38,000.
+json.loads and SQLite's upsert alone leave no room for the target there.
+Run from the repository root:
+
+    python benchmarks/bulk_import.py --tasks 500000 --backend sqlite
+"""
+import argparse
+import io
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+import tracemalloc
+import uuid
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import storage  # noqa: E402
+import transfer  # noqa: E402
+
+
+def write_tasks(path, count, seed=0):
+    rng = random.Random(seed)
+    start = datetime(2024, 1, 1)
+    with open(path, 'w') as f:
+        for i in range(count):
+            created = start + timedelta(minutes=rng.randrange(500000))
+            completed = rng.random() < 0.4
+            f.write(json.dumps({
+                'kind': 'tasks',
+                'id': str(uuid.UUID(int=rng.getrandbits(128), version=4)),
+                'text': f"synthetic task {i}",
+                'completed': completed,
+                'priority': rng.choice(['Low', 'Medium', 'High']),
+                'category': rng.choice(['Work', 'Personal', 'Health', 'Learning']),
+                'due_date': (created + timedelta(days=rng.randrange(30))).date().isoformat()
+                if rng.random() < 0.5 else None,
+                'created_at': created.isoformat(sep=' ', timespec='minutes'),
+                'completed_at': (created + timedelta(hours=5)).isoformat(sep=' ', timespec='minutes')
+                if completed else None,
+                'time_spent': 0,
+                'recurrence': None,
+                'completions': []
+            }) + '\n')
+
+
+def parse_and_insert(store, source, batch_size):
+    """Seconds to parse every line and upsert it unvalidated, as a second user: the most an import can do"""
+    started = time.perf_counter()
+    with open(source) as f:
+        batch = []
+        for line in f:
+            record = json.loads(line)
+            del record['kind']
+            batch.append(record)
+            if len(batch) == batch_size:
+                store.insert_records('tasks', 'floor', batch)
+                batch = []
+        if batch:
+            store.insert_records('tasks', 'floor', batch)
+    return time.perf_counter() - started
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--tasks', type=int, default=200000)
+    parser.add_argument('--backend', choices=['sqlite', 'eventlog', 'memory'], default='sqlite')
+    parser.add_argument('--batch-size', type=int, default=transfer.IMPORT_BATCH_SIZE)
+    parser.add_argument('--trace-memory', action='store_true',
+                        help="measure peak memory of the import (slows it down)")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        source = os.path.join(tmp, 'tasks.jsonl')
+        write_tasks(source, args.tasks)
+        store = storage.open_storage(args.backend, os.path.join(tmp, 'bench.db'))
+        store.save_user('bulk', {'full_name': 'Bulk'}, {})
+
+        if args.trace_memory:
+            tracemalloc.start()
+        started = time.perf_counter()
+        with open(source, 'rb') as f:
+            summary = transfer.import_user(store, 'bulk', f, args.batch_size)
+        elapsed = time.perf_counter() - started
+        peak = tracemalloc.get_traced_memory()[1] if args.trace_memory else None
+        tracemalloc.stop()
+        assert summary['imported']['tasks'] == args.tasks and not summary['skipped'], summary
+        print(f"import jsonl:  {args.tasks / elapsed:>10,.0f} tasks/s ({elapsed:.2f}s)"
+              + (f", peak {peak / 2 ** 20:.1f} MiB" if peak is not None else ""))
+        if args.backend == 'sqlite':
+            floor = parse_and_insert(store, source, args.batch_size)
+            print(f"  floor:       {args.tasks / floor:>10,.0f} tasks/s (json.loads and the upsert alone; "
+                  f"import at {floor / elapsed:.0%} of it)")
+
+        for fmt in transfer.FORMATS:
+            if fmt == 'parquet' and not transfer.parquet_available():
+                continue
+            out = io.BytesIO()
+            started = time.perf_counter()
+            transfer.export_user(store, 'bulk', out, fmt)
+            elapsed = time.perf_counter() - started
+            print(f"export {fmt + ':':<8}{args.tasks / elapsed:>10,.0f} tasks/s ({len(out.getvalue()) / 2 ** 20:.1f} MiB)")
+        store.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,191 @@
+"""Throughput of the JSON API as cluster.py workers are added behind the sticky proxy.
+
+For each worker count in --workers, starts `python cluster.py --app api`
+on a fresh SQLite database, signs up --users users through the proxy and
+gives each --tasks tasks. Each user logs in once; its token works on any
+worker, which a read sent without the worker cookie checks. Everything
+else keeps the cookie from the login response, so each user's working
+set stays cached on one worker. Then --client-processes
+processes drive --connections keep-alive connections for --seconds, mostly
+full reads of a 100-task page, which are CPU-bound in the worker, with
+some toggles. Reports requests per second and the speedup over one
+worker. Scaling is near-linear until workers plus client processes reach
+the core count. Run from the repository root:
+
+    python benchmarks/cluster_scaling.py --workers 1 2 4 8 --seconds 10
+"""
+import argparse
+import asyncio
+import http.client
+import json
+import os
+import random
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+sys.path.insert(0, ROOT)
+
+import cluster  # noqa: E402
+
+PAGE = '/api/tasks?sort=Priority&limit=100'
+
+
+def free_port_range(count):
+    """A base port with count + 1 free consecutive ports after it, for the proxy and the workers"""
+    while True:
+        with socket.socket() as sock:
+            sock.bind(('127.0.0.1', 0))
+            base = sock.getsockname()[1]
+        if base + count + 1 >= 65536:
+            continue
+        try:
+            for port in range(base, base + count + 1):
+                with socket.socket() as sock:
+                    sock.bind(('127.0.0.1', port))
+            return base
+        except OSError:
+            continue
+
+
+def wait_for(port, process):
+    deadline = time.time() + 60
+    while time.time() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError("cluster.py exited during startup")
+        try:
+            socket.create_connection(('127.0.0.1', port), timeout=1).close()
+            return
+        except OSError:
+            time.sleep(0.1)
+    raise RuntimeError(f"nothing listening on port {port}")
+
+
+def call(port, method, path, body=None, token=None, cookie=None):
+    """One request on a fresh connection; returns (payload, worker cookie)"""
+    conn = http.client.HTTPConnection('127.0.0.1', port, timeout=60)
+    headers = {'Content-Type': 'application/json'}
+    if token:
+        headers['Authorization'] = f"Bearer {token}"
+    if cookie:
+        headers['Cookie'] = cookie
+    conn.request(method, path, json.dumps(body) if body is not None else None, headers)
+    response = conn.getresponse()
+    payload = json.loads(response.read() or b'null')
+    set_cookie = response.getheader('Set-Cookie')
+    conn.close()
+    if response.status >= 400:
+        raise RuntimeError(f"{method} {path}: {response.status} {payload}")
+    return payload, set_cookie.split(';')[0] if set_cookie else cookie
+
+
+def set_up_users(port, users, tasks, seed):
+    """Sign up and fill users through the proxy; returns (token, cookie, task ids) for each"""
+    rng = random.Random(seed)
+    sessions = []
+    for i in range(users):
+        username = f"load{i}"
+        call(port, 'POST', '/api/signup', {'username': username, 'password': 'secret'})
+        login, cookie = call(port, 'POST', '/api/login', {'username': username, 'password': 'secret'})
+        operations = [{'op': 'add_task', 'text': f"task {n} for {username}",
+                       'priority': rng.choice(['Low', 'Medium', 'High'])} for n in range(tasks)]
+        batch, _ = call(port, 'POST', '/api/batch', {'operations': operations}, login['token'], cookie)
+        call(port, 'GET', '/api/stats', token=login['token'])
+        sessions.append((login['token'], cookie, [result['result']['id'] for result in batch['results']]))
+    return sessions
+
+
+async def request(reader, writer, method, path, token, cookie):
+    writer.write(f"{method} {path} HTTP/1.1\r\nHost: localhost\r\nAuthorization: Bearer {token}\r\n"
+                 f"Cookie: {cookie}\r\nContent-Length: 0\r\n\r\n".encode())
+    head = await reader.readuntil(b'\r\n\r\n')
+    status = int(head.split(b' ', 2)[1])
+    length = 0
+    for line in head.split(b'\r\n'):
+        if line.lower().startswith(b'content-length:'):
+            length = int(line.split(b':')[1])
+    await reader.readexactly(length)
+    if status >= 400:
+        raise RuntimeError(f"{method} {path} failed with {status}")
+
+
+async def connection(port, session, deadline, rng):
+    token, cookie, task_ids = session
+    reader, writer = await asyncio.open_connection('127.0.0.1', port)
+    done = 0
+    try:
+        while time.time() < deadline:
+            if rng.random() < 0.8:
+                await request(reader, writer, 'GET', PAGE, token, cookie)
+            else:
+                await request(reader, writer, 'POST', f"/api/tasks/{rng.choice(task_ids)}/toggle", token, cookie)
+            done += 1
+    finally:
+        writer.close()
+    return done
+
+
+def run_clients(port, sessions, deadline, seed):
+    """Drive one keep-alive connection per session until deadline; returns requests completed"""
+    async def run():
+        rng = random.Random(seed)
+        counts = await asyncio.gather(*(connection(port, session, deadline, rng) for session in sessions))
+        return sum(counts)
+    return asyncio.run(run())
+
+
+def measure(workers, args):
+    base = free_port_range(workers)
+    with tempfile.TemporaryDirectory() as directory:
+        db = os.path.join(directory, 'cluster.db')
+        proxy = subprocess.Popen([sys.executable, cluster.__file__, '--app', 'api', '--workers', str(workers),
+                                  '--port', str(base), '--worker-port', str(base + 1), '--db', db],
+                                 cwd=ROOT, stdout=subprocess.DEVNULL)
+        try:
+            for port in range(base, base + workers + 1):
+                wait_for(port, proxy)
+            sessions = set_up_users(base, args.users, args.tasks, args.seed)
+            # Spread the connections over users, and users over client processes
+            connections = [sessions[i % len(sessions)] for i in range(args.connections)]
+            shares = [connections[i::args.client_processes] for i in range(args.client_processes)]
+            with ProcessPoolExecutor(args.client_processes) as pool:
+                # Started together once every client process is up
+                deadline = time.time() + 2 + args.seconds
+                futures = [pool.submit(run_clients, base, share, deadline, args.seed + i)
+                           for i, share in enumerate(shares) if share]
+                total = sum(future.result() for future in futures)
+        finally:
+            proxy.terminate()
+            proxy.wait()
+    return total / args.seconds
+
+
+def main():
+    cores = os.cpu_count() or 1
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--workers', type=int, nargs='+',
+                        default=sorted({1, 2, 4, 8, 16, cores} & set(range(1, cores + 1))))
+    parser.add_argument('--users', type=int, default=64)
+    parser.add_argument('--tasks', type=int, default=500, help="tasks per user")
+    parser.add_argument('--connections', type=int, default=64)
+    parser.add_argument('--client-processes', type=int, default=max(1, cores // 4))
+    parser.add_argument('--seconds', type=float, default=10)
+    parser.add_argument('--seed', type=int, default=1)
+    args = parser.parse_args()
+
+    print(f"{cores} cores, {args.client_processes} client processes, {args.connections} connections")
+    print(f"{'workers':>8} {'requests/s':>12} {'speedup':>9} {'per worker':>11}")
+    baseline = None
+    for workers in args.workers:
+        rate = measure(workers, args)
+        baseline = baseline or rate / workers
+        print(f"{workers:>8} {rate:>12,.0f} {rate / baseline:>8.2f}x {rate / baseline / workers:>10.0%}")
+
+
+if __name__ == '__main__':
+    main()
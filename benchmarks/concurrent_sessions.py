@@ -0,0 +1,127 @@
+"""Run many simulated sessions against one shared DataService.
+
+Each session is a thread that logs in as one of a few users and performs
+a random mix of the same mutations the pages make. Several sessions share
+each user, the way browser tabs do. At the end every user's working set,
+statistics and indexes are checked against each other and against what
+was written to storage. Run from the repository root:
+
+    python benchmarks/concurrent_sessions.py --sessions 64 --users 8 --backend sqlite
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+from datetime import date, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import auth  # noqa: E402
+import storage  # noqa: E402
+from service import DataService  # noqa: E402
+
+
+def run_session(service, username, operations, seed, errors):
+    rng = random.Random(seed)
+    try:
+        success, message = service.authenticate(username, 'secret')
+        assert success, message
+        data = service.user(username)
+        for _ in range(operations):
+            roll = rng.random()
+            if roll < 0.35:
+                data.add_task(f"task {rng.random():.6f}", rng.choice(['Low', 'Medium', 'High']),
+                              rng.choice(['Work', 'Home', 'Health']))
+            elif roll < 0.55:
+                with data.lock:
+                    task_ids = data.task_index.page("Created Date", 0, 20)
+                if task_ids:
+                    data.toggle_task(rng.choice(task_ids))
+            elif roll < 0.65:
+                with data.lock:
+                    task_ids = data.task_index.page("Created Date", 0, 20)
+                if task_ids:
+                    data.delete_task(rng.choice(task_ids))
+            elif roll < 0.75:
+                data.add_note(f"note {rng.randrange(1000)}", "meeting notes about the quarterly plan")
+            elif roll < 0.85:
+                habit = data.add_habit(f"habit {rng.randrange(100)}", 'daily')
+                data.mark_habit_complete(habit.id, date.today() - timedelta(days=rng.randrange(3)))
+            elif roll < 0.9:
+                goal = data.add_goal("goal", "description", date.today(), 'Personal')
+                data.update_goal_progress(goal.id, rng.randrange(101))
+            else:
+                with data.lock:
+                    data.stats.snapshot()
+                    data.note_index.search("quart")
+    except Exception as exc:  # reported after all sessions finish
+        errors.append((username, repr(exc)))
+
+
+def check_user(service, username):
+    """Return a list of inconsistencies in one user's shared state"""
+    data = service.user(username)
+    problems = []
+    stats = data.stats.snapshot()
+    if stats['total_tasks'] != len(data.tasks):
+        problems.append(f"stats count {stats['total_tasks']} != {len(data.tasks)} tasks")
+    if len(data.task_index) != len(data.tasks):
+        problems.append(f"task index holds {len(data.task_index)} of {len(data.tasks)} tasks")
+    if len(data.note_index) != len(data.notes):
+        problems.append(f"note index holds {len(data.note_index)} of {len(data.notes)} notes")
+    for kind in storage.KINDS:
+        stored = {r['id']: r for r in service.storage.load_records(kind, username)}
+        in_memory = {r.id: r.to_dict() for r in getattr(data, kind)}
+        if stored != in_memory:
+            problems.append(f"{kind}: {len(stored)} stored vs {len(in_memory)} in memory")
+    return problems
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--sessions', type=int, default=64)
+    parser.add_argument('--users', type=int, default=8)
+    parser.add_argument('--operations', type=int, default=200)
+    parser.add_argument('--backend', choices=['sqlite', 'eventlog', 'memory'], default='sqlite')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        # Every session logs in once; allow that many attempts per user
+        service = DataService(storage.open_storage(args.backend, os.path.join(tmp, 'bench.db')),
+                              login_limiter=auth.TokenBucketLimiter(burst=args.sessions))
+        usernames = [f"user{i}" for i in range(args.users)]
+        for username in usernames:
+            service.signup(username, 'secret', f"{username}@example.com", username.title())
+
+        errors = []
+        threads = [
+            threading.Thread(target=run_session,
+                             args=(service, usernames[i % args.users], args.operations, i, errors))
+            for i in range(args.sessions)
+        ]
+        started = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - started
+
+        problems = errors + [(u, p) for u in usernames for p in check_user(service, u)]
+        total_ops = args.sessions * args.operations
+        print(f"backend:     {args.backend}")
+        print(f"sessions:    {args.sessions} over {args.users} users")
+        print(f"operations:  {total_ops} in {elapsed:.2f}s ({total_ops / elapsed:,.0f} ops/s)")
+        service.storage.close()
+
+    if problems:
+        for username, problem in problems:
+            print(f"FAIL {username}: {problem}")
+        sys.exit(1)
+    print("OK: shared state is consistent")
+
+
+if __name__ == '__main__':
+    main()
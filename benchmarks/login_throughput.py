@@ -0,0 +1,82 @@
+"""Measure login throughput and latency with scrypt hashing under concurrency.
+
+Simulated clients log in concurrently through DataService.authenticate,
+so each login runs its password check on the bounded KDF pool. Run from
+the repository root:
+
+    python benchmarks/login_throughput.py --clients 32 --logins 20
+"""
+import argparse
+import os
+import statistics
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import auth  # noqa: E402
+import storage  # noqa: E402
+from service import DataService  # noqa: E402
+
+
+def percentile(samples, fraction):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--clients', type=int, default=32)
+    parser.add_argument('--logins', type=int, default=20, help="logins per client")
+    parser.add_argument('--users', type=int, default=16)
+    parser.add_argument('--workers', type=int, default=auth.KDF_WORKERS, help="KDF pool threads")
+    args = parser.parse_args()
+
+    service = DataService(
+        storage.open_storage('memory'),
+        kdf=auth.KdfPool(workers=args.workers, max_pending=args.clients),
+        # Measure hashing, not the limiter
+        login_limiter=auth.TokenBucketLimiter(burst=args.clients * args.logins)
+    )
+    usernames = [f"user{i}" for i in range(args.users)]
+    for username in usernames:
+        service.signup(username, 'correct horse', f"{username}@example.com", username)
+
+    latencies = []
+    failures = []
+    lock = threading.Lock()
+
+    def client(index):
+        username = usernames[index % len(usernames)]
+        for _ in range(args.logins):
+            started = time.perf_counter()
+            success, message = service.authenticate(username, 'correct horse')
+            elapsed = time.perf_counter() - started
+            with lock:
+                latencies.append(elapsed)
+                if not success:
+                    failures.append(message)
+
+    threads = [threading.Thread(target=client, args=(i,)) for i in range(args.clients)]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    wall = time.perf_counter() - started
+    service.kdf.shutdown()
+
+    print(f"clients:     {args.clients} x {args.logins} logins, {args.workers} KDF workers")
+    print(f"throughput:  {len(latencies) / wall:,.1f} logins/s")
+    print(f"latency:     p50 {statistics.median(latencies) * 1000:.1f} ms, "
+          f"p99 {percentile(latencies, 0.99) * 1000:.1f} ms, "
+          f"max {max(latencies) * 1000:.1f} ms")
+    print(f"failures:    {len(failures)}")
+    if failures:
+        print(f"first:       {failures[0]}")
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,77 @@
+"""Compare the memory held by dict-shaped records and typed records.
+
+Run from the repository root:
+
+    python benchmarks/record_memory.py --count 200000
+"""
+import argparse
+import os
+import random
+import sys
+import tracemalloc
+import uuid
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from records import Task  # noqa: E402
+
+CATEGORIES = ['Work', 'Personal', 'Health', 'Learning', 'General']
+PRIORITIES = ['Low', 'Medium', 'High']
+
+
+def make_task_dicts(count, seed=0):
+    """Build tasks in the stored dict shape, as the app used to keep them"""
+    rng = random.Random(seed)
+    start = datetime(2024, 1, 1)
+    tasks = []
+    for i in range(count):
+        created = start + timedelta(minutes=rng.randrange(500000))
+        completed = rng.random() < 0.5
+        tasks.append({
+            'id': str(uuid.UUID(int=rng.getrandbits(128))),
+            'text': f"Task number {i}",
+            'completed': completed,
+            # Strings built at runtime, like values read back from storage
+            'priority': ''.join(rng.choice(PRIORITIES)),
+            'category': ''.join(rng.choice(CATEGORIES)),
+            'due_date': (created + timedelta(days=7)).strftime("%Y-%m-%d") if rng.random() < 0.3 else None,
+            'created_at': created.strftime("%Y-%m-%d %H:%M"),
+            'completed_at': (created + timedelta(hours=5)).strftime("%Y-%m-%d %H:%M") if completed else None,
+            'time_spent': 0,
+            'recurrence': None,
+            'completions': []
+        })
+    return tasks
+
+
+def measure(build):
+    """Return (result, bytes still allocated by build())"""
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    result = build()
+    after = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return result, after - before
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--count', type=int, default=100000)
+    args = parser.parse_args()
+
+    dicts, dict_bytes = measure(lambda: make_task_dicts(args.count))
+    # Converting from a throwaway copy means the tasks own their id and
+    # text strings instead of sharing them with the dicts measured above
+    tasks, task_bytes = measure(lambda: [Task.from_dict(d) for d in make_task_dicts(args.count)])
+
+    assert all(t.to_dict() == d for t, d in zip(tasks, dicts)), "round trip is not lossless"
+
+    print(f"records:          {args.count}")
+    print(f"dict records:     {dict_bytes / 2**20:8.1f} MiB ({dict_bytes / args.count:6.0f} B/record)")
+    print(f"Task records:     {task_bytes / 2**20:8.1f} MiB ({task_bytes / args.count:6.0f} B/record)")
+    print(f"saving:           {(1 - task_bytes / dict_bytes) * 100:8.1f} %")
+
+
+if __name__ == '__main__':
+    main()
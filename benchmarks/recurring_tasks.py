@@ -0,0 +1,103 @@
+"""Cost of repeating tasks on the task list, the "This Week" counts and the upcoming list.
+
+Builds one user with a mix of one-off tasks and repeating tasks whose
+rules started years ago, so each has thousands of potential occurrences
+and, with --done, hundreds or thousands of them marked done. Then times
+the reads each page rerun makes and the toggle of one occurrence. Run
+from the repository root:
+
+    python benchmarks/recurring_tasks.py --tasks 10000 --recurring 200 --years 10
+"""
+import argparse
+import os
+import random
+import sys
+import time
+import uuid
+from datetime import date, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import storage  # noqa: E402
+from records import Task  # noqa: E402
+from recurrence import Rule  # noqa: E402
+from service import DataService  # noqa: E402
+
+RULES = ('FREQ=DAILY', 'FREQ=WEEKLY;BYDAY=MO,WE,FR', 'FREQ=WEEKLY;INTERVAL=2', 'FREQ=MONTHLY')
+
+
+def time_call(fn, runs):
+    """Median seconds per call"""
+    samples = []
+    for _ in range(runs):
+        started = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - started)
+    return sorted(samples)[len(samples) // 2]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--tasks', type=int, default=10000, help="one-off tasks")
+    parser.add_argument('--recurring', type=int, default=200, help="repeating tasks")
+    parser.add_argument('--years', type=int, default=10, help="how long ago the repeating tasks started")
+    parser.add_argument('--done', type=float, default=0.5, help="share of past occurrences marked done")
+    parser.add_argument('--runs', type=int, default=50)
+    parser.add_argument('--seed', type=int, default=1)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    today = date.today()
+    store = storage.open_storage('memory')
+    service = DataService(store)
+    service.signup('bench', 'secret', 'bench@example.com', 'Bench')
+
+    # Stored directly and then loaded, as for a returning user
+    started = time.perf_counter()
+    tasks = []
+    for i in range(args.tasks):
+        due = today + timedelta(days=rng.randrange(-30, 60)) if rng.random() < 0.5 else None
+        tasks.append(Task(id=str(uuid.uuid4()), text=f"task {i}", priority=rng.choice(['Low', 'Medium', 'High']),
+                          category='Work', due_date=due))
+    occurrences = 0
+    for i in range(args.recurring):
+        start = today - timedelta(days=rng.randrange(args.years * 365))
+        task = Task(id=str(uuid.uuid4()), text=f"repeat {i}", category='Routine', due_date=start,
+                    recurrence=Rule.parse(rng.choice(RULES), start))
+        past = list(task.recurrence.between(start, today))
+        occurrences += len(past)
+        task.completions = set(rng.sample(past, int(len(past) * args.done))) or None
+        tasks.append(task)
+    store.insert_records('tasks', 'bench', [task.to_dict() for task in tasks])
+    data = service.user('bench')
+    print(f"{args.tasks} one-off and {args.recurring} repeating tasks, "
+          f"{occurrences} past occurrences, loaded in {time.perf_counter() - started:.1f}s")
+
+    index = data.task_index
+    repeating = [task for task in data.tasks if task.recurrence]
+    week_start = today - timedelta(days=today.weekday())
+
+    def snapshot():
+        data.stats._snapshot = None
+        data.stats.snapshot()
+
+    def toggle():
+        task = rng.choice(repeating)
+        data.toggle_occurrence(task.id, task.next_due)
+
+    results = {
+        'due date page (25 rows)': time_call(lambda: index.page("Due Date", 0, 25), args.runs),
+        'pending by due date page': time_call(
+            lambda: index.page("Due Date", 0, 25, index.by_status['Pending']), args.runs),
+        '"This Week" stats snapshot': time_call(snapshot, args.runs),
+        'upcoming 7 days': time_call(lambda: index.due_between(today, today + timedelta(days=6)), args.runs),
+        'week of occurrences, one rule': time_call(
+            lambda: list(repeating[0].recurrence.between(week_start, week_start + timedelta(days=6))), args.runs),
+        'toggle next occurrence': time_call(toggle, args.runs)
+    }
+    for name, seconds in results.items():
+        print(f"  {name:<32} {seconds * 1e6:>10.1f} us")
+
+
+if __name__ == '__main__':
+    main()
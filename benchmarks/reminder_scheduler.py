@@ -0,0 +1,87 @@
+"""Cost of scheduling, cancelling and firing reminders as the number pending grows.
+
+Fills one ReminderScheduler to each size in --sizes with reminders spread
+over the next year, then times a batch of schedules, cancels and
+reschedules at that size. Heap pushes grow with log n and cancels are
+constant, so the per-operation cost should barely move between ten
+thousand and a million pending reminders. Finally fires a day's worth of
+reminders. The filled heap is frozen out of the cyclic garbage collector
+unless --no-freeze is given. Run from the repository root:
+
+    python benchmarks/reminder_scheduler.py --sizes 10000 100000 1000000
+"""
+import argparse
+import gc
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import reminders  # noqa: E402
+
+YEAR = 365 * 86400
+ALWAYS_AT_WORK = {'notifications': True, 'work_hours': {'start': '00:00', 'end': '23:59'}}
+
+
+def per_op(fn, count):
+    started = time.perf_counter()
+    for i in range(count):
+        fn(i)
+    return (time.perf_counter() - started) / count
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--sizes', type=int, nargs='+', default=[10000, 100000, 1000000])
+    parser.add_argument('--users', type=int, default=1000)
+    parser.add_argument('--batch', type=int, default=20000, help="operations timed at each size")
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--no-freeze', action='store_true',
+                        help="leave the filled heap visible to the cyclic garbage collector")
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    start = time.time()
+    # A fixed clock keeps the firing thread asleep while the heap fills
+    scheduler = reminders.ReminderScheduler(clock=lambda: start)
+    users = [f"user{i}" for i in range(args.users)]
+    for username in users:
+        scheduler.register_user(username, ALWAYS_AT_WORK)
+
+    def schedule(i, prefix='task'):
+        username = users[i % len(users)]
+        scheduler.schedule(username, f"{prefix}{i}", 'overdue', start + rng.random() * YEAR,
+                           {'kind': 'overdue', 'username': username, 'text': "task", 'due': ''})
+
+    print(f"{'pending':>10} {'schedule':>12} {'cancel':>12} {'reschedule':>12}")
+    filled = 0
+    for size in sorted(args.sizes):
+        started = time.perf_counter()
+        while filled < size:
+            schedule(filled)
+            filled += 1
+        fill_seconds = time.perf_counter() - started
+        if not args.no_freeze:
+            # A million long-lived entries make every full collection walk
+            # them all; freezing them measures the scheduler, not the collector
+            gc.freeze()
+        probe = f"probe{size}-"
+        scheduled = per_op(lambda i: schedule(i, probe), args.batch)
+        cancelled = per_op(lambda i: scheduler.cancel(users[i % len(users)], f"{probe}{i}"), args.batch)
+        # Replacing a pending reminder is a cancel plus a push
+        rescheduled = per_op(lambda i: schedule(rng.randrange(filled)), args.batch)
+        print(f"{len(scheduler):>10} {scheduled * 1e6:>10.2f}us {cancelled * 1e6:>10.2f}us "
+              f"{rescheduled * 1e6:>10.2f}us   (filled in {fill_seconds:.1f}s)")
+
+    started = time.perf_counter()
+    fired = scheduler.fire_due(start + 86400)
+    elapsed = time.perf_counter() - started
+    print(f"fired {len(fired)} reminders due within a day in {elapsed * 1000:.1f} ms "
+          f"({elapsed / max(len(fired), 1) * 1e6:.2f} us each)")
+    scheduler.stop()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,74 @@
+"""Stand-in for a Prometheus scraper reading the app's profiling metrics.
+
+Start the app with profiling on, e.g.
+
+    PRODUCTIVITY_HUB_PROFILE=1 PRODUCTIVITY_HUB_METRICS_PORT=9464 streamlit run app.py
+
+then poll the endpoint (or the metrics file) and print the slowest sections:
+
+    python benchmarks/scrape_metrics.py --url http://127.0.0.1:9464/metrics
+    python benchmarks/scrape_metrics.py --file productivity_hub_metrics.prom --interval 5
+"""
+import argparse
+import re
+import time
+import urllib.request
+
+SAMPLE = re.compile(r'^(\w+)(?:\{(.*)\})?\s+(\S+)$')
+LABEL = re.compile(r'(\w+)="((?:[^"\\]|\\.)*)"')
+
+
+def parse(text):
+    """Map (metric, labels) to value for every sample in Prometheus text format"""
+    samples = {}
+    for line in text.splitlines():
+        if not line or line.startswith('#'):
+            continue
+        match = SAMPLE.match(line)
+        if match:
+            metric, labels, value = match.groups()
+            samples[(metric, tuple(LABEL.findall(labels or '')))] = float(value)
+    return samples
+
+
+def read(args):
+    if args.url:
+        with urllib.request.urlopen(args.url, timeout=5) as response:
+            return response.read().decode('utf-8')
+    with open(args.file) as f:
+        return f.read()
+
+
+def report(samples, top):
+    sections = []
+    for (metric, labels), total in samples.items():
+        if metric == 'productivity_hub_section_seconds_sum':
+            count = samples.get(('productivity_hub_section_seconds_count', labels), 0)
+            name = ': '.join(value for _, value in labels)
+            sections.append((total, count, name))
+    sections.sort(reverse=True)
+    print(f"reruns: {samples.get(('productivity_hub_reruns_total', ()), 0):.0f}  "
+          f"last rerun peak alloc: {samples.get(('productivity_hub_rerun_alloc_peak_bytes', ()), 0) / 1024:,.0f} KiB")
+    for total, count, name in sections[:top]:
+        mean = total / count * 1000 if count else 0
+        print(f"  {name:<40} {count:>7.0f} calls  {total * 1000:>10.1f} ms total  {mean:>8.2f} ms mean")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument('--url')
+    source.add_argument('--file')
+    parser.add_argument('--interval', type=float, default=0, help="seconds between scrapes; 0 scrapes once")
+    parser.add_argument('--top', type=int, default=15)
+    args = parser.parse_args()
+
+    while True:
+        report(parse(read(args)), args.top)
+        if not args.interval:
+            break
+        time.sleep(args.interval)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,169 @@
+"""Cold-start cost of app.py: import time, loaded modules and first-render latency.
+
+Each measurement runs in a fresh interpreter. `python -X importtime` is
+used to attribute import time to the modules app.py pulls in on top of
+Streamlit itself, and Streamlit's AppTest times the first render of the
+login page and of each page for a logged-in user, noting whether plotly
+has been loaded by then and whether `import streamlit` had already
+loaded it (Streamlit 1.37 and later do, for their plotly theme). Pass --baseline to measure an older revision
+(checked out into a temporary git worktree) side by side. Run from the
+repository root:
+
+    python benchmarks/startup.py
+    python benchmarks/startup.py --baseline HEAD~1 --output startup.json
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+HEAVY_MODULES = ('plotly', 'pandas', 'numpy')
+PAGES = ["Dashboard", "Tasks", "Habits", "Goals", "Notes", "Pomodoro"]
+
+# Runs inside the tree being measured; prints one JSON object
+RENDER_SCRIPT = r'''
+import json, os, sys, time
+sys.path.insert(0, os.getcwd())
+from streamlit.testing.v1 import AppTest
+
+HEAVY = %(heavy)r
+page = %(page)r
+
+def loaded():
+    return sorted(name for name in HEAVY if name in sys.modules)
+
+preloaded = loaded()
+
+if page is not None:
+    import storage
+    from service import DataService
+    service = DataService(storage.open_storage())
+    service.signup('startup', 'secret', 'startup@example.com', 'Startup')
+    for i in range(50):
+        service.user('startup').add_task(f"task {i}", 'High', 'Work')
+    service.storage.close()
+
+at = AppTest.from_file('app.py', default_timeout=120)
+if page is not None:
+    at.session_state['logged_in'] = True
+    at.session_state['current_user'] = 'startup'
+started = time.perf_counter()
+at.run()
+if page is not None and page != "Dashboard":
+    at.sidebar.selectbox[0].set_value(page)
+    at.run()
+elapsed = time.perf_counter() - started
+if at.exception:
+    raise SystemExit(f"render failed: {at.exception[0].value}")
+print(json.dumps({'first_render_ms': round(elapsed * 1000, 1), 'heavy_loaded': loaded(),
+                  'heavy_preloaded': preloaded}))
+'''
+
+
+def import_times(tree):
+    """Cumulative import time in microseconds of app.py and of each module it imports"""
+    command = 'import streamlit, streamlit.components.v1; import app'
+    result = subprocess.run([sys.executable, '-X', 'importtime', '-c', command],
+                            cwd=tree, capture_output=True, text=True, env=_env(tree))
+    if result.returncode:
+        raise RuntimeError(result.stderr[-2000:])
+    # importtime lists children before their parent, so app's direct imports
+    # are the depth-1 lines between the previous top-level line and app itself
+    modules = {}
+    for name, cumulative, depth in _parse_importtime(result.stderr):
+        if depth == 0:
+            if name == 'app':
+                modules['app'] = cumulative
+                return modules
+            modules = {}
+        elif depth == 1:
+            modules[name] = cumulative
+    raise RuntimeError("app was not imported")
+
+
+def _parse_importtime(stderr):
+    """(module, cumulative microseconds, nesting depth) for each -X importtime line"""
+    for line in stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        _, cumulative, name = line.split('|')
+        depth = (len(name) - len(name.lstrip()) - 1) // 2
+        yield name.strip(), int(cumulative), depth
+
+
+def first_render(tree, page, db_path):
+    script = RENDER_SCRIPT % {'heavy': HEAVY_MODULES, 'page': page}
+    env = _env(tree, db_path)
+    result = subprocess.run([sys.executable, '-c', script], cwd=tree, capture_output=True, text=True, env=env)
+    if result.returncode:
+        raise RuntimeError(result.stderr[-2000:])
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def _env(tree, db_path=None):
+    env = dict(os.environ, PYTHONPATH=tree)
+    if db_path:
+        env['PRODUCTIVITY_HUB_STORAGE'] = 'sqlite'
+        env['PRODUCTIVITY_HUB_DB'] = db_path
+    return env
+
+
+def measure(tree, repeat):
+    report = {'imports_us': import_times(tree), 'renders': {}}
+    for page in [None] + PAGES:
+        runs = []
+        for _ in range(repeat):
+            with tempfile.TemporaryDirectory() as tmp:
+                runs.append(first_render(tree, page, os.path.join(tmp, 'startup.db')))
+        report['renders'][page or "Login"] = {
+            'first_render_ms': sorted(run['first_render_ms'] for run in runs)[len(runs) // 2],
+            'heavy_loaded': runs[-1]['heavy_loaded'],
+            'heavy_preloaded': runs[-1]['heavy_preloaded']
+        }
+    return report
+
+
+def print_report(label, report):
+    print(f"== {label}")
+    imports = dict(report['imports_us'])
+    print(f"import app on top of streamlit: {imports.pop('app') / 1000:.1f} ms")
+    for name, micros in sorted(imports.items(), key=lambda item: -item[1])[:10]:
+        print(f"  {name:<32} {micros / 1000:>8.1f} ms")
+    for page, render in report['renders'].items():
+        preloaded = render['heavy_preloaded']
+        heavy = ', '.join(name + (" (by streamlit)" if name in preloaded else '')
+                          for name in render['heavy_loaded']) or '-'
+        print(f"  first render {page:<10} {render['first_render_ms']:>8.1f} ms   heavy modules: {heavy}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--baseline', help="git revision to measure alongside the working tree")
+    parser.add_argument('--repeat', type=int, default=3, help="fresh interpreters per page; the median is kept")
+    parser.add_argument('--output', help="also write the results as JSON")
+    args = parser.parse_args()
+
+    results = {'current': measure(ROOT, args.repeat)}
+    if args.baseline:
+        with tempfile.TemporaryDirectory() as tmp:
+            worktree = os.path.join(tmp, 'baseline')
+            subprocess.run(['git', 'worktree', 'add', '--detach', worktree, args.baseline],
+                           cwd=ROOT, check=True, capture_output=True)
+            try:
+                results['baseline'] = measure(worktree, args.repeat)
+            finally:
+                subprocess.run(['git', 'worktree', 'remove', '--force', worktree], cwd=ROOT, capture_output=True)
+        print_report(f"baseline {args.baseline}", results['baseline'])
+    print_report("current", results['current'])
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
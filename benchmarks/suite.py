@@ -0,0 +1,185 @@
+"""Headless benchmark suite for the pages and the core data functions.
+
+Page benchmarks drive app.py through Streamlit's AppTest with a synthetic
+user per scale and time repeated reruns of every page. Microbenchmarks
+time the statistics snapshot, task mutations and note search directly on
+the data service. Results go to a JSON file so runs from different
+commits can be compared. Run from the repository root:
+
+    python benchmarks/suite.py --scales 10 100 1000 10000 --output bench.json
+    python benchmarks/suite.py --scales 100000 --skip-pages
+"""
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+# After the root, so app.py's imports never resolve to a benchmark script
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+import auth  # noqa: E402
+import storage  # noqa: E402
+from service import DataService  # noqa: E402
+from synthetic import populate  # noqa: E402
+
+APP = os.path.join(ROOT, 'app.py')
+PAGES = ["Dashboard", "Tasks", "Habits", "Goals", "Notes", "Pomodoro"]
+DEFAULT_SCALES = [10, 100, 1000, 10000, 100000]
+
+
+def summarize(name, scale, samples, peak_bytes=None):
+    """Latency percentiles in milliseconds for one benchmark"""
+    ordered = sorted(samples)
+
+    def pick(fraction):
+        return round(ordered[min(len(ordered) - 1, int(fraction * len(ordered)))] * 1000, 3)
+
+    result = {
+        'name': name,
+        'scale': scale,
+        'runs': len(ordered),
+        'p50_ms': pick(0.50),
+        'p90_ms': pick(0.90),
+        'p99_ms': pick(0.99),
+        'max_ms': round(ordered[-1] * 1000, 3)
+    }
+    if peak_bytes is not None:
+        result['peak_kib'] = round(peak_bytes / 1024, 1)
+    return result
+
+
+def time_calls(fn, runs):
+    samples = []
+    for _ in range(runs):
+        started = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - started)
+    return samples
+
+
+def peak_memory(fn):
+    """Peak bytes allocated while fn runs"""
+    tracemalloc.start()
+    tracemalloc.reset_peak()
+    fn()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return peak
+
+
+def bench_pages(db_path, scale, runs):
+    """Rerun latency and peak memory of every page for one synthetic user"""
+    from streamlit.testing.v1 import AppTest
+
+    username = f"bench{scale}"
+    results = []
+    for page in PAGES:
+        at = AppTest.from_file(APP, default_timeout=600)
+        at.session_state['logged_in'] = True
+        at.session_state['current_user'] = username
+        at.run()
+        at.sidebar.selectbox[0].set_value(page)
+        at.run()
+        if at.exception:
+            raise RuntimeError(f"{page} raised: {at.exception[0].value}")
+        peak = peak_memory(at.run)
+        samples = time_calls(at.run, runs)
+        results.append(summarize(f"page:{page}", scale, samples, peak))
+    return results
+
+
+def bench_core(scale, runs):
+    """Microbenchmarks on an in-memory data service"""
+    service = DataService(storage.open_storage('memory'), login_limiter=auth.TokenBucketLimiter())
+    service.signup('micro', 'secret', 'micro@example.com', 'Micro')
+    data = populate(service.user('micro'), scale)
+    results = []
+
+    results.append(summarize('get_productivity_stats:cached', scale,
+                             time_calls(data.stats.snapshot, runs)))
+
+    def fresh_snapshot():
+        data.stats._snapshot = None
+        data.stats.snapshot()
+    results.append(summarize('get_productivity_stats:rebuild', scale, time_calls(fresh_snapshot, runs)))
+
+    added = []
+    results.append(summarize('add_task', scale,
+                             time_calls(lambda: added.append(data.add_task("bench task", 'High', 'Work')), runs)))
+    ids = iter([task.id for task in added])
+    results.append(summarize('toggle_task', scale, time_calls(lambda: data.toggle_task(next(ids)), runs)))
+    ids = iter([task.id for task in added])
+    results.append(summarize('delete_task', scale, time_calls(lambda: data.delete_task(next(ids)), runs)))
+
+    for query in ('plan', 'rev', 'customer migrate'):
+        results.append(summarize(f'note_search:{query}', scale,
+                                 time_calls(lambda: data.note_index.search(query), runs)))
+    service.kdf.shutdown()
+    return results
+
+
+def seed_database(db_path, scales):
+    service = DataService(storage.open_storage('sqlite', db_path))
+    for scale in scales:
+        username = f"bench{scale}"
+        service.signup(username, 'secret', f"{username}@example.com", f"Bench {scale}")
+        populate(service.user(username), scale)
+    service.kdf.shutdown()
+    service.storage.close()
+
+
+def git_revision():
+    try:
+        return subprocess.check_output(['git', 'rev-parse', 'HEAD'], cwd=ROOT, text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--scales', type=int, nargs='+', default=DEFAULT_SCALES)
+    parser.add_argument('--runs', type=int, default=20, help="timed reruns per page")
+    parser.add_argument('--micro-runs', type=int, default=200, help="timed calls per microbenchmark")
+    parser.add_argument('--skip-pages', action='store_true', help="only run the microbenchmarks")
+    parser.add_argument('--output', default='bench_results.json')
+    args = parser.parse_args()
+
+    results = []
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, 'bench.db')
+        if not args.skip_pages:
+            seed_database(db_path, args.scales)
+            # app.py opens its storage from these on first use
+            os.environ['PRODUCTIVITY_HUB_STORAGE'] = 'sqlite'
+            os.environ['PRODUCTIVITY_HUB_DB'] = db_path
+        for scale in args.scales:
+            print(f"scale {scale}...", file=sys.stderr)
+            results.extend(bench_core(scale, args.micro_runs))
+            if not args.skip_pages:
+                results.extend(bench_pages(db_path, scale, args.runs))
+
+    report = {
+        'commit': git_revision(),
+        'timestamp': datetime.now().isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'results': results
+    }
+    with open(args.output, 'w') as f:
+        json.dump(report, f, indent=2)
+    for result in results:
+        print(f"{result['name']:<36} {result['scale']:>7} p50 {result['p50_ms']:>9.3f} ms  "
+              f"p99 {result['p99_ms']:>9.3f} ms" + (f"  peak {result['peak_kib']:>9.1f} KiB"
+                                                    if 'peak_kib' in result else ''))
+
+
+if __name__ == '__main__':
+    main()
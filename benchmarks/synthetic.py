@@ -0,0 +1,35 @@
+"""Synthetic users for the benchmarks."""
+import random
+from datetime import date, timedelta
+
+CATEGORIES = ['Work', 'Personal', 'Health', 'Learning', 'Finance', 'Home']
+PRIORITIES = ['Low', 'Medium', 'High']
+GOAL_CATEGORIES = ["Personal", "Professional", "Health", "Financial", "Learning"]
+WORDS = ("plan review draft meeting report budget call email design launch research write "
+         "read workout groceries invoice schedule backlog sprint retro customer migrate").split()
+
+
+def sentence(rng, words):
+    return ' '.join(rng.choice(WORDS) for _ in range(words))
+
+
+def populate(data, scale, seed=0):
+    """Fill a UserData with `scale` tasks plus proportionate notes, habits and goals"""
+    rng = random.Random(seed)
+    today = date.today()
+    for i in range(scale):
+        due = today + timedelta(days=rng.randrange(-10, 60)) if rng.random() < 0.4 else None
+        task = data.add_task(f"{sentence(rng, 4)} #{i}", rng.choice(PRIORITIES), rng.choice(CATEGORIES), due)
+        if rng.random() < 0.4:
+            data.toggle_task(task.id)
+    for i in range(max(1, scale // 10)):
+        data.add_note(f"{sentence(rng, 3)} {i}", sentence(rng, 120), rng.choice(CATEGORIES))
+    for i in range(max(1, min(scale // 100, 50))):
+        habit = data.add_habit(f"habit {i}", 'daily')
+        for days_ago in range(rng.randrange(400)):
+            if rng.random() < 0.8:
+                data.mark_habit_complete(habit.id, today - timedelta(days=days_ago))
+    for i in range(max(1, min(scale // 100, 100))):
+        goal = data.add_goal(f"goal {i}", sentence(rng, 20), today + timedelta(days=90), rng.choice(GOAL_CATEGORIES))
+        data.update_goal_progress(goal.id, rng.randrange(101))
+    return data
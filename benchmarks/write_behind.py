@@ -0,0 +1,106 @@
+"""Per-click write cost on SQLite with and without the write-behind buffer.
+
+Simulates the clicks the Tasks and Habits pages make (toggle, delete,
+mark done) for one user and reports the mean latency of each click and the
+number of storage transactions it took, then checks that what reached the
+database after the final flush matches the in-memory working set. Run
+from the repository root:
+
+    python benchmarks/write_behind.py --clicks 5000
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+from datetime import date, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import storage  # noqa: E402
+import writebehind  # noqa: E402
+from service import DataService  # noqa: E402
+
+
+class CountingStorage(storage.SQLiteStorage):
+    """SQLiteStorage that counts the write transactions it commits"""
+
+    def __init__(self, path):
+        super().__init__(path)
+        self.transactions = 0
+        self._in_batch = False
+
+    def write_batch(self, operations):
+        self.transactions += 1
+        self._in_batch = True
+        try:
+            super().write_batch(operations)
+        finally:
+            self._in_batch = False
+
+    def _autocommit(self):
+        if not self._in_batch:
+            self.transactions += 1
+
+    def insert_record(self, *args):
+        self._autocommit()
+        super().insert_record(*args)
+
+    def update_record(self, *args):
+        self._autocommit()
+        super().update_record(*args)
+
+    def delete_record(self, *args):
+        self._autocommit()
+        super().delete_record(*args)
+
+
+def run(path, buffered, clicks, seed):
+    backend = CountingStorage(path)
+    store = writebehind.WriteBehindStorage(backend) if buffered else backend
+    service = DataService(store)
+    service.signup('bench', 'secret', 'bench@example.com', 'Bench')
+    data = service.user('bench')
+    rng = random.Random(seed)
+    for i in range(200):
+        data.add_task(f"task {i}")
+    habits = [data.add_habit(f"habit {i}", 'daily') for i in range(10)]
+    backend.transactions = 0
+
+    started = time.perf_counter()
+    for _ in range(clicks):
+        roll = rng.random()
+        if roll < 0.6:
+            data.toggle_task(rng.choice(data.task_index.page("Created Date", 0, 50)))
+        elif roll < 0.7:
+            data.delete_task(rng.choice(data.task_index.page("Created Date", 0, 50)))
+            data.add_task("replacement")
+        else:
+            data.mark_habit_complete(rng.choice(habits).id, date.today() - timedelta(days=rng.randrange(365)))
+    elapsed = time.perf_counter() - started
+    service.end_session('bench')
+
+    stored = {record['id']: record for record in backend.load_records('tasks', 'bench')}
+    assert stored == {task.id: task.to_dict() for task in data.tasks}, "tasks in storage differ"
+    transactions = backend.transactions
+    store.close()
+    return elapsed, transactions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--clicks', type=int, default=5000)
+    parser.add_argument('--seed', type=int, default=1)
+    args = parser.parse_args()
+
+    for buffered in (False, True):
+        with tempfile.TemporaryDirectory() as tmp:
+            elapsed, transactions = run(os.path.join(tmp, 'bench.db'), buffered, args.clicks, args.seed)
+        label = "write-behind" if buffered else "direct"
+        print(f"{label:<13} {elapsed / args.clicks * 1e6:>8.1f} us/click   "
+              f"{transactions:>6} transactions for {args.clicks} clicks")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,81 @@
+from collections import OrderedDict
+
+import profiling
+
+# Figures kept per session before the least recently used one is dropped
+FIGURE_CACHE_SIZE = 16
+
+CATEGORY_COLORS = ['#3498db', '#e67e22', '#9b59b6', '#f1c40f', '#1abc9c']
+
+
+class FigureCache:
+    """LRU cache of built figures keyed by chart name and input data"""
+
+    def __init__(self, maxsize=FIGURE_CACHE_SIZE):
+        self.maxsize = maxsize
+        self._figures = OrderedDict()
+
+    def get(self, name, inputs, build):
+        """Return the figure for these inputs, calling build(*inputs) only on a miss"""
+        # inputs is a tuple of tuples, so the dict hashes it and compares
+        # it on lookup; unchanged data maps to the figure built last time
+        key = (name, inputs)
+        figure = self._figures.get(key)
+        if figure is None:
+            with profiling.timer('figure', name):
+                figure = build(*inputs)
+            self._figures[key] = figure
+            if len(self._figures) > self.maxsize:
+                self._figures.popitem(last=False)
+        else:
+            self._figures.move_to_end(key)
+        return figure
+
+    def __len__(self):
+        return len(self._figures)
+
+
+def _plots():
+    """Plotly-backed builders, imported when the first chart is built.
+
+    Streamlit's plotly_chart element already imports plotly.graph_objects
+    at `import streamlit`, so this saves almost nothing at startup. Each
+    trace type's module still loads on the first figure that uses it,
+    wherever this import lives.
+    """
+    import plots
+    return plots
+
+
+def task_status_figure(completed, pending):
+    return _plots().pie_figure('Task Completion Status', ('Completed', 'Pending'), (completed, pending),
+                              ['#2ecc71', '#e74c3c'])
+
+
+def goal_categories_figure(categories, counts):
+    return _plots().pie_figure('Goal Categories', categories, counts, CATEGORY_COLORS)
+
+
+def task_categories_figure(categories, counts):
+    return _plots().bar_figure('Task Categories', categories, counts, '#3498db', 'Category', 'Count')
+
+
+def weekly_completed_figure(days, counts):
+    return _plots().line_figure('Weekly Completed Tasks', days, counts, '#27ae60', 'Completed Tasks')
+
+
+def habit_streaks_figure(habits, streaks):
+    return _plots().bar_figure('Current Habit Streaks', habits, streaks, '#f39c12', 'Habit', 'Streak Days',
+                              horizontal=True)
+
+
+def history_trend_figure(title, labels, created, completed, habits):
+    return _plots().multi_line_figure(title, labels,
+                                      (('Tasks created', created), ('Tasks completed', completed),
+                                       ('Habit check-ins', habits)),
+                                      ['#3498db', '#27ae60', '#f39c12'], 'Count')
+
+
+def activity_heatmap_figure(title, weeks, rows):
+    return _plots().heatmap_figure(title, weeks, rows, ('Mon', 'Tue', 'Wed', 'Thu', 'Fri', 'Sat', 'Sun'),
+                                   'Completions')
@@ -0,0 +1,224 @@
+"""Run several app worker processes behind a local reverse proxy with sticky sessions.
+
+One Streamlit server runs every session's script on threads of one
+process, so a user building charts holds up everyone else. This starts
+--workers separate processes, each on its own port and each with its own
+interpreter, and a proxy on --port that spreads new browsers across them:
+
+    python cluster.py --workers 4 --port 8501 --db productivity_hub.db
+    python cluster.py --workers 4 --port 8600 --app api
+
+A browser's first response sets a cookie naming its worker, and every
+later connection with that cookie, websockets included, goes back to the
+same worker, which holds its session state. Workers share one SQLite
+database and drop cached users that another worker changed (see
+invalidation.py). API workers also share the key their login tokens are
+signed with, so a token works on every worker, cookie or not. A worker that exits is restarted; its browsers move to
+another worker and reconnect there.
+"""
+import argparse
+import asyncio
+import os
+import re
+import secrets
+import signal
+import subprocess
+import sys
+
+import storage
+from service import API_PORT_ENV
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+
+# Cookie naming the worker a browser is pinned to
+AFFINITY_COOKIE = 'productivity_hub_worker'
+AFFINITY_PATTERN = re.compile(rb'(?:^|;)\s*' + AFFINITY_COOKIE.encode() + rb'=(\d+)')
+
+# Request and response heads larger than this are refused, in bytes
+MAX_HEAD = 64 * 1024
+
+CHUNK = 64 * 1024
+
+# Seconds between checks that every worker is still running
+SUPERVISE_INTERVAL = 1
+
+
+def worker_command(app, port, db):
+    """The command line of one worker process listening on port"""
+    if app == 'api':
+        return [sys.executable, os.path.join(ROOT, 'api.py'), '--host', '127.0.0.1', '--port', str(port),
+                '--backend', 'sqlite', '--db', db]
+    return [sys.executable, '-m', 'streamlit', 'run', os.path.join(ROOT, 'app.py'),
+            '--server.address', '127.0.0.1', '--server.port', str(port), '--server.headless', 'true']
+
+
+class Workers:
+    """Worker processes on consecutive ports from base_port, restarted when they exit"""
+
+    def __init__(self, app, count, base_port, db):
+        self.app = app
+        self.ports = [base_port + i for i in range(count)]
+        self.db = db
+        self.env = dict(os.environ, PRODUCTIVITY_HUB_STORAGE='sqlite', PRODUCTIVITY_HUB_DB=db)
+        # Each worker would try to bind the same API port
+        self.env.pop(API_PORT_ENV, None)
+        # One signing key for all, so any worker accepts a token another issued
+        self.env.setdefault('PRODUCTIVITY_HUB_API_SECRET', secrets.token_hex(32))
+        self.processes = [None] * count
+
+    def start(self):
+        for i in range(len(self.ports)):
+            self._spawn(i)
+
+    def _spawn(self, i):
+        self.processes[i] = subprocess.Popen(worker_command(self.app, self.ports[i], self.db), cwd=ROOT,
+                                             env=self.env, stdout=subprocess.DEVNULL)
+
+    def restart_exited(self):
+        for i, process in enumerate(self.processes):
+            if process.poll() is not None:
+                print(f"Worker {i} exited with {process.returncode}; restarting", file=sys.stderr)
+                self._spawn(i)
+
+    def stop(self):
+        for process in self.processes:
+            process.terminate()
+        for process in self.processes:
+            try:
+                process.wait(10)
+            except subprocess.TimeoutExpired:
+                process.kill()
+
+
+class StickyProxy:
+    """Forwards each client connection to one worker, chosen by cookie or round robin.
+
+    Only the first request head of a connection is parsed; after that
+    bytes are copied both ways untouched, so keep-alive requests and
+    websocket upgrades reach the same worker.
+    """
+
+    def __init__(self, ports, host='127.0.0.1'):
+        self.ports = ports
+        self.host = host
+        self._next = 0
+
+    def _pinned(self, head):
+        for line in head.split(b'\r\n')[1:]:
+            name, _, value = line.partition(b':')
+            if name.strip().lower() == b'cookie':
+                match = AFFINITY_PATTERN.search(value)
+                if match and int(match.group(1)) < len(self.ports):
+                    return int(match.group(1))
+        return None
+
+    def _round_robin(self):
+        worker = self._next
+        self._next = (self._next + 1) % len(self.ports)
+        return worker
+
+    async def _connect(self, worker):
+        """Open a connection to worker, or to the next one that accepts; returns (worker, reader, writer)"""
+        for _ in range(len(self.ports)):
+            try:
+                reader, writer = await asyncio.open_connection(self.host, self.ports[worker])
+                return worker, reader, writer
+            except OSError:
+                worker = (worker + 1) % len(self.ports)
+        raise ConnectionError("No worker is accepting connections")
+
+    async def handle(self, client_reader, client_writer):
+        upstream_writer = None
+        try:
+            try:
+                head = await client_reader.readuntil(b'\r\n\r\n')
+            except (asyncio.IncompleteReadError, asyncio.LimitOverrunError, ConnectionError):
+                return
+            pinned = self._pinned(head)
+            try:
+                worker, upstream_reader, upstream_writer = await self._connect(
+                    self._round_robin() if pinned is None else pinned)
+            except ConnectionError:
+                client_writer.write(b"HTTP/1.1 503 Service Unavailable\r\nContent-Length: 0\r\n"
+                                    b"Connection: close\r\n\r\n")
+                return
+            upstream_writer.write(head)
+            # The request body follows the head, so forward it while waiting for the response
+            upload = asyncio.ensure_future(_pipe(client_reader, upstream_writer))
+            try:
+                if worker != pinned:
+                    # Pin the browser to the worker now holding its session
+                    try:
+                        response = await upstream_reader.readuntil(b'\r\n\r\n')
+                    except (asyncio.IncompleteReadError, asyncio.LimitOverrunError, ConnectionError):
+                        return
+                    cookie = f"Set-Cookie: {AFFINITY_COOKIE}={worker}; Path=/; HttpOnly; SameSite=Lax\r\n"
+                    status_end = response.index(b'\r\n') + 2
+                    client_writer.write(response[:status_end] + cookie.encode() + response[status_end:])
+                download = asyncio.ensure_future(_pipe(upstream_reader, client_writer))
+                # Done once either side closes
+                await asyncio.wait([upload, download], return_when=asyncio.FIRST_COMPLETED)
+                download.cancel()
+            finally:
+                upload.cancel()
+        finally:
+            for writer in (client_writer, upstream_writer):
+                if writer is not None:
+                    writer.close()
+
+
+async def _pipe(reader, writer):
+    try:
+        while True:
+            data = await reader.read(CHUNK)
+            if not data:
+                return
+            writer.write(data)
+            await writer.drain()
+    except ConnectionError:
+        pass
+
+
+async def serve(workers, host, port, ready=None):
+    """Proxy port to the workers and restart any that exit, until cancelled"""
+    proxy = StickyProxy(workers.ports)
+    server = await asyncio.start_server(proxy.handle, host, port, limit=MAX_HEAD)
+    if ready is not None:
+        ready()
+    async with server:
+        while True:
+            await asyncio.sleep(SUPERVISE_INTERVAL)
+            workers.restart_exited()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--app', choices=('streamlit', 'api'), default='streamlit')
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1)
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8501, help="port of the proxy")
+    parser.add_argument('--worker-port', type=int, help="port of the first worker (default: --port + 1)")
+    parser.add_argument('--db', default=os.environ.get('PRODUCTIVITY_HUB_DB', storage.DEFAULT_DB_PATH))
+    args = parser.parse_args()
+
+    # Create the schema once, before the workers race to
+    storage.SQLiteStorage(args.db).close()
+    workers = Workers(args.app, args.workers, args.worker_port or args.port + 1, args.db)
+    workers.start()
+
+    def ready():
+        print(f"Proxying http://{args.host}:{args.port} to {args.workers} {args.app} workers "
+              f"on ports {workers.ports[0]}-{workers.ports[-1]}")
+
+    # Stopped by a supervisor as by Ctrl-C, so the workers are stopped too rather than orphaned
+    signal.signal(signal.SIGTERM, signal.default_int_handler)
+    try:
+        asyncio.run(serve(workers, args.host, args.port, ready))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        workers.stop()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,425 @@
+import copy
+import json
+import os
+import threading
+import time
+
+from storage import KINDS
+
+DEFAULT_EVENTLOG_PATH = 'productivity_hub_events'
+
+# Seconds between background fsyncs of the log; a power loss can lose at
+# most this much, a crashed process loses nothing already appended
+FSYNC_INTERVAL = 0.05
+
+# Events for one user before their snapshot is rewritten
+SNAPSHOT_EVERY = 2000
+
+# Log segments are rotated at this size; segments older than every
+# user's snapshot are deleted
+SEGMENT_BYTES = 64 * 2 ** 20
+
+# List fields logged as added and removed items instead of whole lists
+SET_FIELDS = {'completions'}
+
+# Event keys, kept short because every mutation writes one line:
+#   s seq, t time (ms), u username, o op, k kind, i record id
+#   o=i insert: r record           o=d delete: w deleted record
+#   o=p patch:  c changed fields, w their previous values,
+#               a/x items added to/removed from SET_FIELDS
+#   o=u user:   p profile, f preferences
+#   o=r rollup: m metric, d day, n amount added
+#   o=f fired reminder: i task id, k reminder kind, d due date,
+#               b its notification when queued for the user
+#   o=n the user's queued notifications taken
+
+
+class EventLogStorage:
+    """Storage backend that appends every change to a log and keeps state in memory.
+
+    Records live in memory as in MemoryStorage. Each change is appended
+    to the log as one compact JSON line: updates log only the fields that
+    changed along with their previous values, which also makes the log
+    usable for audit and undo. A background thread fsyncs the log in
+    batches and writes a per-user snapshot every SNAPSHOT_EVERY events;
+    opening the store loads the snapshots and replays the log after them.
+    """
+
+    def __init__(self, path=DEFAULT_EVENTLOG_PATH, fsync_interval=FSYNC_INTERVAL,
+                 snapshot_every=SNAPSHOT_EVERY, segment_bytes=SEGMENT_BYTES):
+        self.path = path
+        self.fsync_interval = fsync_interval
+        self.snapshot_every = snapshot_every
+        self.segment_bytes = segment_bytes
+        self._snapshot_dir = os.path.join(path, 'snapshots')
+        os.makedirs(self._snapshot_dir, exist_ok=True)
+
+        self._lock = threading.Lock()
+        # Held while fsyncing or swapping the segment file
+        self._sync_lock = threading.Lock()
+        self._users = {}
+        self._records = {kind: {} for kind in KINDS}
+        self._note_terms = {}
+        self._rollups = {}
+        self._fired = {}
+        self._inboxes = {}
+        self._seq = 0
+        # Per user: seq covered by their snapshot, events since it
+        self._snapshot_seq = {}
+        self._pending_events = {}
+        self.recovered_events = 0
+        self._recover()
+
+        self._file = open(self._segment_path(self._segment_start), 'ab')
+        self._unsynced = False
+        self._closed = threading.Event()
+        self._flusher = threading.Thread(target=self._flush_loop, name='eventlog', daemon=True)
+        self._flusher.start()
+
+    # Recovery
+    def _segments(self):
+        """(first seq, path) of every log segment, oldest first"""
+        segments = []
+        for name in os.listdir(self.path):
+            if name.startswith('events-') and name.endswith('.log'):
+                segments.append((int(name[7:-4]), os.path.join(self.path, name)))
+        return sorted(segments)
+
+    def _segment_path(self, first_seq):
+        return os.path.join(self.path, f'events-{first_seq:012d}.log')
+
+    def _recover(self):
+        for name in os.listdir(self._snapshot_dir):
+            if name.endswith('.json'):
+                with open(os.path.join(self._snapshot_dir, name)) as f:
+                    self._load_snapshot(json.load(f))
+        segments = self._segments()
+        for first_seq, segment in segments:
+            self._replay(segment)
+        self._seq = max([self._seq] + list(self._snapshot_seq.values()))
+        self._segment_start = segments[-1][0] if segments else self._seq + 1
+
+    def _load_snapshot(self, snapshot):
+        username = snapshot['username']
+        self._users[username] = (snapshot['profile'], snapshot['preferences'])
+        for kind in KINDS:
+            self._records[kind][username] = {r['id']: r for r in snapshot['records'][kind]}
+        self._note_terms[username] = snapshot['note_terms']
+        self._rollups[username] = snapshot.get('rollups', {})
+        self._fired[username] = {tuple(reminder) for reminder in snapshot.get('fired_reminders', [])}
+        self._inboxes[username] = snapshot.get('notifications', [])
+        self._snapshot_seq[username] = snapshot['seq']
+
+    def _replay(self, segment):
+        with open(segment, 'rb+') as f:
+            offset = 0
+            for line in f:
+                try:
+                    if not line.endswith(b'\n'):
+                        raise ValueError("torn write")
+                    event = json.loads(line)
+                except ValueError:
+                    # The process died mid-append; drop the partial line
+                    f.truncate(offset)
+                    break
+                offset += len(line)
+                self._seq = max(self._seq, event['s'])
+                if event['s'] > self._snapshot_seq.get(event['u'], 0):
+                    self._apply(event)
+                    if event.get('k') == 'notes' and event['o'] in ('i', 'p', 'd'):
+                        # The snapshot's search terms for this note are older than
+                        # the note now; dropped, they are recomputed on load
+                        note_id = event['r']['id'] if event['o'] == 'i' else event['i']
+                        self._note_terms.get(event['u'], {}).pop(note_id, None)
+                    self._pending_events[event['u']] = self._pending_events.get(event['u'], 0) + 1
+                    self.recovered_events += 1
+
+    def _apply(self, event):
+        username, op = event['u'], event['o']
+        if op == 'u':
+            self._users[username] = (event['p'], event['f'])
+            return
+        if op == 'r':
+            days = self._rollups.setdefault(username, {}).setdefault(event['m'], {})
+            days[event['d']] = days.get(event['d'], 0) + event['n']
+            return
+        if op == 'f':
+            self._fired.setdefault(username, set()).add((event['i'], event['k'], event['d']))
+            if 'b' in event:
+                self._inboxes.setdefault(username, []).append(event['b'])
+            return
+        if op == 'n':
+            self._inboxes.pop(username, None)
+            return
+        records = self._records[event['k']].setdefault(username, {})
+        if op == 'i':
+            records[event['r']['id']] = event['r']
+        elif op == 'd':
+            records.pop(event['i'], None)
+        elif op == 'p':
+            old = records.get(event['i'])
+            if old is not None:
+                records[event['i']] = _patched(old, event)
+
+    # Appending
+    def _append(self, username, event):
+        """Apply an event and append it to the log; the caller holds self._lock"""
+        self._seq += 1
+        event = {'s': self._seq, 't': int(time.time() * 1000), 'u': username, **event}
+        self._apply(event)
+        self._file.write(json.dumps(event, separators=(',', ':')).encode('utf-8') + b'\n')
+        # Written straight to the OS so a crashed process loses nothing;
+        # the flusher makes it durable
+        self._file.flush()
+        self._unsynced = True
+        self._pending_events[username] = self._pending_events.get(username, 0) + 1
+
+    def get_user(self, username):
+        """Return (profile, preferences) for a user, or None"""
+        with self._lock:
+            user = self._users.get(username)
+            return copy.deepcopy(user) if user else None
+
+    def save_user(self, username, profile, preferences):
+        """Create or replace a user's profile and preferences"""
+        with self._lock:
+            self._append(username, {'o': 'u', 'p': copy.deepcopy(profile), 'f': copy.deepcopy(preferences)})
+
+    def load_records(self, kind, username):
+        """Return a user's records of one kind in insertion order"""
+        with self._lock:
+            return [copy.deepcopy(r) for r in self._records[kind].get(username, {}).values()]
+
+    def iter_records(self, kind, username, batch_size=1000):
+        """Yield a user's records of one kind in insertion order"""
+        yield from self.load_records(kind, username)
+
+    def insert_record(self, kind, username, record):
+        """Append a new record for a user"""
+        with self._lock:
+            self._append(username, {'o': 'i', 'k': kind, 'r': copy.deepcopy(record)})
+
+    def insert_records(self, kind, username, records):
+        """Append many records; a record whose id exists replaces it in place"""
+        with self._lock:
+            for record in records:
+                self._append(username, {'o': 'i', 'k': kind, 'r': copy.deepcopy(record)})
+
+    def write_batch(self, operations):
+        """Apply (method name, args) pairs of single-record writes in order"""
+        for method, args in operations:
+            getattr(self, method)(*args)
+
+    def update_record(self, kind, username, record):
+        """Replace an existing record, logging only the fields that changed"""
+        with self._lock:
+            old = self._records[kind].get(username, {}).get(record['id'])
+            if old is None:
+                return
+            event = {'o': 'p', 'k': kind, 'i': record['id'], 'c': {}, 'w': {}}
+            for name, value in record.items():
+                previous = old.get(name)
+                if value == previous:
+                    continue
+                if name in SET_FIELDS and isinstance(value, list) and isinstance(previous, list):
+                    added = sorted(set(value) - set(previous))
+                    removed = sorted(set(previous) - set(value))
+                    if added:
+                        event.setdefault('a', {})[name] = added
+                    if removed:
+                        event.setdefault('x', {})[name] = removed
+                else:
+                    event['c'][name] = copy.deepcopy(value)
+                    event['w'][name] = previous
+            if event['c'] or 'a' in event or 'x' in event:
+                self._append(username, event)
+
+    def delete_record(self, kind, username, record_id):
+        """Remove a record by id, logging it so the delete can be undone"""
+        with self._lock:
+            old = self._records[kind].get(username, {}).get(record_id)
+            if old is not None:
+                self._append(username, {'o': 'd', 'k': kind, 'i': record_id, 'w': old})
+
+    # Search terms are derived from the notes, so they are kept in memory
+    # and in snapshots but never logged; missing ones are recomputed on
+    # load, and replay drops those of notes changed after the snapshot
+    def load_note_terms(self, username):
+        """Return {note_id: {term: frequency}} for a user's indexed notes"""
+        with self._lock:
+            return copy.deepcopy(self._note_terms.get(username, {}))
+
+    def save_note_terms(self, username, note_id, frequencies):
+        """Store the search index entry for one note"""
+        with self._lock:
+            self._note_terms.setdefault(username, {})[note_id] = dict(frequencies)
+
+    def save_note_terms_many(self, username, entries):
+        """Store search index entries for many notes"""
+        with self._lock:
+            terms = self._note_terms.setdefault(username, {})
+            for note_id, frequencies in entries:
+                terms[note_id] = dict(frequencies)
+
+    def delete_note_terms(self, username, note_id):
+        """Remove the search index entry for one note"""
+        with self._lock:
+            self._note_terms.get(username, {}).pop(note_id, None)
+
+    def load_rollups(self, username):
+        """Return {metric: {isoformat day: value}} of a user's stored daily counts"""
+        with self._lock:
+            return copy.deepcopy(self._rollups.get(username, {}))
+
+    def add_rollup(self, username, metric, day, amount):
+        """Add amount to a user's stored daily count of metric"""
+        with self._lock:
+            self._append(username, {'o': 'r', 'm': metric, 'd': day, 'n': amount})
+
+    def load_fired_reminders(self, username):
+        """Return the set of (task_id, kind, isoformat due date) reminders already delivered to a user"""
+        with self._lock:
+            return set(self._fired.get(username, ()))
+
+    def claim_reminder(self, username, task_id, kind, due, notification=None):
+        """Record a reminder as delivered and queue notification, if any, for the user; False if it already was"""
+        with self._lock:
+            if (task_id, kind, due) in self._fired.get(username, ()):
+                return False
+            event = {'o': 'f', 'i': task_id, 'k': kind, 'd': due}
+            if notification is not None:
+                event['b'] = copy.deepcopy(notification)
+            self._append(username, event)
+            return True
+
+    def pop_notifications(self, username):
+        """Take the notifications queued for a user, oldest first"""
+        with self._lock:
+            if not self._inboxes.get(username):
+                return []
+            notifications = self._inboxes[username]
+            self._append(username, {'o': 'n'})
+            return notifications
+
+    def events(self, username=None):
+        """Yield logged events still on disk, oldest first, for audit or undo"""
+        self.sync()
+        for _, segment in self._segments():
+            try:
+                f = open(segment, 'rb')
+            except FileNotFoundError:
+                # Dropped after a snapshot since it was listed
+                continue
+            with f:
+                for line in f:
+                    if not line.endswith(b'\n'):
+                        # The live segment's last event is still being appended
+                        break
+                    event = json.loads(line)
+                    if username is None or event['u'] == username:
+                        yield event
+
+    # Durability
+    def sync(self):
+        """fsync everything appended so far"""
+        with self._sync_lock:
+            with self._lock:
+                if not self._unsynced:
+                    return
+                self._unsynced = False
+                file = self._file
+            # Appends carry on while the disk catches up
+            os.fsync(file.fileno())
+
+    def _flush_loop(self):
+        while not self._closed.wait(self.fsync_interval):
+            self.sync()
+            self._maintain()
+
+    def _maintain(self):
+        """Rotate a full segment and write the snapshots that are due"""
+        with self._sync_lock, self._lock:
+            rotate = self._file.tell() >= self.segment_bytes
+            if rotate:
+                os.fsync(self._file.fileno())
+                self._file.close()
+                self._segment_start = self._seq + 1
+                self._file = open(self._segment_path(self._segment_start), 'ab')
+                self._unsynced = False
+            # After a rotation every user with logged events is snapshotted
+            # so the old segments can go
+            due = [username for username, count in self._pending_events.items()
+                   if count >= self.snapshot_every or (rotate and count)]
+        for username in due:
+            self.snapshot(username)
+        if rotate:
+            self._drop_old_segments()
+
+    def snapshot(self, username):
+        """Write a user's current state to their snapshot file"""
+        with self._lock:
+            # Records are replaced, never changed in place, so shallow
+            # copies are a consistent view and serialising can happen
+            # outside the lock
+            snapshot = {
+                'username': username,
+                'seq': self._seq,
+                'profile': copy.deepcopy(self._users[username][0]),
+                'preferences': copy.deepcopy(self._users[username][1]),
+                'records': {kind: list(self._records[kind].get(username, {}).values()) for kind in KINDS},
+                'note_terms': dict(self._note_terms.get(username, {})),
+                'rollups': copy.deepcopy(self._rollups.get(username, {})),
+                'fired_reminders': sorted(self._fired.get(username, ())),
+                'notifications': list(self._inboxes.get(username, ()))
+            }
+            self._pending_events[username] = 0
+        self.sync()
+        path = os.path.join(self._snapshot_dir, f'{_safe_name(username)}.json')
+        tmp_path = f'{path}.tmp'
+        with open(tmp_path, 'w') as f:
+            json.dump(snapshot, f, separators=(',', ':'))
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+        with self._lock:
+            self._snapshot_seq[username] = snapshot['seq']
+
+    def _drop_old_segments(self):
+        with self._lock:
+            covered = min([self._seq] + [self._snapshot_seq.get(u, 0) for u, count in self._pending_events.items()
+                                         if count])
+            active = self._segment_start
+        segments = self._segments()
+        for (first_seq, segment), following in zip(segments, segments[1:] + [(None, None)]):
+            # A segment can go once the next one starts at or before the
+            # oldest event still needed
+            if segment != self._segment_path(active) and following[0] is not None and following[0] <= covered + 1:
+                os.remove(segment)
+
+    def close(self):
+        """Stop the flusher and snapshot every user with logged events, for a fast restart"""
+        self._closed.set()
+        self._flusher.join()
+        with self._lock:
+            due = [username for username, count in self._pending_events.items() if count]
+        for username in due:
+            self.snapshot(username)
+        self.sync()
+        with self._lock:
+            self._file.close()
+
+
+def _patched(old, event):
+    """A new record dict with a patch event applied"""
+    record = dict(old)
+    record.update(event.get('c', {}))
+    for name, added in event.get('a', {}).items():
+        record[name] = sorted(set(record[name]) | set(added))
+    for name, removed in event.get('x', {}).items():
+        record[name] = sorted(set(record[name]) - set(removed))
+    return record
+
+
+def _safe_name(username):
+    """File name for a user's snapshot; hex-encoded so any username is safe"""
+    return username.encode('utf-8').hex()
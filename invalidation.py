@@ -0,0 +1,66 @@
+import sqlite3
+import threading
+
+# Seconds between checks for writes by other processes sharing the database
+POLL_INTERVAL = 0.25
+
+
+class ChangeWatcher:
+    """Drops cached users from a DataService when another process changes their data.
+
+    Every worker process of a deployment shares one SQLite database, and
+    each SQLite write logs the user it touched. PRAGMA data_version on a
+    dedicated connection only changes when some other connection commits,
+    so an idle poll is one pragma; the change log is read only after
+    that, and users changed by other processes are reloaded on next use.
+    """
+
+    def __init__(self, service, backend, interval=POLL_INTERVAL):
+        self.service = service
+        self.backend = backend
+        self.interval = interval
+        self._conn = sqlite3.connect(backend.path, check_same_thread=False, isolation_level=None)
+        self._data_version = self._read_data_version()
+        self._seq = backend.latest_change()
+        self._stopped = threading.Event()
+        self._thread = threading.Thread(target=self._run, name='change-watcher', daemon=True)
+        self._thread.start()
+
+    def _read_data_version(self):
+        return self._conn.execute("PRAGMA data_version").fetchone()[0]
+
+    def poll(self):
+        """Invalidate users changed elsewhere since the last poll; returns them"""
+        data_version = self._read_data_version()
+        if data_version == self._data_version:
+            return set()
+        self._data_version = data_version
+        users, self._seq, pruned = self.backend.changes_since(self._seq)
+        if pruned:
+            # Fell behind the log; anything may have changed
+            self.service.invalidate_all()
+            return None
+        for username in users:
+            self.service.invalidate(username)
+        return users
+
+    def _run(self):
+        while not self._stopped.wait(self.interval):
+            try:
+                self.poll()
+            except sqlite3.Error:
+                # Busy or briefly unavailable; the next poll catches up
+                pass
+
+    def stop(self):
+        self._stopped.set()
+        self._thread.join()
+        self._conn.close()
+
+
+def watch(service):
+    """Start a ChangeWatcher when the service's storage is a shared SQLite database, else return None"""
+    backend = getattr(service.storage, 'backend', service.storage)
+    if not hasattr(backend, 'changes_since'):
+        return None
+    return ChangeWatcher(service, backend)
@@ -0,0 +1,100 @@
+import plotly.graph_objects as go
+
+BASE_LAYOUT = dict(
+    title_font_size=16,
+    margin=dict(t=50, b=50, l=50, r=50),
+    plot_bgcolor='rgba(0,0,0,0)',
+    paper_bgcolor='rgba(0,0,0,0)',
+    font=dict(color='#333333')
+)
+
+
+def _cycle(colors, count):
+    return [colors[i % len(colors)] for i in range(count)]
+
+
+def pie_figure(title, labels, values, colors):
+    """Donut chart with percentage labels"""
+    fig = go.Figure(go.Pie(
+        labels=list(labels),
+        values=list(values),
+        hole=0.3,
+        marker=dict(colors=_cycle(colors, len(labels))),
+        textinfo='percent+label',
+        textfont_size=14,
+        sort=False
+    ))
+    fig.update_layout(title=title, **BASE_LAYOUT)
+    return fig
+
+
+def bar_figure(title, labels, values, color, label_name, value_name, horizontal=False):
+    """Single-series bar chart, vertical unless horizontal is set"""
+    if horizontal:
+        trace = go.Bar(
+            x=list(values),
+            y=list(labels),
+            orientation='h',
+            marker_color=color,
+            hovertemplate=f'{label_name}: %{{y}}<br>{value_name}: %{{x}}<extra></extra>'
+        )
+        axes = dict(xaxis_title=value_name, yaxis_title='')
+    else:
+        trace = go.Bar(
+            x=list(labels),
+            y=list(values),
+            marker_color=color,
+            hovertemplate=f'{label_name}: %{{x}}<br>{value_name}: %{{y}}<extra></extra>'
+        )
+        axes = dict(xaxis_title='', yaxis_title=value_name, xaxis_tickangle=45)
+    fig = go.Figure(trace)
+    fig.update_layout(title=title, **axes, **BASE_LAYOUT)
+    return fig
+
+
+def line_figure(title, labels, values, color, value_name):
+    """Line chart with markers"""
+    fig = go.Figure(go.Scatter(
+        x=list(labels),
+        y=list(values),
+        mode='lines+markers',
+        line=dict(color=color, width=2),
+        marker=dict(size=8),
+        hovertemplate=f'%{{x}}<br>{value_name}: %{{y}}<extra></extra>'
+    ))
+    fig.update_layout(title=title, xaxis_title='', yaxis_title=value_name, xaxis_tickangle=45, **BASE_LAYOUT)
+    return fig
+
+
+def multi_line_figure(title, labels, series, colors, value_name):
+    """Line chart with one trace per (name, values) series"""
+    fig = go.Figure([
+        go.Scatter(
+            x=list(labels),
+            y=list(values),
+            name=name,
+            mode='lines+markers' if len(labels) <= 60 else 'lines',
+            line=dict(color=color, width=2),
+            hovertemplate=f'%{{x}}<br>{name}: %{{y}}<extra></extra>'
+        )
+        for (name, values), color in zip(series, colors)
+    ])
+    fig.update_layout(title=title, xaxis_title='', yaxis_title=value_name,
+                      legend=dict(orientation='h', y=-0.2), **BASE_LAYOUT)
+    return fig
+
+
+def heatmap_figure(title, columns, rows, row_labels, value_name):
+    """Calendar-style heatmap; None cells are left blank"""
+    fig = go.Figure(go.Heatmap(
+        z=[list(row) for row in rows],
+        x=list(columns),
+        y=list(row_labels),
+        colorscale='Greens',
+        xgap=2,
+        ygap=2,
+        hoverongaps=False,
+        hovertemplate=f'Week of %{{x}}, %{{y}}<br>{value_name}: %{{z}}<extra></extra>'
+    ))
+    fig.update_layout(title=title, yaxis_autorange='reversed', **BASE_LAYOUT)
+    return fig
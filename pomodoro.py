@@ -0,0 +1,120 @@
+import time
+
+# Work sessions before a long break
+SESSIONS_PER_LONG_BREAK = 4
+
+PHASE_COLORS = {'work': '#e74c3c', 'short_break': '#27ae60', 'long_break': '#27ae60'}
+
+
+def new_state():
+    """Initial timer state: only the phase, its start and its length are tracked"""
+    return {
+        'is_running': False,
+        'start_time': None,
+        'duration': 25 * 60,
+        'session_type': 'work',
+        'sessions_completed': 0,
+        'work_duration': 25,
+        'short_break_duration': 5,
+        'long_break_duration': 15
+    }
+
+
+def phase_duration(state, session_type):
+    """Length in seconds of a phase under the current settings"""
+    return state[f'{session_type}_duration'] * 60
+
+
+def remaining(state, now=None):
+    """Seconds left in the current phase"""
+    if not state['is_running']:
+        return state['duration']
+    now = time.time() if now is None else now
+    return max(0, state['start_time'] + state['duration'] - now)
+
+
+def advance(state, now=None):
+    """Move through every phase that has ended by wall-clock time.
+
+    Returns the session types that finished, oldest first.
+    """
+    now = time.time() if now is None else now
+    finished = []
+    while state['is_running'] and now >= state['start_time'] + state['duration']:
+        ended_at = state['start_time'] + state['duration']
+        current = state['session_type']
+        finished.append(current)
+        if current == 'work':
+            state['sessions_completed'] += 1
+            if state['sessions_completed'] % SESSIONS_PER_LONG_BREAK == 0:
+                state['session_type'] = 'long_break'
+            else:
+                state['session_type'] = 'short_break'
+        else:
+            state['session_type'] = 'work'
+        # The next phase starts when the previous one ended, not when the
+        # state happens to be read
+        state['start_time'] = ended_at
+        state['duration'] = phase_duration(state, state['session_type'])
+    return finished
+
+
+def start(state, now=None):
+    if not state['is_running']:
+        state['is_running'] = True
+        state['start_time'] = time.time() if now is None else now
+
+
+def pause(state, now=None):
+    if state['is_running']:
+        state['duration'] = remaining(state, now)
+        state['is_running'] = False
+        state['start_time'] = None
+
+
+def reset(state):
+    state['is_running'] = False
+    state['start_time'] = None
+    state['session_type'] = 'work'
+    state['duration'] = phase_duration(state, 'work')
+    state['sessions_completed'] = 0
+
+
+def apply_settings(state, work_duration, short_break_duration, long_break_duration):
+    """Change phase lengths; the timer must be paused"""
+    state['work_duration'] = work_duration
+    state['short_break_duration'] = short_break_duration
+    state['long_break_duration'] = long_break_duration
+    state['duration'] = phase_duration(state, state['session_type'])
+
+
+def countdown_html(state, now=None):
+    """Timer display that counts down in the browser without server reruns"""
+    seconds = int(remaining(state, now))
+    color = PHASE_COLORS.get(state['session_type'], '#e74c3c')
+    running = 'true' if state['is_running'] else 'false'
+    return f"""
+    <div id="pomodoro-timer" style="text-align: center; font-size: 3em; font-weight: bold;
+                color: {color}; margin: 1rem 0; background-color: #e9ecef; font-family: Arial, sans-serif;
+                padding: 1rem; border-radius: 8px; box-shadow: 0 2px 4px rgba(0,0,0,0.1);">
+        {seconds // 60:02d}:{seconds % 60:02d}
+    </div>
+    <script>
+    (function() {{
+        const el = document.getElementById("pomodoro-timer");
+        const deadline = Date.now() + {seconds} * 1000;
+        function render() {{
+            const left = Math.max(0, Math.round((deadline - Date.now()) / 1000));
+            const m = String(Math.floor(left / 60)).padStart(2, "0");
+            const s = String(left % 60).padStart(2, "0");
+            el.textContent = m + ":" + s;
+            return left;
+        }}
+        if ({running}) {{
+            const timer = setInterval(function() {{
+                if (render() === 0) clearInterval(timer);
+            }}, 1000);
+        }}
+    }})();
+    </script>
+    """
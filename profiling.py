@@ -0,0 +1,240 @@
+import os
+import tempfile
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager
+from functools import wraps
+
+# Profiling is off unless this is set to 1 or the page has ?profile=1
+ENV_VAR = 'PRODUCTIVITY_HUB_PROFILE'
+METRICS_FILE_ENV = 'PRODUCTIVITY_HUB_METRICS_FILE'
+METRICS_PORT_ENV = 'PRODUCTIVITY_HUB_METRICS_PORT'
+DEFAULT_METRICS_FILE = 'productivity_hub_metrics.prom'
+
+# Each Streamlit session runs its script on its own thread, so the timings
+# of the rerun in progress are kept per thread
+_local = threading.local()
+
+
+def enabled(query_value=None):
+    """True when profiling is switched on by the environment or a query parameter"""
+    if os.environ.get(ENV_VAR, '') not in ('', '0'):
+        return True
+    return query_value in ('1', 'true', 'yes')
+
+
+class Registry:
+    """Process-wide totals of every timed section, in Prometheus text format on demand"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.sections = {}
+        self.reruns = 0
+        self.last_alloc_peak = 0
+        self.last_alloc_net = 0
+
+    def record(self, kind, name, seconds):
+        with self._lock:
+            entry = self.sections.get((kind, name))
+            if entry is None:
+                self.sections[(kind, name)] = [1, seconds, seconds]
+            else:
+                entry[0] += 1
+                entry[1] += seconds
+                entry[2] = max(entry[2], seconds)
+
+    def record_rerun(self, alloc_peak, alloc_net):
+        with self._lock:
+            self.reruns += 1
+            self.last_alloc_peak = alloc_peak
+            self.last_alloc_net = alloc_net
+
+    def totals(self):
+        """(kind, name, count, total seconds, max seconds) rows sorted by total time"""
+        with self._lock:
+            rows = [(kind, name, *entry) for (kind, name), entry in self.sections.items()]
+        return sorted(rows, key=lambda row: row[3], reverse=True)
+
+    def prometheus(self):
+        lines = [
+            "# HELP productivity_hub_section_seconds Time spent in instrumented sections",
+            "# TYPE productivity_hub_section_seconds summary"
+        ]
+        rows = self.totals()
+        for kind, name, count, total, _ in rows:
+            labels = _labels(kind, name)
+            lines.append(f"productivity_hub_section_seconds_count{{{labels}}} {count}")
+            lines.append(f"productivity_hub_section_seconds_sum{{{labels}}} {total:.6f}")
+        lines.append("# HELP productivity_hub_section_max_seconds Slowest call of each section")
+        lines.append("# TYPE productivity_hub_section_max_seconds gauge")
+        for kind, name, _, _, slowest in rows:
+            lines.append(f"productivity_hub_section_max_seconds{{{_labels(kind, name)}}} {slowest:.6f}")
+        traced, _ = tracemalloc.get_traced_memory()
+        with self._lock:
+            lines += [
+                "# HELP productivity_hub_reruns_total Profiled script reruns",
+                "# TYPE productivity_hub_reruns_total counter",
+                f"productivity_hub_reruns_total {self.reruns}",
+                "# HELP productivity_hub_rerun_alloc_peak_bytes Peak traced allocation during the last rerun",
+                "# TYPE productivity_hub_rerun_alloc_peak_bytes gauge",
+                f"productivity_hub_rerun_alloc_peak_bytes {self.last_alloc_peak}",
+                "# HELP productivity_hub_rerun_alloc_net_bytes Memory still allocated after the last rerun",
+                "# TYPE productivity_hub_rerun_alloc_net_bytes gauge",
+                f"productivity_hub_rerun_alloc_net_bytes {self.last_alloc_net}",
+                "# HELP productivity_hub_traced_memory_bytes Memory currently traced by tracemalloc",
+                "# TYPE productivity_hub_traced_memory_bytes gauge",
+                f"productivity_hub_traced_memory_bytes {traced}"
+            ]
+        return "\n".join(lines) + "\n"
+
+
+def _labels(kind, name):
+    name = str(name).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+    return f'kind="{kind}",name="{name}"'
+
+
+REGISTRY = Registry()
+
+# tracemalloc slows every allocation in the process, so it only runs while
+# at least one profiled rerun is in progress, unless something else started it
+_tracing_lock = threading.Lock()
+_profiled_reruns = 0
+_started_tracing = False
+
+
+def _start_tracing():
+    global _profiled_reruns, _started_tracing
+    with _tracing_lock:
+        _profiled_reruns += 1
+        if not tracemalloc.is_tracing():
+            tracemalloc.start()
+            _started_tracing = True
+
+
+def _stop_tracing():
+    global _profiled_reruns, _started_tracing
+    with _tracing_lock:
+        _profiled_reruns -= 1
+        if _profiled_reruns == 0 and _started_tracing:
+            tracemalloc.stop()
+            _started_tracing = False
+
+
+def begin_rerun():
+    """Start collecting timings for the rerun on this thread"""
+    _start_tracing()
+    tracemalloc.reset_peak()
+    _local.rerun = {
+        'timings': [],
+        'started': time.perf_counter(),
+        'alloc_start': tracemalloc.get_traced_memory()[0]
+    }
+
+
+def end_rerun():
+    """Finish this thread's rerun, add it to the registry and return its profile.
+
+    tracemalloc is process-wide, so allocation figures include any other
+    session rerunning at the same time.
+    """
+    rerun = getattr(_local, 'rerun', None)
+    if rerun is None:
+        return None
+    _local.rerun = None
+    current, peak = tracemalloc.get_traced_memory()
+    _stop_tracing()
+    profile = {
+        'timings': rerun['timings'],
+        'total': time.perf_counter() - rerun['started'],
+        'alloc_peak': max(0, peak - rerun['alloc_start']),
+        'alloc_net': current - rerun['alloc_start']
+    }
+    REGISTRY.record('rerun', 'main', profile['total'])
+    REGISTRY.record_rerun(profile['alloc_peak'], profile['alloc_net'])
+    write_metrics_file()
+    return profile
+
+
+def current_timings():
+    """Timings recorded so far in this thread's rerun"""
+    rerun = getattr(_local, 'rerun', None)
+    return rerun['timings'] if rerun else []
+
+
+@contextmanager
+def timer(kind, name):
+    """Time a section when the current rerun is being profiled; otherwise free"""
+    rerun = getattr(_local, 'rerun', None)
+    if rerun is None:
+        yield
+        return
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - started
+        rerun['timings'].append((kind, name, elapsed))
+        REGISTRY.record(kind, name, elapsed)
+
+
+def timed(kind):
+    """Decorator form of timer(), named after the function"""
+    def decorate(fn):
+        @wraps(fn)
+        def wrapper(*args, **kwargs):
+            if getattr(_local, 'rerun', None) is None:
+                return fn(*args, **kwargs)
+            with timer(kind, fn.__name__):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorate
+
+
+def write_metrics_file(path=None):
+    """Replace the metrics file with the current totals"""
+    path = path or os.environ.get(METRICS_FILE_ENV, DEFAULT_METRICS_FILE)
+    # A temporary file of its own per call, as sessions finish reruns concurrently
+    with tempfile.NamedTemporaryFile('w', dir=os.path.dirname(os.path.abspath(path)),
+                                     prefix=os.path.basename(path) + '.', suffix='.tmp', delete=False) as f:
+        f.write(REGISTRY.prometheus())
+    try:
+        os.replace(f.name, path)
+    except OSError:
+        os.unlink(f.name)
+        raise
+
+
+_server_lock = threading.Lock()
+_server = None
+
+
+def serve_metrics(port=None):
+    """Serve /metrics on localhost when PRODUCTIVITY_HUB_METRICS_PORT is set; started once per process"""
+    global _server
+    port = port or os.environ.get(METRICS_PORT_ENV)
+    if not port:
+        return None
+    # http.server pulls in the email package; only load it when serving
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    class MetricsHandler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path != '/metrics':
+                self.send_error(404)
+                return
+            body = REGISTRY.prometheus().encode('utf-8')
+            self.send_response(200)
+            self.send_header('Content-Type', 'text/plain; version=0.0.4')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    with _server_lock:
+        if _server is None:
+            _server = ThreadingHTTPServer(('127.0.0.1', int(port)), MetricsHandler)
+            threading.Thread(target=_server.serve_forever, name='metrics', daemon=True).start()
+    return _server
@@ -0,0 +1,398 @@
+import sys
+from dataclasses import dataclass, field
+from datetime import date, datetime
+from enum import Enum
+
+from recurrence import Rule
+
+# Minimum number of tombstones before a RecordList compacts itself
+COMPACT_THRESHOLD = 64
+
+
+class TaskStatus(Enum):
+    PENDING = 'pending'
+    COMPLETED = 'completed'
+
+
+class GoalStatus(Enum):
+    ACTIVE = 'active'
+    COMPLETED = 'completed'
+
+
+def now_minute():
+    """Current time at the minute resolution the app stores"""
+    return datetime.now().replace(second=0, microsecond=0)
+
+
+def _format_timestamp(value):
+    return value.isoformat(sep=' ', timespec='minutes') if value else None
+
+
+def _parse_timestamp(value):
+    return datetime.fromisoformat(value) if value else None
+
+
+def _format_date(value):
+    return value.isoformat() if value else None
+
+
+def _parse_date(value):
+    return date.fromisoformat(value) if value else None
+
+
+def _intern(value):
+    # Categories, priorities and frequencies repeat across thousands of
+    # records, so every record shares a single string object per value
+    return sys.intern(value) if value is not None else None
+
+
+@dataclass(slots=True)
+class Task:
+    id: str
+    text: str
+    status: TaskStatus = TaskStatus.PENDING
+    priority: str = 'Medium'
+    category: str = 'General'
+    due_date: date = None
+    created_at: datetime = field(default_factory=now_minute)
+    completed_at: datetime = None
+    time_spent: int = 0
+    # Repeating tasks start on due_date; only the occurrences marked done
+    # are stored, in completions, which stays None while empty
+    recurrence: Rule = None
+    completions: set = None
+
+    def __post_init__(self):
+        self.priority = _intern(self.priority)
+        self.category = _intern(self.category)
+
+    @property
+    def completed(self):
+        return self.status is TaskStatus.COMPLETED
+
+    @property
+    def next_due(self):
+        """Due date, or for a repeating task its earliest occurrence not yet done"""
+        if self.recurrence is None:
+            return self.due_date
+        return self.recurrence.first_open(self.completions or ())
+
+    def toggle_occurrence(self, day):
+        """Mark one occurrence of a repeating task done or not done; returns True if it is now done"""
+        if self.completions is None:
+            self.completions = set()
+        if day in self.completions:
+            self.completions.discard(day)
+            if not self.completions:
+                self.completions = None
+            return False
+        self.completions.add(day)
+        return True
+
+    def to_dict(self):
+        """Convert to the stored dict shape"""
+        return {
+            'id': self.id,
+            'text': self.text,
+            'completed': self.completed,
+            'priority': self.priority,
+            'category': self.category,
+            'due_date': _format_date(self.due_date),
+            'created_at': _format_timestamp(self.created_at),
+            'completed_at': _format_timestamp(self.completed_at),
+            'time_spent': self.time_spent,
+            'recurrence': str(self.recurrence) if self.recurrence else None,
+            'completions': sorted(_format_date(d) for d in self.completions or ())
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        """Build a task from the stored dict shape"""
+        created_at = _parse_timestamp(data['created_at'])
+        due_date = _parse_date(data.get('due_date'))
+        recurrence = data.get('recurrence')
+        if recurrence:
+            due_date = due_date or created_at.date()
+            recurrence = Rule.parse(recurrence, due_date)
+        completions = {_parse_date(d) for d in data.get('completions') or () if d}
+        return cls(
+            id=data['id'],
+            text=data['text'],
+            status=TaskStatus.COMPLETED if data['completed'] else TaskStatus.PENDING,
+            priority=data.get('priority', 'Medium'),
+            category=data.get('category', 'General'),
+            due_date=due_date,
+            created_at=created_at,
+            completed_at=_parse_timestamp(data.get('completed_at')),
+            time_spent=data.get('time_spent', 0),
+            recurrence=recurrence or None,
+            completions=completions or None
+        )
+
+
+@dataclass(slots=True)
+class Note:
+    id: str
+    title: str
+    content: str
+    category: str = 'General'
+    created_at: datetime = field(default_factory=now_minute)
+    updated_at: datetime = field(default_factory=now_minute)
+
+    def __post_init__(self):
+        self.category = _intern(self.category)
+
+    def to_dict(self):
+        """Convert to the stored dict shape"""
+        return {
+            'id': self.id,
+            'title': self.title,
+            'content': self.content,
+            'category': self.category,
+            'created_at': _format_timestamp(self.created_at),
+            'updated_at': _format_timestamp(self.updated_at)
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        """Build a note from the stored dict shape"""
+        return cls(
+            id=data['id'],
+            title=data['title'],
+            content=data['content'],
+            category=data.get('category', 'General'),
+            created_at=_parse_timestamp(data['created_at']),
+            updated_at=_parse_timestamp(data['updated_at'])
+        )
+
+
+class CompletionBitmap:
+    """Set of completion dates stored as one bit per day since an origin date.
+
+    The current run and the longest run are cached, so membership, marking
+    the next day and streak reads are O(1). Range counts use popcount.
+    """
+
+    __slots__ = ('origin', 'bits', 'count', 'last_day', 'last_run', 'longest')
+
+    def __init__(self, origin, dates=()):
+        self.origin = origin.toordinal()
+        self.bits = bytearray()
+        self.count = 0
+        self.last_day = None
+        self.last_run = 0
+        self.longest = 0
+        for day in sorted(dates):
+            self.add(day)
+
+    def _has(self, ordinal):
+        offset = ordinal - self.origin
+        if offset < 0 or offset >> 3 >= len(self.bits):
+            return False
+        return bool(self.bits[offset >> 3] & (1 << (offset & 7)))
+
+    def _run_length(self, ordinal, step):
+        """Consecutive set days starting next to ordinal and moving by step"""
+        length = 0
+        ordinal += step
+        while self._has(ordinal):
+            length += 1
+            ordinal += step
+        return length
+
+    def add(self, day):
+        """Mark a day complete; returns False if it already was"""
+        ordinal = day.toordinal()
+        if self._has(ordinal):
+            return False
+        if ordinal < self.origin:
+            # Backfill before the origin: shift everything right by whole bytes
+            shift = (self.origin - ordinal + 7) >> 3
+            self.bits[:0] = bytes(shift)
+            self.origin -= shift << 3
+        offset = ordinal - self.origin
+        if offset >> 3 >= len(self.bits):
+            self.bits.extend(bytes((offset >> 3) + 1 - len(self.bits)))
+        self.bits[offset >> 3] |= 1 << (offset & 7)
+        self.count += 1
+
+        if self.last_day is None or ordinal > self.last_day + 1:
+            run = 1
+            self.last_day, self.last_run = ordinal, 1
+        elif ordinal == self.last_day + 1:
+            # The usual case, marking the day after the last one: O(1)
+            self.last_day += 1
+            self.last_run += 1
+            run = self.last_run
+        else:
+            # Backfilling an earlier day can join two runs
+            run = self._run_length(ordinal, -1) + 1 + self._run_length(ordinal, 1)
+            if ordinal + self._run_length(ordinal, 1) == self.last_day:
+                self.last_run = run
+        self.longest = max(self.longest, run)
+        return True
+
+    def __contains__(self, day):
+        return self._has(day.toordinal())
+
+    def __eq__(self, other):
+        if not isinstance(other, CompletionBitmap):
+            return NotImplemented
+        return list(self) == list(other)
+
+    def __len__(self):
+        return self.count
+
+    def __iter__(self):
+        """Completed days in ascending order"""
+        for index, byte in enumerate(self.bits):
+            while byte:
+                low = byte & -byte
+                yield date.fromordinal(self.origin + (index << 3) + low.bit_length() - 1)
+                byte ^= low
+
+    def current_streak(self, today):
+        """Consecutive completed days ending today"""
+        return self.last_run if self.last_day == today.toordinal() else 0
+
+    def count_between(self, start, end):
+        """Number of completed days from start to end inclusive"""
+        first = max(start.toordinal() - self.origin, 0)
+        last = min(end.toordinal() - self.origin, len(self.bits) * 8 - 1)
+        if first > last:
+            return 0
+        chunk = int.from_bytes(self.bits[first >> 3:(last >> 3) + 1], 'little')
+        chunk >>= first & 7
+        chunk &= (1 << (last - first + 1)) - 1
+        return chunk.bit_count()
+
+
+@dataclass(slots=True)
+class Habit:
+    id: str
+    name: str
+    target_frequency: str = 'daily'
+    created_at: date = field(default_factory=date.today)
+    completions: CompletionBitmap = None
+
+    def __post_init__(self):
+        self.target_frequency = _intern(self.target_frequency)
+        if not isinstance(self.completions, CompletionBitmap):
+            self.completions = CompletionBitmap(self.created_at, self.completions or ())
+
+    def to_dict(self):
+        """Convert to the stored dict shape"""
+        return {
+            'id': self.id,
+            'name': self.name,
+            'target_frequency': self.target_frequency,
+            'created_at': _format_date(self.created_at),
+            'completions': [_format_date(d) for d in self.completions]
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        """Build a habit from the stored dict shape"""
+        return cls(
+            id=data['id'],
+            name=data['name'],
+            target_frequency=data['target_frequency'],
+            created_at=_parse_date(data['created_at']),
+            completions=[_parse_date(d) for d in data['completions']]
+        )
+
+
+@dataclass(slots=True)
+class Goal:
+    id: str
+    title: str
+    description: str
+    category: str
+    target_date: date
+    created_at: date = field(default_factory=date.today)
+    progress: int = 0
+    status: GoalStatus = GoalStatus.ACTIVE
+
+    def __post_init__(self):
+        self.category = _intern(self.category)
+
+    def to_dict(self):
+        """Convert to the stored dict shape"""
+        return {
+            'id': self.id,
+            'title': self.title,
+            'description': self.description,
+            'category': self.category,
+            'target_date': _format_date(self.target_date),
+            'created_at': _format_date(self.created_at),
+            'progress': self.progress,
+            'status': self.status.value
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        """Build a goal from the stored dict shape"""
+        return cls(
+            id=data['id'],
+            title=data['title'],
+            description=data['description'],
+            category=data.get('category', 'General'),
+            target_date=_parse_date(data['target_date']),
+            created_at=_parse_date(data['created_at']),
+            progress=data['progress'],
+            status=GoalStatus(data['status'])
+        )
+
+
+# Record class for each storage kind
+RECORD_TYPES = {'tasks': Task, 'notes': Note, 'habits': Habit, 'goals': Goal}
+
+
+class RecordList:
+    """Insertion-ordered records with an id index and tombstone-based deletion"""
+
+    def __init__(self, records=()):
+        self._slots = []
+        self._index = {}
+        for record in records:
+            self.append(record)
+
+    def append(self, record):
+        """Add a record at the end"""
+        self._index[record.id] = len(self._slots)
+        self._slots.append(record)
+
+    def get(self, record_id, default=None):
+        """Return the record with the given id in O(1)"""
+        pos = self._index.get(record_id)
+        return default if pos is None else self._slots[pos]
+
+    def remove(self, record_id):
+        """Delete a record by id, leaving a tombstone in its slot"""
+        pos = self._index.pop(record_id, None)
+        if pos is None:
+            return None
+        record = self._slots[pos]
+        self._slots[pos] = None
+        # Compact once tombstones outnumber live records, which keeps
+        # deletes amortised O(1) and iteration proportional to len(self)
+        dead = len(self._slots) - len(self._index)
+        if dead >= COMPACT_THRESHOLD and dead > len(self._index):
+            self._compact()
+        return record
+
+    def _compact(self):
+        self._slots = [r for r in self._slots if r is not None]
+        self._index = {r.id: pos for pos, r in enumerate(self._slots)}
+
+    def __contains__(self, record_id):
+        return record_id in self._index
+
+    def __len__(self):
+        return len(self._index)
+
+    def __iter__(self):
+        return (r for r in self._slots if r is not None)
+
+    def __reversed__(self):
+        return (r for r in reversed(self._slots) if r is not None)
@@ -0,0 +1,202 @@
+from datetime import date, timedelta
+
+FREQUENCIES = ('DAILY', 'WEEKLY', 'MONTHLY')
+
+# iCalendar weekday codes, indexed by date.weekday()
+WEEKDAYS = ('MO', 'TU', 'WE', 'TH', 'FR', 'SA', 'SU')
+WEEKDAY_NAMES = ('Mon', 'Tue', 'Wed', 'Thu', 'Fri', 'Sat', 'Sun')
+
+UNITS = {'DAILY': ('day', 'days'), 'WEEKLY': ('week', 'weeks'), 'MONTHLY': ('month', 'months')}
+
+
+def _month_index(day):
+    return day.year * 12 + day.month - 1
+
+
+def _month_day(index, day_of_month):
+    """The given day of a month counted by _month_index, or None when the month is too short"""
+    year, month = divmod(index, 12)
+    try:
+        return date(year, month + 1, day_of_month)
+    except ValueError:
+        return None
+
+
+class Rule:
+    """A recurrence in the RRULE subset FREQ, INTERVAL, BYDAY, UNTIL and COUNT, anchored at a start date.
+
+    Occurrences are computed arithmetically from the start, so asking for
+    the ones in a window costs the same however far the window is from
+    the start. Weekly rules repeat on BYDAY, or the start's weekday;
+    monthly rules repeat on the start's day of the month and, as in
+    iCalendar, skip months that are too short.
+    """
+
+    __slots__ = ('freq', 'start', 'interval', 'weekdays', 'until', 'count', 'last')
+
+    def __init__(self, freq, start, interval=1, weekdays=None, until=None, count=None):
+        if freq not in FREQUENCIES:
+            raise ValueError(f"Unsupported frequency: {freq}")
+        if interval < 1 or (count is not None and count < 1):
+            raise ValueError("INTERVAL and COUNT must be positive")
+        self.freq = freq
+        self.start = start
+        self.interval = interval
+        # Only kept when given, so the rule text doesn't depend on the start
+        self.weekdays = tuple(sorted(set(weekdays))) if weekdays and freq == 'WEEKLY' else None
+        self.until = until
+        self.count = count
+        # No occurrence falls after this date; None for a rule that never ends
+        self.last = self._last()
+
+    @classmethod
+    def parse(cls, text, start):
+        """Build a rule from RRULE text such as 'FREQ=WEEKLY;INTERVAL=2;BYDAY=MO,TH'"""
+        parts = {}
+        for part in text.strip().removeprefix('RRULE:').split(';'):
+            if part:
+                name, _, value = part.partition('=')
+                parts[name.strip().upper()] = value.strip().upper()
+        unknown = set(parts) - {'FREQ', 'INTERVAL', 'BYDAY', 'UNTIL', 'COUNT'}
+        if unknown:
+            raise ValueError(f"Unsupported recurrence part: {', '.join(sorted(unknown))}")
+        weekdays = None
+        if parts.get('BYDAY'):
+            try:
+                weekdays = [WEEKDAYS.index(code) for code in parts['BYDAY'].split(',')]
+            except ValueError:
+                raise ValueError(f"Invalid BYDAY: {parts['BYDAY']}") from None
+        until = parts.get('UNTIL')
+        return cls(
+            parts.get('FREQ'),
+            start,
+            interval=int(parts.get('INTERVAL', 1)),
+            weekdays=weekdays,
+            until=date(int(until[:4]), int(until[4:6]), int(until[6:8])) if until else None,
+            count=int(parts['COUNT']) if 'COUNT' in parts else None
+        )
+
+    def __str__(self):
+        parts = [f"FREQ={self.freq}"]
+        if self.interval != 1:
+            parts.append(f"INTERVAL={self.interval}")
+        if self.weekdays:
+            parts.append("BYDAY=" + ",".join(WEEKDAYS[day] for day in self.weekdays))
+        if self.until:
+            parts.append(f"UNTIL={self.until:%Y%m%d}")
+        if self.count is not None:
+            parts.append(f"COUNT={self.count}")
+        return ";".join(parts)
+
+    def __eq__(self, other):
+        if not isinstance(other, Rule):
+            return NotImplemented
+        return self.start == other.start and str(self) == str(other)
+
+    def __repr__(self):
+        return f"Rule({str(self)!r}, start={self.start!r})"
+
+    def describe(self):
+        """Short human-readable form, e.g. 'Every 2 weeks on Mon, Thu'"""
+        one, many = UNITS[self.freq]
+        text = f"Every {one}" if self.interval == 1 else f"Every {self.interval} {many}"
+        if self.freq == 'WEEKLY':
+            text += " on " + ", ".join(WEEKDAY_NAMES[day] for day in self._weekdays())
+        elif self.freq == 'MONTHLY':
+            text += f" on day {self.start.day}"
+        if self.count is not None:
+            text += f", {self.count} times"
+        if self.until:
+            text += f" until {self.until}"
+        return text
+
+    def _weekdays(self):
+        return self.weekdays or (self.start.weekday(),)
+
+    def _last(self):
+        last = self.until
+        if self.count is not None:
+            nth = self._nth(self.count - 1)
+            last = nth if last is None else min(last, nth)
+        return last
+
+    def _nth(self, n):
+        """Date of occurrence n, counting the first as 0, ignoring UNTIL"""
+        if self.freq == 'DAILY':
+            return self.start + timedelta(days=n * self.interval)
+        if self.freq == 'WEEKLY':
+            weekdays = self._weekdays()
+            # Pretend the start week's days before the start are occurrences too
+            n += sum(1 for day in weekdays if day < self.start.weekday())
+            week, position = divmod(n, len(weekdays))
+            first_week = self.start - timedelta(days=self.start.weekday())
+            return first_week + timedelta(weeks=week * self.interval, days=weekdays[position])
+        if self.start.day <= 28:
+            return _month_day(_month_index(self.start) + n * self.interval, self.start.day)
+        # Short months are skipped, so count the ones that have the day
+        index = _month_index(self.start)
+        while True:
+            day = _month_day(index, self.start.day)
+            if day is not None:
+                if not n:
+                    return day
+                n -= 1
+            index += self.interval
+
+    def between(self, start, end):
+        """Yield the occurrences from start to end inclusive, in order"""
+        start = max(start, self.start)
+        if self.last is not None:
+            end = min(end, self.last)
+        if start > end:
+            return
+        if self.freq == 'DAILY':
+            step = timedelta(days=self.interval)
+            day = self.start + step * -(-(start - self.start).days // self.interval)
+            while day <= end:
+                yield day
+                day += step
+        elif self.freq == 'WEEKLY':
+            first_week = self.start - timedelta(days=self.start.weekday())
+            # Round up to the first week the rule repeats in
+            weeks = -(-((start - first_week).days // 7) // self.interval) * self.interval
+            week = first_week + timedelta(weeks=weeks)
+            step = timedelta(weeks=self.interval)
+            weekdays = self._weekdays()
+            while week <= end:
+                for weekday in weekdays:
+                    day = week + timedelta(days=weekday)
+                    if day > end:
+                        return
+                    if day >= start:
+                        yield day
+                week += step
+        else:
+            months = _month_index(start) - _month_index(self.start)
+            index = _month_index(self.start) + -(-months // self.interval) * self.interval
+            while True:
+                day = _month_day(index, self.start.day)
+                if day is not None:
+                    if day > end:
+                        return
+                    if day >= start:
+                        yield day
+                elif _month_day(index, 1) > end:
+                    return
+                index += self.interval
+
+    def occurs_on(self, day):
+        return next(self.between(day, day), None) is not None
+
+    def first_open(self, done):
+        """Earliest occurrence not in the set done, or None once every occurrence is done"""
+        window = self.start
+        # Walk forward a window at a time; done occurrences are usually a
+        # prefix, so this stops soon after the last of them
+        while self.last is None or window <= self.last:
+            window_end = window + timedelta(days=366)
+            for day in self.between(window, window_end):
+                if day not in done:
+                    return day
+            window = window_end + timedelta(days=1)
+        return None
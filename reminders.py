@@ -0,0 +1,270 @@
+import heapq
+import itertools
+import json
+import os
+import threading
+import time
+from collections import deque
+from datetime import datetime, time as clock_time, timedelta
+
+# Fired reminders are also appended to this JSON-lines file when it is set
+OUTBOX_ENV = 'PRODUCTIVITY_HUB_OUTBOX'
+
+# A due-soon reminder fires at the start of work this many days before the
+# due date; an overdue one at the start of work the day after it
+DUE_SOON_DAYS = 1
+
+DEFAULT_WORK_HOURS = {'start': '09:00', 'end': '17:00'}
+
+# Cancelled entries stay in the heap until they surface or outnumber the
+# live ones, when the heap is rebuilt without them
+COMPACT_MIN = 1024
+
+# Notifications kept per user until a session picks them up
+INBOX_LIMIT = 100
+
+# Longest single sleep of the firing thread, which also keeps far-future
+# due dates within what a lock timeout accepts
+MAX_SLEEP = 3600
+
+KINDS = ('due_soon', 'overdue')
+
+
+def _work_hours(preferences):
+    hours = (preferences or {}).get('work_hours') or DEFAULT_WORK_HOURS
+    return clock_time.fromisoformat(hours['start']), clock_time.fromisoformat(hours['end'])
+
+
+def next_work_time(timestamp, preferences):
+    """The first moment at or after timestamp that falls within the user's work hours"""
+    start, end = _work_hours(preferences)
+    moment = datetime.fromtimestamp(timestamp)
+    if start <= moment.time() < end:
+        return timestamp
+    day = moment.date() if moment.time() < start else moment.date() + timedelta(days=1)
+    return datetime.combine(day, start).timestamp()
+
+
+def work_start(day, preferences):
+    return datetime.combine(day, _work_hours(preferences)[0]).timestamp()
+
+
+class ReminderScheduler:
+    """Due-soon and overdue task reminders for every user, on one min-heap ordered by fire time.
+
+    Scheduling is a heap push and cancelling marks the entry dead, so
+    neither depends on how many tasks exist, and a single thread sleeps
+    until the earliest reminder is due instead of scanning tasks.
+    Reminders are held back until the user's work hours, read when the
+    reminder fires; one that comes due while the user's notifications are
+    off counts as delivered without being shown. Fired reminders wait in
+    the user's inbox for a session and go to the outbox file when one is
+    configured.
+
+    Each reminder is delivered once per due date. Before firing it is
+    claimed in the ledger, the storage backend, which remembers it across
+    reloads and restarts and keeps the inbox. With SQLite the claim also
+    settles which of the processes sharing the database fires it, and a
+    session on any of them picks up the notification.
+    """
+
+    def __init__(self, outbox_path=None, clock=time.time, ledger=None):
+        self.outbox_path = outbox_path
+        self.clock = clock
+        self.ledger = ledger
+        self._cond = threading.Condition()
+        # [fire at, seq, key, notification]; the notification is None once cancelled
+        self._heap = []
+        self._entries = {}
+        # username -> keys of their pending reminders
+        self._user_keys = {}
+        # username -> (task_id, kind, due) of reminders already delivered
+        self._fired = {}
+        self._cancelled = 0
+        self._seq = itertools.count()
+        self._preferences = {}
+        self._inboxes = {}
+        self._outbox_lock = threading.Lock()
+        self._thread = None
+        self._stopped = False
+
+    @classmethod
+    def from_env(cls, ledger=None):
+        return cls(os.environ.get(OUTBOX_ENV) or None, ledger=ledger)
+
+    def __len__(self):
+        """Number of pending reminders"""
+        return len(self._entries)
+
+    def register_user(self, username, preferences):
+        """Read this user's notification preferences from preferences, a dict that may change later"""
+        fired = self.ledger.load_fired_reminders(username) if self.ledger is not None else None
+        with self._cond:
+            self._preferences[username] = preferences
+            if fired is not None:
+                self._fired[username] = fired
+
+    # Scheduling
+    def schedule(self, username, task_id, kind, fire_at, notification):
+        """Fire notification at fire_at (epoch seconds), replacing this task's pending reminder of the same kind"""
+        key = (username, task_id, kind)
+        with self._cond:
+            self._cancel(key)
+            entry = self._push(fire_at, key, notification)
+            if self._heap[0] is entry:
+                self._cond.notify()
+        self._start()
+
+    def _push(self, fire_at, key, notification):
+        entry = [fire_at, next(self._seq), key, notification]
+        self._entries[key] = entry
+        self._user_keys.setdefault(key[0], set()).add(key)
+        heapq.heappush(self._heap, entry)
+        return entry
+
+    def cancel(self, username, task_id):
+        """Drop every pending reminder for a task"""
+        with self._cond:
+            for kind in KINDS:
+                self._cancel((username, task_id, kind))
+
+    def cancel_user(self, username):
+        """Drop every pending reminder for a user, whose working set is being discarded"""
+        with self._cond:
+            for key in list(self._user_keys.get(username, ())):
+                self._cancel(key)
+
+    def _cancel(self, key):
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            return
+        self._user_keys[key[0]].discard(key)
+        entry[3] = None
+        self._cancelled += 1
+        if self._cancelled > COMPACT_MIN and self._cancelled > len(self._entries):
+            self._heap = [entry for entry in self._heap if entry[3] is not None]
+            heapq.heapify(self._heap)
+            self._cancelled = 0
+
+    def task_changed(self, username, task):
+        """Bring a task's reminders in line with its due date and completion"""
+        due = None if task.completed else task.next_due
+        if due is None:
+            self.cancel(username, task.id)
+            return
+        preferences = self._preferences.get(username)
+        fired = self._fired.get(username, ())
+        now = self.clock()
+        overdue_at = work_start(due + timedelta(days=1), preferences)
+        notification = {'username': username, 'task_id': task.id, 'text': task.text, 'due': due.isoformat()}
+        # A reminder already delivered for this due date, before a reload or
+        # a restart, is not delivered again
+        if overdue_at > now and (task.id, 'due_soon', notification['due']) not in fired:
+            due_soon_at = work_start(due - timedelta(days=DUE_SOON_DAYS), preferences)
+            self.schedule(username, task.id, 'due_soon', max(due_soon_at, now),
+                          dict(notification, kind='due_soon'))
+        else:
+            with self._cond:
+                self._cancel((username, task.id, 'due_soon'))
+        if (task.id, 'overdue', notification['due']) in fired:
+            with self._cond:
+                self._cancel((username, task.id, 'overdue'))
+        else:
+            self.schedule(username, task.id, 'overdue', max(overdue_at, now), dict(notification, kind='overdue'))
+
+    # Firing
+    def fire_due(self, now=None):
+        """Deliver every reminder due by now; returns the notifications delivered"""
+        now = self.clock() if now is None else now
+        due = []
+        with self._cond:
+            while self._heap and self._heap[0][0] <= now:
+                entry = heapq.heappop(self._heap)
+                notification = entry[3]
+                if notification is None:
+                    self._cancelled -= 1
+                    continue
+                key = entry[2]
+                del self._entries[key]
+                self._user_keys[key[0]].discard(key)
+                preferences = self._preferences.get(key[0])
+                if not (preferences or {}).get('notifications', True):
+                    # Recorded as delivered, so it doesn't surface once notifications are back on
+                    due.append((key, notification, False))
+                    continue
+                deliver_at = next_work_time(now, preferences)
+                if deliver_at > now:
+                    # Outside work hours: wait for the next start of work
+                    self._push(deliver_at, key, notification)
+                    continue
+                due.append((key, notification, True))
+        # Claimed outside the lock, as the ledger may be a database shared with other processes
+        fired_at = datetime.fromtimestamp(now).isoformat(timespec='seconds')
+        fired, unrecorded = [], []
+        for key, notification, shown in due:
+            notification = dict(notification, fired_at=fired_at)
+            if not self._claim(key, notification.get('due'), notification if shown else None) or not shown:
+                continue
+            fired.append(notification)
+            if self.ledger is None or notification.get('due') is None:
+                # Not queued in the ledger, so kept here
+                unrecorded.append((key[0], notification))
+        if unrecorded:
+            with self._cond:
+                for username, notification in unrecorded:
+                    self._inboxes.setdefault(username, deque(maxlen=INBOX_LIMIT)).append(notification)
+        if fired and self.outbox_path:
+            with self._outbox_lock, open(self.outbox_path, 'a') as f:
+                for notification in fired:
+                    f.write(json.dumps(notification) + "\n")
+        return fired
+
+    def _claim(self, key, due, notification):
+        """Mark a reminder delivered, queueing notification in the ledger unless None; False if it already was"""
+        if due is None:
+            # Nothing to tell this reminder from the task's next one
+            return True
+        username, task_id, kind = key
+        reminder = (task_id, kind, due)
+        with self._cond:
+            fired = self._fired.setdefault(username, set())
+            if reminder in fired:
+                return False
+            fired.add(reminder)
+        return self.ledger is None or self.ledger.claim_reminder(username, task_id, kind, due, notification)
+
+    def pop_notifications(self, username):
+        """Take the notifications fired for a user since the last call, by this process or another"""
+        with self._cond:
+            inbox = self._inboxes.pop(username, None)
+        notifications = list(inbox) if inbox else []
+        if self.ledger is not None:
+            notifications.extend(self.ledger.pop_notifications(username)[-INBOX_LIMIT:])
+        return notifications
+
+    def _start(self):
+        if self._thread is None:
+            with self._cond:
+                if self._thread is None and not self._stopped:
+                    self._thread = threading.Thread(target=self._run, name='reminders', daemon=True)
+                    self._thread.start()
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while not self._stopped:
+                    # Sleep until the earliest reminder, or until an earlier one is scheduled
+                    delay = self._heap[0][0] - self.clock() if self._heap else None
+                    if delay is not None and delay <= 0:
+                        break
+                    self._cond.wait(MAX_SLEEP if delay is None else min(delay, MAX_SLEEP))
+                if self._stopped:
+                    return
+            self.fire_due()
+
+    def stop(self):
+        with self._cond:
+            self._stopped = True
+            self._cond.notify()
+        if self._thread is not None:
+            self._thread.join()
@@ -0,0 +1,118 @@
+from collections import Counter
+from datetime import date, timedelta
+
+# Counted per day, ISO week and month
+METRICS = ('tasks_created', 'tasks_completed', 'habit_completions', 'goal_updates', 'goal_progress')
+
+# Metrics that can't be rebuilt from the records and are kept in storage
+STORED_METRICS = ('goal_updates', 'goal_progress')
+
+BUCKETS = ('day', 'week', 'month')
+
+
+def week_start(day):
+    return day - timedelta(days=day.weekday())
+
+
+def month_start(day):
+    return day.replace(day=1)
+
+
+def _next_month(day):
+    return date(day.year + day.month // 12, day.month % 12 + 1, 1)
+
+
+class Rollups:
+    """Per-user activity counts in daily, weekly and monthly buckets, kept up to date by the mutation functions.
+
+    Task and habit counts are rebuilt from the records when a user is
+    loaded; goal progress changes leave no trace in the records, so those
+    daily counts come from storage.
+    """
+
+    def __init__(self):
+        self._buckets = {bucket: {metric: Counter() for metric in METRICS} for bucket in BUCKETS}
+
+    @classmethod
+    def from_records(cls, tasks, habits, stored):
+        """Build the rollups from a user's records and their stored {metric: {isoformat day: value}}"""
+        rollups = cls()
+        for task in tasks:
+            rollups.add_task(task)
+        for habit in habits:
+            for day in habit.completions:
+                rollups.add('habit_completions', day)
+        for metric, days in stored.items():
+            for day, value in days.items():
+                rollups.add(metric, date.fromisoformat(day), value)
+        return rollups
+
+    def add(self, metric, day, amount=1):
+        for bucket, start in (('day', day), ('week', week_start(day)), ('month', month_start(day))):
+            counter = self._buckets[bucket][metric]
+            counter[start] += amount
+            if not counter[start]:
+                del counter[start]
+
+    def add_task(self, task, amount=1):
+        self.add('tasks_created', task.created_at.date(), amount)
+        if task.completed_at:
+            self.add('tasks_completed', task.completed_at.date(), amount)
+        if task.recurrence is not None:
+            # Done occurrences of a repeating task count on the day they were due
+            for day in task.completions or ():
+                self.add('tasks_completed', day, amount)
+
+    def discard_task(self, task):
+        self.add_task(task, -1)
+
+    def series(self, metric, start, end, bucket='day'):
+        """(bucket start, value) for every bucket overlapping start..end, oldest first.
+
+        Costs one lookup per bucket, however many records there are.
+        """
+        counter = self._buckets[bucket][metric]
+        if bucket == 'day':
+            return [(start + timedelta(days=i), counter[start + timedelta(days=i)])
+                    for i in range((end - start).days + 1)]
+        if bucket == 'week':
+            first = week_start(start)
+            return [(first + timedelta(weeks=i), counter[first + timedelta(weeks=i)])
+                    for i in range((end - first).days // 7 + 1)]
+        points = []
+        month = month_start(start)
+        while month <= end:
+            points.append((month, counter[month]))
+            month = _next_month(month)
+        return points
+
+    def total(self, metric, start, end):
+        """Sum of a metric over start..end, from monthly buckets where whole months fit"""
+        total = 0
+        day = start
+        while day <= end:
+            if day.day == 1 and _next_month(day) - timedelta(days=1) <= end:
+                total += self._buckets['month'][metric][day]
+                day = _next_month(day)
+            else:
+                total += self._buckets['day'][metric][day]
+                day += timedelta(days=1)
+        return total
+
+    def weekly_grid(self, metrics, start, end):
+        """Daily totals of metrics laid out for a calendar heatmap.
+
+        Returns (week starts, rows) where rows[weekday][week] is the day's
+        total, or None for days outside start..end.
+        """
+        first = week_start(start)
+        weeks = [first + timedelta(weeks=i) for i in range((end - first).days // 7 + 1)]
+        counters = [self._buckets['day'][metric] for metric in metrics]
+        rows = []
+        for weekday in range(7):
+            row = []
+            for week in weeks:
+                day = week + timedelta(days=weekday)
+                row.append(sum(counter[day] for counter in counters) if start <= day <= end else None)
+            rows.append(row)
+        return weeks, rows
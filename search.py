@@ -0,0 +1,123 @@
+import math
+import re
+import unicodedata
+from bisect import bisect_left
+from collections import Counter
+
+# BM25 parameters
+K1 = 1.2
+B = 0.75
+
+# Title terms count this many times towards a note's term frequencies
+TITLE_WEIGHT = 2
+
+# Upper bound on vocabulary terms a single query prefix expands to
+MAX_PREFIX_EXPANSIONS = 64
+
+_TOKEN_RE = re.compile(r"\w+")
+
+
+def normalize(text):
+    """Casefold and strip accents so 'Café' and 'cafe' match"""
+    if text.isascii():
+        return text.lower()
+    decomposed = unicodedata.normalize('NFKD', text.casefold())
+    return ''.join(c for c in decomposed if not unicodedata.combining(c))
+
+
+def tokenize(text):
+    """Split text into normalized search terms"""
+    return _TOKEN_RE.findall(normalize(text))
+
+
+def note_term_frequencies(title, content):
+    """Return {term: frequency} for a note, with title terms weighted up"""
+    frequencies = Counter(tokenize(content))
+    for term in tokenize(title):
+        frequencies[term] += TITLE_WEIGHT
+    return dict(frequencies)
+
+
+class NoteIndex:
+    """Per-user inverted index over note titles and contents, ranked with BM25"""
+
+    def __init__(self):
+        self.postings = {}
+        self.doc_terms = {}
+        self.doc_lengths = {}
+        self.total_length = 0
+        self._vocabulary = None
+
+    def add(self, note_id, frequencies):
+        """Index a note from its term frequencies, replacing any previous entry"""
+        self.remove(note_id)
+        for term, count in frequencies.items():
+            postings = self.postings.get(term)
+            if postings is None:
+                postings = self.postings[term] = {}
+                self._vocabulary = None
+            postings[note_id] = count
+        length = sum(frequencies.values())
+        self.doc_terms[note_id] = frequencies
+        self.doc_lengths[note_id] = length
+        self.total_length += length
+
+    def remove(self, note_id):
+        """Drop a note from the index"""
+        frequencies = self.doc_terms.pop(note_id, None)
+        if frequencies is None:
+            return
+        for term in frequencies:
+            postings = self.postings[term]
+            del postings[note_id]
+            if not postings:
+                del self.postings[term]
+                self._vocabulary = None
+        self.total_length -= self.doc_lengths.pop(note_id)
+
+    def __len__(self):
+        return len(self.doc_terms)
+
+    def _expand(self, prefix):
+        """Return vocabulary terms starting with prefix, most common first"""
+        if self._vocabulary is None:
+            self._vocabulary = sorted(self.postings)
+        vocabulary = self._vocabulary
+        terms = []
+        pos = bisect_left(vocabulary, prefix)
+        while pos < len(vocabulary) and vocabulary[pos].startswith(prefix):
+            terms.append(vocabulary[pos])
+            pos += 1
+        if len(terms) > MAX_PREFIX_EXPANSIONS:
+            terms.sort(key=lambda t: len(self.postings[t]), reverse=True)
+            terms = terms[:MAX_PREFIX_EXPANSIONS]
+        return terms
+
+    def search(self, query, prefix=True):
+        """Return ids of notes matching every query term, best match first"""
+        query_terms = tokenize(query)
+        if not query_terms or not self.doc_terms:
+            return []
+
+        num_docs = len(self.doc_terms)
+        avg_length = self.total_length / num_docs or 1
+        scores = None
+        for query_term in dict.fromkeys(query_terms):
+            terms = self._expand(query_term) if prefix else [query_term]
+            term_scores = {}
+            for term in terms:
+                postings = self.postings.get(term)
+                if not postings:
+                    continue
+                idf = math.log(1 + (num_docs - len(postings) + 0.5) / (len(postings) + 0.5))
+                for note_id, tf in postings.items():
+                    norm = K1 * (1 - B + B * self.doc_lengths[note_id] / avg_length)
+                    term_scores[note_id] = term_scores.get(note_id, 0) + idf * tf * (K1 + 1) / (tf + norm)
+            if scores is None:
+                scores = term_scores
+            else:
+                scores = {note_id: score + term_scores[note_id]
+                          for note_id, score in scores.items() if note_id in term_scores}
+            if not scores:
+                return []
+        return sorted(scores, key=scores.get, reverse=True)
@@ -0,0 +1,403 @@
+import itertools
+import math
+import sys
+import threading
+import uuid
+from datetime import date, datetime
+
+import auth
+from records import RECORD_TYPES, Goal, GoalStatus, Habit, Note, RecordList, Task, TaskStatus, now_minute
+from recurrence import Rule
+from rollups import Rollups
+from search import NoteIndex, note_term_frequencies
+from stats import StatsAggregator
+from task_index import TaskIndex
+
+# Serves the HTTP API (api.py) from the app's process when set; kept here so
+# the app can check it without importing the API module
+API_PORT_ENV = 'PRODUCTIVITY_HUB_API_PORT'
+
+# Every load and change of a working set takes the next number, so a
+# version never repeats, even across a reload
+_versions = itertools.count(1)
+
+DEFAULT_PREFERENCES = {
+    'daily_goal': 5,
+    'notifications': True,
+    'work_hours': {'start': '09:00', 'end': '17:00'}
+}
+
+
+class UserData:
+    """One user's working set, shared by every session logged in as that user.
+
+    Hold self.lock while reading or changing anything here; every mutation
+    method takes it itself.
+    """
+
+    def __init__(self, username, storage, profile, preferences, reminders=None):
+        self.username = username
+        self.storage = storage
+        self.reminders = reminders
+        self.lock = threading.RLock()
+        # Changes on every mutation; API clients use it as an ETag
+        self.version = next(_versions)
+        self.profile = profile
+        self.preferences = preferences
+        self.tasks = self._load_records('tasks')
+        self.notes = self._load_records('notes')
+        self.habits = self._load_records('habits')
+        self.goals = self._load_records('goals')
+        self.stats = StatsAggregator.from_records(self.tasks, self.habits, self.goals)
+        self.task_index = TaskIndex.from_tasks(self.tasks)
+        self.rollups = Rollups.from_records(self.tasks, self.habits, self.storage.load_rollups(username))
+        self.note_index = self._load_note_index()
+        if reminders is not None:
+            reminders.register_user(username, self.preferences)
+            for task in self.tasks:
+                if task.due_date and not task.completed:
+                    reminders.task_changed(username, task)
+
+    def _load_records(self, kind):
+        record_type = RECORD_TYPES[kind]
+        return RecordList(record_type.from_dict(data) for data in self.storage.load_records(kind, self.username))
+
+    def _remind(self, task):
+        if self.reminders is not None:
+            self.reminders.task_changed(self.username, task)
+
+    def _load_note_index(self):
+        """Load the saved search index, indexing any notes missing from it"""
+        saved_terms = self.storage.load_note_terms(self.username)
+        index = NoteIndex()
+        for note in self.notes:
+            frequencies = saved_terms.get(note.id)
+            if frequencies is None:
+                frequencies = note_term_frequencies(note.title, note.content)
+                self.storage.save_note_terms(self.username, note.id, frequencies)
+            index.add(note.id, frequencies)
+        return index
+
+    # Tasks
+    def add_task(self, task_text, priority='Medium', category='General', due_date=None, recurrence=None):
+        """Add a task; recurrence is RRULE text such as 'FREQ=WEEKLY;BYDAY=MO,TH', starting on due_date"""
+        rule = None
+        if recurrence:
+            due_date = due_date or date.today()
+            rule = Rule.parse(recurrence, due_date)
+        new_task = Task(
+            id=str(uuid.uuid4()),
+            text=task_text,
+            priority=priority,
+            category=category,
+            due_date=due_date,
+            recurrence=rule
+        )
+        with self.lock:
+            self.tasks.append(new_task)
+            self.stats.add_task(new_task)
+            self.task_index.add_task(new_task)
+            self.rollups.add_task(new_task)
+            self.version = next(_versions)
+            self.storage.insert_record('tasks', self.username, new_task.to_dict())
+            if due_date:
+                self._remind(new_task)
+        return new_task
+
+    def toggle_task(self, task_id):
+        """Toggle a task's completion; for a repeating task, mark its next open occurrence done"""
+        with self.lock:
+            task = self.tasks.get(task_id)
+            if task and task.recurrence is not None:
+                day = task.next_due
+                return self.toggle_occurrence(task_id, day) if day else task
+            if task:
+                self.stats.discard_task(task)
+                self.task_index.discard_task(task, deleted=False)
+                self.rollups.discard_task(task)
+                if task.completed:
+                    task.status = TaskStatus.PENDING
+                    task.completed_at = None
+                else:
+                    task.status = TaskStatus.COMPLETED
+                    task.completed_at = now_minute()
+                self.stats.add_task(task)
+                self.task_index.add_task(task)
+                self.rollups.add_task(task)
+                self.version = next(_versions)
+                self.storage.update_record('tasks', self.username, task.to_dict())
+                if task.due_date:
+                    self._remind(task)
+            return task
+
+    def toggle_occurrence(self, task_id, day):
+        """Mark one occurrence of a repeating task done or not done.
+
+        Only the task's set of done occurrences changes, so storage gets a
+        one-date update rather than a row per occurrence.
+        """
+        with self.lock:
+            task = self.tasks.get(task_id)
+            if task is None or task.recurrence is None or not task.recurrence.occurs_on(day):
+                return None
+            done = task.toggle_occurrence(day)
+            self.stats.occurrence_toggled(day, done)
+            self.rollups.add('tasks_completed', day, 1 if done else -1)
+            self.task_index.reschedule(task)
+            self.version = next(_versions)
+            self.storage.update_record('tasks', self.username, task.to_dict())
+            self._remind(task)
+            return task
+
+    def delete_task(self, task_id):
+        with self.lock:
+            task = self.tasks.remove(task_id)
+            if task:
+                self.stats.discard_task(task)
+                self.task_index.discard_task(task)
+                self.rollups.discard_task(task)
+                self.version = next(_versions)
+                self.storage.delete_record('tasks', self.username, task_id)
+                if self.reminders is not None and task.due_date:
+                    self.reminders.cancel(self.username, task_id)
+            return task
+
+    # Habits
+    def add_habit(self, habit_name, target_frequency):
+        new_habit = Habit(
+            id=str(uuid.uuid4()),
+            name=habit_name,
+            target_frequency=target_frequency
+        )
+        with self.lock:
+            self.habits.append(new_habit)
+            self.stats.add_habit(new_habit)
+            self.version = next(_versions)
+            self.storage.insert_record('habits', self.username, new_habit.to_dict())
+        return new_habit
+
+    def mark_habit_complete(self, habit_id, day=None):
+        day = day or date.today()
+        with self.lock:
+            habit = self.habits.get(habit_id)
+            if habit and habit.completions.add(day):
+                self.stats.habit_completed(habit)
+                self.rollups.add('habit_completions', day)
+                self.version = next(_versions)
+                self.storage.update_record('habits', self.username, habit.to_dict())
+            return habit
+
+    # Goals
+    def add_goal(self, title, description, target_date, category):
+        new_goal = Goal(
+            id=str(uuid.uuid4()),
+            title=title,
+            description=description,
+            category=category,
+            target_date=target_date
+        )
+        with self.lock:
+            self.goals.append(new_goal)
+            self.stats.add_goal(new_goal)
+            self.version = next(_versions)
+            self.storage.insert_record('goals', self.username, new_goal.to_dict())
+        return new_goal
+
+    def update_goal_progress(self, goal_id, progress):
+        with self.lock:
+            goal = self.goals.get(goal_id)
+            if goal:
+                change = progress - goal.progress
+                if change:
+                    # Progress history isn't in the goal record, so its rollups are stored
+                    today = date.today()
+                    self.rollups.add('goal_updates', today)
+                    self.rollups.add('goal_progress', today, change)
+                    self.storage.add_rollup(self.username, 'goal_updates', today.isoformat(), 1)
+                    self.storage.add_rollup(self.username, 'goal_progress', today.isoformat(), change)
+                self.stats.discard_goal(goal)
+                goal.progress = progress
+                if progress == 100:
+                    goal.status = GoalStatus.COMPLETED
+                self.stats.add_goal(goal)
+                self.version = next(_versions)
+                self.storage.update_record('goals', self.username, goal.to_dict())
+            return goal
+
+    # Notes
+    def add_note(self, note_title, note_content, category='General'):
+        new_note = Note(
+            id=str(uuid.uuid4()),
+            title=note_title,
+            content=note_content,
+            category=category
+        )
+        frequencies = note_term_frequencies(new_note.title, new_note.content)
+        with self.lock:
+            self.notes.append(new_note)
+            self.note_index.add(new_note.id, frequencies)
+            self.version = next(_versions)
+            self.storage.insert_record('notes', self.username, new_note.to_dict())
+            self.storage.save_note_terms(self.username, new_note.id, frequencies)
+        return new_note
+
+    def update_note(self, note_id, title, content, category):
+        frequencies = note_term_frequencies(title, content)
+        with self.lock:
+            note = self.notes.get(note_id)
+            if note:
+                note.title = title
+                note.content = content
+                note.category = sys.intern(category)
+                note.updated_at = now_minute()
+                self.note_index.add(note_id, frequencies)
+                self.version = next(_versions)
+                self.storage.update_record('notes', self.username, note.to_dict())
+                self.storage.save_note_terms(self.username, note_id, frequencies)
+            return note
+
+    def delete_note(self, note_id):
+        with self.lock:
+            note = self.notes.remove(note_id)
+            if note:
+                self.note_index.remove(note_id)
+                self.version = next(_versions)
+                self.storage.delete_record('notes', self.username, note_id)
+                self.storage.delete_note_terms(self.username, note_id)
+            return note
+
+
+class DataService:
+    """Process-wide data service shared by every Streamlit session.
+
+    Each user's working set is loaded once and shared; sessions for
+    different users only contend on their own UserData.lock.
+    """
+
+    def __init__(self, storage, kdf=None, login_limiter=None, reminders=None):
+        self.storage = storage
+        self.reminders = reminders
+        self.kdf = kdf or auth.KdfPool()
+        self.login_limiter = login_limiter or auth.TokenBucketLimiter()
+        self._users = {}
+        self._lock = threading.Lock()
+        self._load_locks = {}
+
+    def signup(self, username, password, email, full_name):
+        """Register a new user; returns (success, message)"""
+        if self.storage.get_user(username) is not None:
+            return False, "Username already exists!"
+        try:
+            password_hash = self.kdf.hash(password)
+        except auth.Busy:
+            return False, "The server is busy, please try again in a moment."
+        profile = {
+            'password': password_hash,
+            'email': email,
+            'full_name': full_name,
+            'created_at': datetime.now().strftime("%Y-%m-%d %H:%M"),
+            'last_login': None,
+            'theme': 'light',
+            'productivity_streak': 0
+        }
+        # Serialise signups so two sessions can't claim the same name
+        with self._lock:
+            if self.storage.get_user(username) is not None:
+                return False, "Username already exists!"
+            self.storage.save_user(username, profile, dict(DEFAULT_PREFERENCES))
+        # Written out now, so the login can land on another worker process
+        self.end_session(username)
+        return True, "Account created successfully!"
+
+    def authenticate(self, username, password):
+        """Check a login and record it; returns (success, message)"""
+        if not self.login_limiter.allow(username):
+            wait = math.ceil(self.login_limiter.retry_after(username))
+            return False, f"Too many login attempts. Please try again in {wait} seconds."
+
+        user = self.storage.get_user(username)
+        if user is None:
+            return False, "Username not found! Please create an account first."
+
+        profile, _ = user
+        try:
+            if not self.kdf.verify(password, profile['password']):
+                return False, "Incorrect password!"
+            # Accounts from before password hashing are upgraded on login
+            password_hash = None if auth.is_hashed(profile['password']) else self.kdf.hash(password)
+        except auth.Busy:
+            return False, "The server is busy, please try again in a moment."
+
+        data = self.user(username)
+        with data.lock:
+            if password_hash:
+                data.profile['password'] = password_hash
+            data.profile['last_login'] = datetime.now().strftime("%Y-%m-%d %H:%M")
+            self.storage.save_user(username, data.profile, data.preferences)
+        return True, f"Welcome back, {data.profile['full_name']}! "
+
+    def user(self, username):
+        """Return the shared working set for a user, loading it on first use"""
+        data = self._users.get(username)
+        if data is not None:
+            return data
+
+        with self._lock:
+            load_lock = self._load_locks.setdefault(username, threading.Lock())
+        # Load outside the service lock so one slow user doesn't block others,
+        # while concurrent logins for the same user still load only once
+        with load_lock:
+            data = self._users.get(username)
+            if data is None:
+                user = self.storage.get_user(username)
+                if user is None:
+                    raise KeyError(username)
+                profile, preferences = user
+                data = UserData(username, self.storage, profile, preferences, self.reminders)
+                with self._lock:
+                    self._users[username] = data
+        return data
+
+    def invalidate(self, username):
+        """Forget a user's working set so the next use reloads it from storage"""
+        with self._lock:
+            self._users.pop(username, None)
+            # The reload schedules them again from the stored tasks
+            if self.reminders is not None:
+                self.reminders.cancel_user(username)
+
+    def invalidate_all(self):
+        with self._lock:
+            usernames = list(self._users)
+            self._users.clear()
+            if self.reminders is not None:
+                for username in usernames:
+                    self.reminders.cancel_user(username)
+
+    def end_session(self, username):
+        """Write out anything still buffered for a user whose session is ending"""
+        flush = getattr(self.storage, 'flush', None)
+        if flush is not None:
+            flush(username)
+
+    def notifications(self, username):
+        """Reminders fired for a user since a session last asked"""
+        return self.reminders.pop_notifications(username) if self.reminders is not None else []
+
+    def import_records(self, username, source):
+        """Bulk-import records for a user and reload their working set; returns the import summary"""
+        # Only needed for bulk transfers, so imported on demand
+        import transfer
+        data = self.user(username)
+        # Sessions of this user wait for the import, then pick up the
+        # reloaded working set on their next rerun
+        with data.lock:
+            summary = transfer.import_user(self.storage, username, source)
+            self.invalidate(username)
+        return summary
+
+    def export_records(self, username, out, fmt='jsonl'):
+        """Stream a user's records to out in one of transfer.FORMATS; returns {kind: count}"""
+        import transfer
+        with self.user(username).lock:
+            return transfer.export_user(self.storage, username, out, fmt)
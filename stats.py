@@ -0,0 +1,164 @@
+from collections import Counter
+from datetime import date, timedelta
+
+from records import GoalStatus
+
+
+def _decrement(counter, key):
+    counter[key] -= 1
+    if counter[key] <= 0:
+        del counter[key]
+
+
+class StatsAggregator:
+    """Productivity counters kept up to date by the data mutation functions"""
+
+    def __init__(self):
+        self.total_tasks = 0
+        self.total_completed = 0
+        self.created_by_day = Counter()
+        self.created_completed_by_day = Counter()
+        self.completed_by_day = Counter()
+        self.categories = Counter()
+        # Repeating tasks by id; their occurrences this week are counted on demand
+        self.recurring = {}
+
+        self.habits = {}
+
+        self.num_goals = 0
+        self.num_completed_goals = 0
+        self.progress_sum = 0
+        self.goal_categories = Counter()
+
+        self._snapshot = None
+        self._snapshot_day = None
+
+    @classmethod
+    def from_records(cls, tasks, habits, goals):
+        """Build an aggregator from a user's existing records"""
+        aggregator = cls()
+        for task in tasks:
+            aggregator.add_task(task)
+        for habit in habits:
+            aggregator.add_habit(habit)
+        for goal in goals:
+            aggregator.add_goal(goal)
+        return aggregator
+
+    # Tasks
+    def add_task(self, task):
+        created = task.created_at.date()
+        self.total_tasks += 1
+        self.created_by_day[created] += 1
+        self.categories[task.category] += 1
+        if task.completed:
+            self.total_completed += 1
+            self.created_completed_by_day[created] += 1
+        if task.completed_at:
+            self.completed_by_day[task.completed_at.date()] += 1
+        if task.recurrence is not None:
+            self.recurring[task.id] = task
+            for day in task.completions or ():
+                self.completed_by_day[day] += 1
+        self._snapshot = None
+
+    def discard_task(self, task):
+        created = task.created_at.date()
+        self.total_tasks -= 1
+        _decrement(self.created_by_day, created)
+        _decrement(self.categories, task.category)
+        if task.completed:
+            self.total_completed -= 1
+            _decrement(self.created_completed_by_day, created)
+        if task.completed_at:
+            _decrement(self.completed_by_day, task.completed_at.date())
+        if self.recurring.pop(task.id, None) is not None:
+            for day in task.completions or ():
+                _decrement(self.completed_by_day, day)
+        self._snapshot = None
+
+    def occurrence_toggled(self, day, done):
+        """A repeating task's occurrence on day was marked done or not done"""
+        if done:
+            self.completed_by_day[day] += 1
+        else:
+            _decrement(self.completed_by_day, day)
+        self._snapshot = None
+
+    # Habits
+    def add_habit(self, habit):
+        self.habits[habit.id] = habit
+        self._snapshot = None
+
+    def discard_habit(self, habit):
+        self.habits.pop(habit.id, None)
+        self._snapshot = None
+
+    def habit_completed(self, habit):
+        self._snapshot = None
+
+    # Goals
+    def add_goal(self, goal):
+        self.num_goals += 1
+        self.progress_sum += goal.progress
+        self.goal_categories[goal.category] += 1
+        if goal.status is GoalStatus.COMPLETED:
+            self.num_completed_goals += 1
+        self._snapshot = None
+
+    def discard_goal(self, goal):
+        self.num_goals -= 1
+        self.progress_sum -= goal.progress
+        _decrement(self.goal_categories, goal.category)
+        if goal.status is GoalStatus.COMPLETED:
+            self.num_completed_goals -= 1
+        self._snapshot = None
+
+    def snapshot(self, today=None):
+        """Return the dashboard statistics, rebuilt only after a change or a new day"""
+        today = today or date.today()
+        if self._snapshot is not None and self._snapshot_day == today:
+            return self._snapshot
+
+        week_start = today - timedelta(days=today.weekday())
+        week_days = [week_start + timedelta(days=i) for i in range(7)]
+
+        habit_streaks = {}
+        today_habits_completed = 0
+        for habit in self.habits.values():
+            habit_streaks[habit.name] = habit.completions.current_streak(today)
+            if today in habit.completions:
+                today_habits_completed += 1
+        num_habits = len(self.habits)
+
+        # Occurrences of repeating tasks count as tasks on the day they're due
+        today_due = today_done = week_due = week_done = 0
+        for task in self.recurring.values():
+            done = task.completions or ()
+            for day in task.recurrence.between(week_start, week_days[-1]):
+                week_due += 1
+                week_done += day in done
+                if day == today:
+                    today_due += 1
+                    today_done += day in done
+
+        self._snapshot = {
+            'today_tasks': self.created_by_day[today] + today_due,
+            'today_completed': self.created_completed_by_day[today] + today_done,
+            'week_tasks': sum(self.created_by_day[d] for d in week_days) + week_due,
+            'week_completed': sum(self.created_completed_by_day[d] for d in week_days) + week_done,
+            'total_tasks': self.total_tasks,
+            'total_completed': self.total_completed,
+            'categories': dict(self.categories),
+            'weekly_completed': {d.isoformat(): self.completed_by_day[d] for d in week_days},
+            'num_habits': num_habits,
+            'today_habits_completed': today_habits_completed,
+            'avg_habit_streak': sum(habit_streaks.values()) / num_habits if num_habits > 0 else 0,
+            'habit_streaks': habit_streaks,
+            'num_goals': self.num_goals,
+            'num_completed_goals': self.num_completed_goals,
+            'avg_progress': self.progress_sum / self.num_goals if self.num_goals > 0 else 0,
+            'goal_categories': dict(self.goal_categories)
+        }
+        self._snapshot_day = today
+        return self._snapshot
@@ -0,0 +1,527 @@
+import copy
+import json
+import os
+import sqlite3
+import queue
+import threading
+import uuid
+from contextlib import contextmanager
+
+import writebehind
+
+# Record collections kept per user
+KINDS = ('tasks', 'notes', 'habits', 'goals')
+
+DEFAULT_BACKEND = 'sqlite'
+DEFAULT_DB_PATH = 'productivity_hub.db'
+DEFAULT_POOL_SIZE = 4
+
+# Rows per round trip when streaming records out
+DEFAULT_BATCH_SIZE = 1000
+
+# Seconds a connection waits for another writer before giving up
+BUSY_TIMEOUT = 10
+
+# Rows kept in the SQLite change log; a process that falls further behind
+# than this reloads every user
+CHANGE_LOG_KEEP = 10000
+
+# The change log is pruned each time its seq passes a multiple of this
+CHANGE_LOG_PRUNE_EVERY = 1000
+
+
+class MemoryStorage:
+    """In-process storage backend, used for tests and throwaway sessions"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._users = {}
+        self._records = {kind: {} for kind in KINDS}
+        self._note_terms = {}
+        self._rollups = {}
+        self._fired = {}
+        self._inboxes = {}
+
+    def get_user(self, username):
+        """Return (profile, preferences) for a user, or None"""
+        with self._lock:
+            user = self._users.get(username)
+            return copy.deepcopy(user) if user else None
+
+    def save_user(self, username, profile, preferences):
+        """Create or replace a user's profile and preferences"""
+        with self._lock:
+            self._users[username] = copy.deepcopy((profile, preferences))
+
+    def load_records(self, kind, username):
+        """Return a user's records of one kind in insertion order"""
+        with self._lock:
+            records = self._records[kind].get(username, {})
+            return [copy.deepcopy(r) for r in records.values()]
+
+    def iter_records(self, kind, username, batch_size=DEFAULT_BATCH_SIZE):
+        """Yield a user's records of one kind in insertion order"""
+        with self._lock:
+            ids = list(self._records[kind].get(username, {}))
+        for start in range(0, len(ids), batch_size):
+            with self._lock:
+                records = self._records[kind].get(username, {})
+                batch = [copy.deepcopy(records[i]) for i in ids[start:start + batch_size] if i in records]
+            yield from batch
+
+    def insert_record(self, kind, username, record):
+        """Append a new record for a user"""
+        with self._lock:
+            self._records[kind].setdefault(username, {})[record['id']] = copy.deepcopy(record)
+
+    def insert_records(self, kind, username, records):
+        """Append many records at once; a record whose id exists replaces it in place"""
+        with self._lock:
+            stored = self._records[kind].setdefault(username, {})
+            for record in records:
+                stored[record['id']] = copy.deepcopy(record)
+
+    def write_batch(self, operations):
+        """Apply (method name, args) pairs of single-record writes in order"""
+        for method, args in operations:
+            getattr(self, method)(*args)
+
+    def update_record(self, kind, username, record):
+        """Replace an existing record, keeping its position"""
+        with self._lock:
+            records = self._records[kind].get(username, {})
+            if record['id'] in records:
+                records[record['id']] = copy.deepcopy(record)
+
+    def delete_record(self, kind, username, record_id):
+        """Remove a record by id"""
+        with self._lock:
+            self._records[kind].get(username, {}).pop(record_id, None)
+
+    def load_note_terms(self, username):
+        """Return {note_id: {term: frequency}} for a user's indexed notes"""
+        with self._lock:
+            return copy.deepcopy(self._note_terms.get(username, {}))
+
+    def save_note_terms(self, username, note_id, frequencies):
+        """Store the search index entry for one note"""
+        with self._lock:
+            self._note_terms.setdefault(username, {})[note_id] = dict(frequencies)
+
+    def save_note_terms_many(self, username, entries):
+        """Store search index entries for many notes, given as (note_id, frequencies) pairs"""
+        with self._lock:
+            terms = self._note_terms.setdefault(username, {})
+            for note_id, frequencies in entries:
+                terms[note_id] = dict(frequencies)
+
+    def delete_note_terms(self, username, note_id):
+        """Remove the search index entry for one note"""
+        with self._lock:
+            self._note_terms.get(username, {}).pop(note_id, None)
+
+    def load_rollups(self, username):
+        """Return {metric: {isoformat day: value}} of a user's stored daily counts"""
+        with self._lock:
+            return copy.deepcopy(self._rollups.get(username, {}))
+
+    def add_rollup(self, username, metric, day, amount):
+        """Add amount to a user's stored daily count of metric"""
+        with self._lock:
+            days = self._rollups.setdefault(username, {}).setdefault(metric, {})
+            days[day] = days.get(day, 0) + amount
+
+    def load_fired_reminders(self, username):
+        """Return the set of (task_id, kind, isoformat due date) reminders already delivered to a user"""
+        with self._lock:
+            return set(self._fired.get(username, ()))
+
+    def claim_reminder(self, username, task_id, kind, due, notification=None):
+        """Record a reminder as delivered and queue notification, if any, for the user; False if it already was"""
+        with self._lock:
+            fired = self._fired.setdefault(username, set())
+            if (task_id, kind, due) in fired:
+                return False
+            fired.add((task_id, kind, due))
+            if notification is not None:
+                self._inboxes.setdefault(username, []).append(copy.deepcopy(notification))
+            return True
+
+    def pop_notifications(self, username):
+        """Take the notifications queued for a user, oldest first"""
+        with self._lock:
+            return self._inboxes.pop(username, [])
+
+    def close(self):
+        pass
+
+
+class SQLiteStorage:
+    """Durable storage backend on a single SQLite database in WAL mode"""
+
+    def __init__(self, path=DEFAULT_DB_PATH, pool_size=DEFAULT_POOL_SIZE):
+        self.path = path
+        # Streamlit runs each session's script on its own thread; sessions
+        # borrow a connection from the pool, so WAL readers run in parallel
+        # and writers queue on SQLite's own lock
+        self._pool = queue.LifoQueue()
+        for _ in range(pool_size):
+            self._pool.put(self._connect())
+        # (connection, changed usernames) of a write_batch() in progress on this thread
+        self._local = threading.local()
+        # Tags this instance's entries in the change log, so other processes
+        # sharing the database know which users to reload
+        self.writer_id = uuid.uuid4().hex
+        self._create_schema()
+
+    def _connect(self):
+        conn = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None,
+                               timeout=BUSY_TIMEOUT)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute("PRAGMA foreign_keys=ON")
+        return conn
+
+    @contextmanager
+    def _connection(self):
+        """Borrow a pooled connection"""
+        conn = self._pool.get()
+        try:
+            yield conn
+        finally:
+            self._pool.put(conn)
+
+    @contextmanager
+    def _writing(self, username):
+        """A connection in a write transaction that logs a change to username's data.
+
+        Inside write_batch() this joins the batch's transaction.
+        """
+        batch = getattr(self._local, 'batch', None)
+        if batch is not None:
+            batch[1].add(username)
+            yield batch[0]
+            return
+        with self._connection() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                yield conn
+                self._log_changes(conn, (username,))
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+            conn.execute("COMMIT")
+
+    def _log_changes(self, conn, usernames):
+        first = seq = 0
+        for username in usernames:
+            seq = conn.execute(
+                "INSERT INTO changes (username, writer) VALUES (?, ?)", (username, self.writer_id)
+            ).lastrowid
+            first = first or seq
+        # A batch logging many users can step over the multiple itself
+        if seq and (first - 1) // CHANGE_LOG_PRUNE_EVERY != seq // CHANGE_LOG_PRUNE_EVERY:
+            conn.execute("DELETE FROM changes WHERE seq <= ?", (seq - CHANGE_LOG_KEEP,))
+
+    def _create_schema(self):
+        with self._connection() as conn:
+            conn.execute("BEGIN")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS users ("
+                " username TEXT PRIMARY KEY,"
+                " profile TEXT NOT NULL,"
+                " preferences TEXT NOT NULL)"
+            )
+            for kind in KINDS:
+                # seq is the rowid, so ORDER BY seq keeps insertion order and
+                # (username, id) lookups go through a unique B-tree index
+                conn.execute(
+                    f"CREATE TABLE IF NOT EXISTS {kind} ("
+                    " seq INTEGER PRIMARY KEY,"
+                    " username TEXT NOT NULL,"
+                    " id TEXT NOT NULL,"
+                    " data TEXT NOT NULL)"
+                )
+                conn.execute(
+                    f"CREATE UNIQUE INDEX IF NOT EXISTS {kind}_user_id ON {kind} (username, id)"
+                )
+                conn.execute(
+                    f"CREATE INDEX IF NOT EXISTS {kind}_user_seq ON {kind} (username, seq)"
+                )
+            # Search index entries, one row of term frequencies per note
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS note_terms ("
+                " username TEXT NOT NULL,"
+                " note_id TEXT NOT NULL,"
+                " terms TEXT NOT NULL,"
+                " PRIMARY KEY (username, note_id))"
+            )
+            # Daily activity counts that can't be rebuilt from the records
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS rollups ("
+                " username TEXT NOT NULL,"
+                " metric TEXT NOT NULL,"
+                " day TEXT NOT NULL,"
+                " value INTEGER NOT NULL,"
+                " PRIMARY KEY (username, metric, day))"
+            )
+            # Reminders already delivered, so a reload or another process
+            # sharing this database doesn't deliver them again
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS fired_reminders ("
+                " username TEXT NOT NULL,"
+                " task_id TEXT NOT NULL,"
+                " kind TEXT NOT NULL,"
+                " due TEXT NOT NULL,"
+                " PRIMARY KEY (username, task_id, kind, due)) WITHOUT ROWID"
+            )
+            # Their notifications until a session of the user, served by
+            # any of those processes, takes them
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS notifications ("
+                " seq INTEGER PRIMARY KEY,"
+                " username TEXT NOT NULL,"
+                " data TEXT NOT NULL)"
+            )
+            conn.execute(
+                "CREATE INDEX IF NOT EXISTS notifications_user_seq ON notifications (username, seq)"
+            )
+            # One row per committed write, read by the other processes
+            # sharing this database to invalidate their cached users
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS changes ("
+                " seq INTEGER PRIMARY KEY AUTOINCREMENT,"
+                " username TEXT NOT NULL,"
+                " writer TEXT NOT NULL)"
+            )
+            conn.execute("COMMIT")
+
+    def get_user(self, username):
+        """Return (profile, preferences) for a user, or None"""
+        with self._connection() as conn:
+            row = conn.execute(
+                "SELECT profile, preferences FROM users WHERE username = ?", (username,)
+            ).fetchone()
+        if row is None:
+            return None
+        return json.loads(row[0]), json.loads(row[1])
+
+    def save_user(self, username, profile, preferences):
+        """Create or replace a user's profile and preferences"""
+        with self._writing(username) as conn:
+            conn.execute(
+                "INSERT INTO users (username, profile, preferences) VALUES (?, ?, ?) "
+                "ON CONFLICT(username) DO UPDATE SET profile = excluded.profile, "
+                "preferences = excluded.preferences",
+                (username, json.dumps(profile), json.dumps(preferences))
+            )
+
+    def load_records(self, kind, username):
+        """Return a user's records of one kind in insertion order"""
+        with self._connection() as conn:
+            rows = conn.execute(
+                f"SELECT data FROM {kind} WHERE username = ? ORDER BY seq", (username,)
+            ).fetchall()
+        return [json.loads(row[0]) for row in rows]
+
+    def iter_records(self, kind, username, batch_size=DEFAULT_BATCH_SIZE):
+        """Yield a user's records of one kind in insertion order, reading batch_size rows at a time"""
+        with self._connection() as conn:
+            cursor = conn.execute(
+                f"SELECT data FROM {kind} WHERE username = ? ORDER BY seq", (username,)
+            )
+            try:
+                while True:
+                    rows = cursor.fetchmany(batch_size)
+                    if not rows:
+                        break
+                    for row in rows:
+                        yield json.loads(row[0])
+            finally:
+                # An abandoned export must not leave a read open on a pooled connection
+                cursor.close()
+
+    def insert_record(self, kind, username, record):
+        """Append a new record for a user"""
+        with self._writing(username) as conn:
+            conn.execute(
+                f"INSERT INTO {kind} (username, id, data) VALUES (?, ?, ?)",
+                (username, record['id'], json.dumps(record))
+            )
+
+    def insert_records(self, kind, username, records):
+        """Append many records in one transaction; a record whose id exists replaces it in place"""
+        with self._writing(username) as conn:
+            conn.executemany(
+                f"INSERT INTO {kind} (username, id, data) VALUES (?, ?, ?) "
+                "ON CONFLICT(username, id) DO UPDATE SET data = excluded.data",
+                ((username, record['id'], json.dumps(record)) for record in records)
+            )
+
+    def write_batch(self, operations):
+        """Apply (method name, args) pairs of single-record writes in one transaction"""
+        with self._connection() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            changed = set()
+            self._local.batch = (conn, changed)
+            try:
+                for method, args in operations:
+                    getattr(self, method)(*args)
+                self._log_changes(conn, changed)
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+            finally:
+                self._local.batch = None
+            conn.execute("COMMIT")
+
+    def update_record(self, kind, username, record):
+        """Replace an existing record, keeping its position"""
+        with self._writing(username) as conn:
+            conn.execute(
+                f"UPDATE {kind} SET data = ? WHERE username = ? AND id = ?",
+                (json.dumps(record), username, record['id'])
+            )
+
+    def delete_record(self, kind, username, record_id):
+        """Remove a record by id"""
+        with self._writing(username) as conn:
+            conn.execute(
+                f"DELETE FROM {kind} WHERE username = ? AND id = ?", (username, record_id)
+            )
+
+    def load_note_terms(self, username):
+        """Return {note_id: {term: frequency}} for a user's indexed notes"""
+        with self._connection() as conn:
+            rows = conn.execute(
+                "SELECT note_id, terms FROM note_terms WHERE username = ?", (username,)
+            ).fetchall()
+        return {note_id: json.loads(terms) for note_id, terms in rows}
+
+    def save_note_terms(self, username, note_id, frequencies):
+        """Store the search index entry for one note"""
+        with self._writing(username) as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO note_terms (username, note_id, terms) VALUES (?, ?, ?)",
+                (username, note_id, json.dumps(frequencies))
+            )
+
+    def save_note_terms_many(self, username, entries):
+        """Store search index entries for many notes in one transaction"""
+        with self._writing(username) as conn:
+            conn.executemany(
+                "INSERT OR REPLACE INTO note_terms (username, note_id, terms) VALUES (?, ?, ?)",
+                ((username, note_id, json.dumps(frequencies)) for note_id, frequencies in entries)
+            )
+
+    def delete_note_terms(self, username, note_id):
+        """Remove the search index entry for one note"""
+        with self._writing(username) as conn:
+            conn.execute(
+                "DELETE FROM note_terms WHERE username = ? AND note_id = ?", (username, note_id)
+            )
+
+    def load_rollups(self, username):
+        """Return {metric: {isoformat day: value}} of a user's stored daily counts"""
+        with self._connection() as conn:
+            rows = conn.execute(
+                "SELECT metric, day, value FROM rollups WHERE username = ?", (username,)
+            ).fetchall()
+        rollups = {}
+        for metric, day, value in rows:
+            rollups.setdefault(metric, {})[day] = value
+        return rollups
+
+    def add_rollup(self, username, metric, day, amount):
+        """Add amount to a user's stored daily count of metric"""
+        with self._writing(username) as conn:
+            conn.execute(
+                "INSERT INTO rollups (username, metric, day, value) VALUES (?, ?, ?, ?) "
+                "ON CONFLICT(username, metric, day) DO UPDATE SET value = value + excluded.value",
+                (username, metric, day, amount)
+            )
+
+    def load_fired_reminders(self, username):
+        """Return the set of (task_id, kind, isoformat due date) reminders already delivered to a user"""
+        with self._connection() as conn:
+            rows = conn.execute(
+                "SELECT task_id, kind, due FROM fired_reminders WHERE username = ?", (username,)
+            ).fetchall()
+        return set(rows)
+
+    def claim_reminder(self, username, task_id, kind, due, notification=None):
+        """Record a reminder as delivered and queue notification, if any, for the user.
+
+        Returns False if it already was delivered, by this or another process.
+        """
+        # Not a change to the user's data, so it stays out of the change log
+        with self._connection() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                claimed = conn.execute(
+                    "INSERT OR IGNORE INTO fired_reminders (username, task_id, kind, due) VALUES (?, ?, ?, ?)",
+                    (username, task_id, kind, due)
+                ).rowcount == 1
+                if claimed and notification is not None:
+                    conn.execute(
+                        "INSERT INTO notifications (username, data) VALUES (?, ?)",
+                        (username, json.dumps(notification))
+                    )
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+            conn.execute("COMMIT")
+        return claimed
+
+    def pop_notifications(self, username):
+        """Take the notifications queued for a user, oldest first"""
+        query = "SELECT seq, data FROM notifications WHERE username = ? ORDER BY seq"
+        with self._connection() as conn:
+            # Checked on every rerun, so the usual empty answer takes no write lock
+            if conn.execute(query + " LIMIT 1", (username,)).fetchone() is None:
+                return []
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                rows = conn.execute(query, (username,)).fetchall()
+                conn.execute("DELETE FROM notifications WHERE username = ?", (username,))
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+            conn.execute("COMMIT")
+        return [json.loads(data) for _, data in rows]
+
+    def latest_change(self):
+        """Sequence number of the newest change log entry, or 0"""
+        with self._connection() as conn:
+            return conn.execute("SELECT COALESCE(MAX(seq), 0) FROM changes").fetchone()[0]
+
+    def changes_since(self, seq):
+        """(users changed by other writers after seq, newest seq, whether entries after seq were pruned)"""
+        with self._connection() as conn:
+            rows = conn.execute(
+                "SELECT seq, username, writer FROM changes WHERE seq > ? ORDER BY seq", (seq,)
+            ).fetchall()
+        if not rows:
+            return set(), seq, False
+        users = {username for _, username, writer in rows if writer != self.writer_id}
+        return users, rows[-1][0], rows[0][0] > seq + 1
+
+    def close(self):
+        while not self._pool.empty():
+            self._pool.get().close()
+
+
+def open_storage(backend=None, path=None):
+    """Open the storage backend named by PRODUCTIVITY_HUB_STORAGE (sqlite, eventlog or memory)"""
+    backend = backend or os.environ.get('PRODUCTIVITY_HUB_STORAGE', DEFAULT_BACKEND)
+    if backend == 'memory':
+        return MemoryStorage()
+    if backend == 'eventlog':
+        # eventlog builds on this module, so it is imported on demand
+        import eventlog
+        return eventlog.EventLogStorage(path or os.environ.get('PRODUCTIVITY_HUB_DB',
+                                                               eventlog.DEFAULT_EVENTLOG_PATH))
+    if backend == 'sqlite':
+        # Clicks become buffered writes, flushed together every second or so
+        return writebehind.wrap(SQLiteStorage(path or os.environ.get('PRODUCTIVITY_HUB_DB', DEFAULT_DB_PATH)))
+    raise ValueError(f"Unknown storage backend: {backend}")
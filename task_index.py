@@ -0,0 +1,157 @@
+from bisect import bisect_left, insort
+from datetime import date
+from itertools import islice
+
+# Sort rank of each priority, most urgent first
+PRIORITY_RANK = {'High': 0, 'Medium': 1, 'Low': 2}
+
+SORT_ORDERS = ("Created Date", "Priority", "Due Date")
+
+# A filtered result smaller than 1/SORT_SMALL_RESULT of all tasks is sorted
+# directly instead of being picked out of a full sorted index
+SORT_SMALL_RESULT = 8
+
+
+def _sort_keys(task, seq):
+    """Sort entries for each order; seq breaks ties in creation order"""
+    return {
+        "Created Date": (task.created_at, seq, task.id),
+        "Priority": (PRIORITY_RANK.get(task.priority, len(PRIORITY_RANK)), seq, task.id),
+        # Tasks without a due date go last; repeating tasks sort by their next open occurrence
+        "Due Date": (task.next_due or date.max, seq, task.id)
+    }
+
+
+class TaskIndex:
+    """Per-user secondary indexes over tasks, kept up to date by the task mutation functions"""
+
+    def __init__(self):
+        self.by_status = {'Pending': set(), 'Completed': set()}
+        self.by_priority = {}
+        self.by_category = {}
+        self.sorted = {order: [] for order in SORT_ORDERS}
+        # Repeating tasks by id; their occurrences are generated per window
+        self.recurring = {}
+        self._entries = {}
+        self._next_seq = 0
+        self._category_options = None
+
+    @classmethod
+    def from_tasks(cls, tasks):
+        """Build the indexes from a user's existing tasks"""
+        index = cls()
+        for task in tasks:
+            index.add_task(task)
+        return index
+
+    def add_task(self, task):
+        # A task re-added after discard_task(deleted=False) keeps its place
+        # in the sorted indexes, since only its status changed
+        if task.id not in self._entries:
+            entries = _sort_keys(task, self._next_seq)
+            self._next_seq += 1
+            self._entries[task.id] = entries
+            for order, entry in entries.items():
+                insort(self.sorted[order], entry)
+        if task.recurrence is not None:
+            self.recurring[task.id] = task
+        self.by_status['Completed' if task.completed else 'Pending'].add(task.id)
+        self.by_priority.setdefault(task.priority, set()).add(task.id)
+        if task.category not in self.by_category:
+            self.by_category[task.category] = set()
+            self._category_options = None
+        self.by_category[task.category].add(task.id)
+
+    def discard_task(self, task, deleted=True):
+        """Unindex a task; pass deleted=False when only its status is about to change"""
+        self.by_status['Completed' if task.completed else 'Pending'].discard(task.id)
+        _discard(self.by_priority, task.priority, task.id)
+        if _discard(self.by_category, task.category, task.id):
+            self._category_options = None
+        if deleted:
+            self.recurring.pop(task.id, None)
+            entries = self._entries.pop(task.id, None)
+            if entries:
+                for order, entry in entries.items():
+                    ordered = self.sorted[order]
+                    del ordered[bisect_left(ordered, entry)]
+
+    def reschedule(self, task):
+        """Move a task in the due date order after its next due date changed"""
+        entries = self._entries.get(task.id)
+        if entries is None:
+            return
+        ordered = self.sorted["Due Date"]
+        old = entries["Due Date"]
+        del ordered[bisect_left(ordered, old)]
+        entries["Due Date"] = (task.next_due or date.max, old[1], task.id)
+        insort(ordered, entries["Due Date"])
+
+    def due_between(self, start, end):
+        """(day, task id) for every one-off task due and every repeating task occurrence from start to end, by day.
+
+        One-off tasks come from a bisect of the due date order; repeating
+        tasks generate only the occurrences inside the window.
+        """
+        ordered = self.sorted["Due Date"]
+        due = []
+        for position in range(bisect_left(ordered, (start,)), len(ordered)):
+            day, _, task_id = ordered[position]
+            if day > end:
+                break
+            if task_id not in self.recurring:
+                due.append((day, task_id))
+        for task_id, task in self.recurring.items():
+            due.extend((day, task_id) for day in task.recurrence.between(start, end))
+        due.sort(key=lambda item: item[0])
+        return due
+
+    def categories(self):
+        """Distinct task categories in display order"""
+        if self._category_options is None:
+            self._category_options = sorted(self.by_category)
+        return self._category_options
+
+    def filter(self, status="All", priority="All", category="All"):
+        """Return the set of task ids matching every filter that is not "All", or None when nothing is filtered"""
+        selected = []
+        if status != "All":
+            selected.append(self.by_status.get(status, set()))
+        if priority != "All":
+            selected.append(self.by_priority.get(priority, set()))
+        if category != "All":
+            selected.append(self.by_category.get(category, set()))
+        if not selected:
+            return None
+        # Intersect starting from the smallest set
+        selected.sort(key=len)
+        return selected[0].intersection(*selected[1:])
+
+    def page(self, order, start, count, matching=None):
+        """Return up to count task ids in the given sort order, skipping the first start.
+
+        With matching, only ids in that set are returned.
+        """
+        ordered = self.sorted[order]
+        if matching is None:
+            return [entry[-1] for entry in ordered[start:start + count]]
+        if len(matching) * SORT_SMALL_RESULT < len(ordered):
+            entries = sorted(self._entries[task_id][order] for task_id in matching)
+            return [entry[-1] for entry in entries[start:start + count]]
+        hits = (entry[-1] for entry in ordered if entry[-1] in matching)
+        return list(islice(hits, start, start + count))
+
+    def __len__(self):
+        return len(self._entries)
+
+
+def _discard(index, key, task_id):
+    """Remove task_id under key, dropping the key when empty; True if the key went away"""
+    ids = index.get(key)
+    if ids is None:
+        return False
+    ids.discard(task_id)
+    if not ids:
+        del index[key]
+        return True
+    return False
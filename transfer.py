@@ -0,0 +1,467 @@
+"""Bulk import and export of a user's tasks, notes, habits and goals.
+
+Formats:
+    jsonl    one JSON object per line, with a "kind" field naming its collection
+    csv      zip archive holding tasks.csv, notes.csv, habits.csv and goals.csv
+    parquet  zip archive of one Parquet file per collection (needs pyarrow)
+
+Both directions stream: exports read the store a batch at a time and
+imports validate and insert IMPORT_BATCH_SIZE records per transaction.
+
+    python transfer.py export alice backup.jsonl
+    python transfer.py import alice backup.zip --db productivity_hub.db
+
+With SQLite storage a running app notices an import made from the
+command line and reloads the user within a second; with the other
+backends, import while the app is stopped.
+"""
+import argparse
+import csv
+import importlib.util
+import io
+import json
+import os
+import sys
+import tempfile
+import zipfile
+from datetime import date, datetime
+
+import storage
+from records import GoalStatus
+from recurrence import Rule
+from search import note_term_frequencies
+
+FORMATS = ('jsonl', 'csv', 'parquet')
+
+# Records inserted per storage transaction
+IMPORT_BATCH_SIZE = 10000
+
+# Invalid records listed in an import summary; later ones are only counted
+MAX_REPORTED_ERRORS = 20
+
+# Every stored field per collection, in the order Task.to_dict() etc.
+# write them: (name, value type, default). REQUIRED fields have no
+# default, matching the records' from_dict().
+REQUIRED = object()
+SCHEMA = {
+    'tasks': (('id', 'id', REQUIRED), ('text', 'text', REQUIRED), ('completed', 'bool', REQUIRED),
+              ('priority', 'text', 'Medium'), ('category', 'text', 'General'), ('due_date', 'date', None),
+              ('created_at', 'timestamp', REQUIRED), ('completed_at', 'timestamp', None),
+              ('time_spent', 'int', 0), ('recurrence', 'rule', None), ('completions', 'dates', ())),
+    'notes': (('id', 'id', REQUIRED), ('title', 'text', REQUIRED), ('content', 'text', REQUIRED),
+              ('category', 'text', 'General'), ('created_at', 'timestamp', REQUIRED),
+              ('updated_at', 'timestamp', REQUIRED)),
+    'habits': (('id', 'id', REQUIRED), ('name', 'text', REQUIRED), ('target_frequency', 'text', REQUIRED),
+               ('created_at', 'day', REQUIRED), ('completions', 'dates', REQUIRED)),
+    'goals': (('id', 'id', REQUIRED), ('title', 'text', REQUIRED), ('description', 'text', REQUIRED),
+              ('category', 'text', 'General'), ('target_date', 'date', REQUIRED),
+              ('created_at', 'date', REQUIRED), ('progress', 'percent', REQUIRED), ('status', 'status', REQUIRED))
+}
+FIELDS = {kind: tuple(name for name, _, _ in fields) for kind, fields in SCHEMA.items()}
+BOOL_FIELDS = {'completed'}
+INT_FIELDS = {'time_spent', 'progress'}
+LIST_FIELDS = {'completions'}
+# Columns left empty in CSV when unset
+OPTIONAL_FIELDS = {'due_date', 'created_at', 'completed_at', 'updated_at', 'target_date', 'recurrence'}
+
+# Spellings of a CSV bool column
+CSV_TRUE = ('true', '1', 'yes')
+CSV_FALSE = ('false', '0', 'no')
+
+ZIP_MAGIC = b'PK\x03\x04'
+
+
+class InvalidRecord(ValueError):
+    """Raised for an imported record that doesn't fit its collection"""
+
+
+def parquet_available():
+    return importlib.util.find_spec('pyarrow') is not None
+
+
+def _pyarrow():
+    try:
+        import pyarrow
+        import pyarrow.parquet
+    except ImportError:
+        raise RuntimeError("The parquet format needs the optional pyarrow package") from None
+    return pyarrow, pyarrow.parquet
+
+
+def _normalize_date(value):
+    if not value:
+        return None
+    # Already in stored form: checking it is enough. The '-' positions rule
+    # out the other forms fromisoformat accepts, such as week dates
+    if len(value) == 10 and value[4] == '-' and value[7] == '-':
+        date.fromisoformat(value)
+        return value
+    return date.fromisoformat(value).isoformat()
+
+
+def _normalize_timestamp(value):
+    if not value:
+        return None
+    if len(value) == 16 and value[4] == '-' and value[7] == '-' and value[10] == ' ' and value[13] == ':':
+        datetime.fromisoformat(value)
+        return value
+    return datetime.fromisoformat(value).isoformat(sep=' ', timespec='minutes')
+
+
+def _normalize_id(value):
+    if not isinstance(value, str) or not value:
+        raise InvalidRecord("must be non-empty text")
+    return value
+
+
+def _normalize_text(value):
+    if not isinstance(value, str):
+        raise InvalidRecord("must be text")
+    return value
+
+
+def _normalize_day(value):
+    if not value:
+        raise InvalidRecord("must be a date")
+    return _normalize_date(value)
+
+
+def _normalize_bool(value):
+    if not isinstance(value, bool):
+        raise InvalidRecord("must be true or false")
+    return value
+
+
+def _normalize_int(value):
+    if not isinstance(value, int) or isinstance(value, bool):
+        raise InvalidRecord("must be a whole number")
+    return value
+
+
+def _normalize_percent(value):
+    if not 0 <= _normalize_int(value) <= 100:
+        raise InvalidRecord("must be a whole number from 0 to 100")
+    return value
+
+
+def _normalize_dates(value):
+    if not value:
+        return []
+    if isinstance(value, str):
+        raise InvalidRecord("must be a list of dates")
+    return sorted({_normalize_date(day) for day in value if day})
+
+
+def _normalize_rule(value):
+    # Only the rule text is checked here; its start comes from due_date
+    return str(Rule.parse(value, date.today())) if value else None
+
+
+def _normalize_status(value):
+    return GoalStatus(value).value
+
+
+NORMALIZERS = {
+    'id': _normalize_id,
+    'text': _normalize_text,
+    'timestamp': _normalize_timestamp,
+    'date': _normalize_date,
+    'day': _normalize_day,
+    'bool': _normalize_bool,
+    'int': _normalize_int,
+    'percent': _normalize_percent,
+    'dates': _normalize_dates,
+    'rule': _normalize_rule,
+    'status': _normalize_status
+}
+# (name, normalizer, default) per collection, resolved once
+VALIDATORS = {kind: tuple((name, NORMALIZERS[value_type], default) for name, value_type, default in fields)
+              for kind, fields in SCHEMA.items()}
+
+
+def validate(kind, data):
+    """Return the stored dict shape of an imported record, or raise InvalidRecord.
+
+    Accepts exactly what the record's from_dict() accepts and normalises
+    it the same way as a round trip through the record class would,
+    without building the record.
+    """
+    fields = VALIDATORS.get(kind)
+    if fields is None:
+        raise InvalidRecord(f"unknown kind {kind!r}")
+    record = {}
+    for name, normalize, default in fields:
+        value = data.get(name, default)
+        if value is REQUIRED:
+            raise InvalidRecord(f"missing field '{name}'")
+        try:
+            record[name] = normalize(value)
+        except InvalidRecord as exc:
+            raise InvalidRecord(f"{name} {exc}") from None
+        except (TypeError, ValueError, AttributeError) as exc:
+            raise InvalidRecord(f"{name}: {exc}") from None
+    if kind == 'tasks' and record['recurrence'] and not record['due_date']:
+        # A repeating task without a due date starts on the day it was created
+        record['due_date'] = record['created_at'][:10]
+    return record
+
+
+# Export
+def export_user(store, username, out, fmt='jsonl'):
+    """Stream a user's records into the binary file object out; returns {kind: count}"""
+    if fmt == 'jsonl':
+        return _export_jsonl(store, username, out)
+    if fmt not in FORMATS:
+        raise ValueError(f"Unknown format: {fmt}")
+    counts = {}
+    with zipfile.ZipFile(out, 'w', zipfile.ZIP_DEFLATED) as archive:
+        for kind in storage.KINDS:
+            records = store.iter_records(kind, username)
+            if fmt == 'csv':
+                counts[kind] = _export_csv(archive, kind, records)
+            else:
+                counts[kind] = _export_parquet(archive, kind, records)
+    return counts
+
+
+def _export_jsonl(store, username, out):
+    counts = {}
+    for kind in storage.KINDS:
+        counts[kind] = 0
+        lines = []
+        for record in store.iter_records(kind, username):
+            lines.append(json.dumps({'kind': kind, **record}))
+            if len(lines) == storage.DEFAULT_BATCH_SIZE:
+                out.write(('\n'.join(lines) + '\n').encode('utf-8'))
+                counts[kind] += len(lines)
+                lines = []
+        if lines:
+            out.write(('\n'.join(lines) + '\n').encode('utf-8'))
+            counts[kind] += len(lines)
+    return counts
+
+
+def _csv_cell(name, value):
+    if value is None:
+        return ''
+    if name in BOOL_FIELDS:
+        return 'true' if value else 'false'
+    if name in LIST_FIELDS:
+        return ';'.join(value)
+    return value
+
+
+def _export_csv(archive, kind, records):
+    fields = FIELDS[kind]
+    count = 0
+    with io.TextIOWrapper(archive.open(f'{kind}.csv', 'w'), encoding='utf-8', newline='') as text:
+        writer = csv.writer(text)
+        writer.writerow(fields)
+        for record in records:
+            writer.writerow([_csv_cell(name, record[name]) for name in fields])
+            count += 1
+    return count
+
+
+def _arrow_schema(pa, kind):
+    def column_type(name):
+        if name in BOOL_FIELDS:
+            return pa.bool_()
+        if name in INT_FIELDS:
+            return pa.int64()
+        if name in LIST_FIELDS:
+            return pa.list_(pa.string())
+        return pa.string()
+    return pa.schema([(name, column_type(name)) for name in FIELDS[kind]])
+
+
+def _export_parquet(archive, kind, records):
+    pa, pq = _pyarrow()
+    schema = _arrow_schema(pa, kind)
+    count = 0
+    # Parquet needs a seekable file, so each collection is written to a
+    # temporary file a batch at a time and then copied into the archive
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, f'{kind}.parquet')
+        with pq.ParquetWriter(path, schema) as writer:
+            batch = []
+            for record in records:
+                batch.append(record)
+                if len(batch) == IMPORT_BATCH_SIZE:
+                    writer.write_table(pa.Table.from_pylist(batch, schema=schema))
+                    count += len(batch)
+                    batch = []
+            if batch or not count:
+                writer.write_table(pa.Table.from_pylist(batch, schema=schema))
+                count += len(batch)
+        archive.write(path, f'{kind}.parquet')
+    return count
+
+
+# Import
+def import_user(store, username, source, batch_size=IMPORT_BATCH_SIZE):
+    """Validate and insert records read from the binary file object source.
+
+    The format is detected from the content: a zip archive of CSV or
+    Parquet files, otherwise JSONL. Records are inserted in batches of
+    batch_size, one transaction each; a record whose id already exists
+    replaces it. Invalid records are skipped and reported.
+    Returns {'imported': {kind: count}, 'skipped': count, 'errors': [...]}.
+    """
+    summary = {'imported': dict.fromkeys(storage.KINDS, 0), 'skipped': 0, 'errors': []}
+    batches = {kind: [] for kind in storage.KINDS}
+
+    def flush(kind):
+        batch = batches[kind]
+        store.insert_records(kind, username, batch)
+        if kind == 'notes':
+            store.save_note_terms_many(username, [
+                (note['id'], note_term_frequencies(note['title'], note['content'])) for note in batch
+            ])
+        summary['imported'][kind] += len(batch)
+        batches[kind] = []
+
+    for location, kind, data in _read(source):
+        try:
+            if isinstance(data, InvalidRecord):
+                raise data
+            record = validate(kind, data)
+        except InvalidRecord as exc:
+            summary['skipped'] += 1
+            if len(summary['errors']) < MAX_REPORTED_ERRORS:
+                summary['errors'].append(f"{location}: {exc}")
+            continue
+        batches[kind].append(record)
+        if len(batches[kind]) >= batch_size:
+            flush(kind)
+    for kind in storage.KINDS:
+        if batches[kind]:
+            flush(kind)
+    return summary
+
+
+def _read(source):
+    """Yield (location, kind, data) for every record in source; data is an InvalidRecord when unreadable"""
+    if source.read(len(ZIP_MAGIC)) == ZIP_MAGIC:
+        source.seek(0)
+        yield from _read_archive(source)
+        return
+    source.seek(0)
+    yield from _read_jsonl(source)
+
+
+def _read_jsonl(source):
+    text = io.TextIOWrapper(source, encoding='utf-8')
+    try:
+        for number, line in enumerate(text, 1):
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                data = json.loads(line)
+            except ValueError as exc:
+                yield f"line {number}", None, InvalidRecord(f"not JSON: {exc}")
+                continue
+            if not isinstance(data, dict):
+                yield f"line {number}", None, InvalidRecord("not a JSON object")
+                continue
+            yield f"line {number}", data.pop('kind', None), data
+    finally:
+        # Leave the caller's file open
+        text.detach()
+
+
+def _read_archive(source):
+    with zipfile.ZipFile(source) as archive:
+        for name in archive.namelist():
+            kind, extension = os.path.splitext(os.path.basename(name))
+            if kind not in FIELDS:
+                continue
+            if extension == '.csv':
+                yield from _read_csv(archive, name, kind)
+            elif extension == '.parquet':
+                yield from _read_parquet(archive, name, kind)
+
+
+def _from_csv(name, value):
+    if name in BOOL_FIELDS:
+        flag = value.strip().lower()
+        if flag not in CSV_TRUE and flag not in CSV_FALSE:
+            raise ValueError(f"{name} must be true or false")
+        return flag in CSV_TRUE
+    if name in INT_FIELDS:
+        return int(value) if value.strip() else 0
+    if name in LIST_FIELDS:
+        return [day for day in value.split(';') if day]
+    if name in OPTIONAL_FIELDS and not value:
+        return None
+    return value
+
+
+def _read_csv(archive, name, kind):
+    with io.TextIOWrapper(archive.open(name), encoding='utf-8', newline='') as text:
+        for number, row in enumerate(csv.DictReader(text), 2):
+            try:
+                data = {column: _from_csv(column, value) for column, value in row.items()
+                        if column is not None and value is not None}
+            except ValueError as exc:
+                data = InvalidRecord(str(exc))
+            yield f"{name} row {number}", kind, data
+
+
+def _read_parquet(archive, name, kind):
+    _, pq = _pyarrow()
+    with tempfile.TemporaryDirectory() as tmp:
+        path = archive.extract(name, tmp)
+        row = 0
+        for batch in pq.ParquetFile(path).iter_batches(batch_size=IMPORT_BATCH_SIZE):
+            for data in batch.to_pylist():
+                row += 1
+                yield f"{name} row {row}", kind, data
+
+
+# Command line
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--backend', choices=['sqlite', 'eventlog', 'memory'], help="storage backend (default: sqlite)")
+    parser.add_argument('--db', help="SQLite database path")
+    commands = parser.add_subparsers(dest='command', required=True)
+    export = commands.add_parser('export', help="write a user's records to a file")
+    export.add_argument('username')
+    export.add_argument('path', help="output file, or - for stdout")
+    export.add_argument('--format', choices=FORMATS,
+                        help="defaults to csv for .zip paths and jsonl otherwise")
+    load = commands.add_parser('import', help="add records from a JSONL file or CSV/Parquet archive")
+    load.add_argument('username')
+    load.add_argument('path')
+    load.add_argument('--batch-size', type=int, default=IMPORT_BATCH_SIZE)
+    args = parser.parse_args()
+
+    store = storage.open_storage(args.backend, args.db)
+    try:
+        if store.get_user(args.username) is None:
+            parser.error(f"no such user: {args.username}")
+        if args.command == 'export':
+            fmt = args.format or ('csv' if args.path.endswith('.zip') else 'jsonl')
+            if args.path == '-':
+                counts = export_user(store, args.username, sys.stdout.buffer, fmt)
+            else:
+                with open(args.path, 'wb') as out:
+                    counts = export_user(store, args.username, out, fmt)
+            print("exported " + ", ".join(f"{n} {kind}" for kind, n in counts.items()), file=sys.stderr)
+        else:
+            with open(args.path, 'rb') as source:
+                summary = import_user(store, args.username, source, args.batch_size)
+            print("imported " + ", ".join(f"{n} {kind}" for kind, n in summary['imported'].items()),
+                  file=sys.stderr)
+            if summary['skipped']:
+                print(f"skipped {summary['skipped']} invalid records:", file=sys.stderr)
+                for error in summary['errors']:
+                    print(f"  {error}", file=sys.stderr)
+                sys.exit(1)
+    finally:
+        store.close()
+
+
+if __name__ == '__main__':
+    main()
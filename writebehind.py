@@ -0,0 +1,213 @@
+import atexit
+import os
+import sys
+import threading
+
+# Buffered writes are flushed at least this often, so a crash loses at most
+# this many seconds of clicks; 0 turns write-behind off
+FLUSH_INTERVAL_ENV = 'PRODUCTIVITY_HUB_FLUSH_SECONDS'
+DEFAULT_FLUSH_INTERVAL = 1.0
+
+# A user's buffer is flushed straight away once it holds this many writes
+MAX_PENDING_ENV = 'PRODUCTIVITY_HUB_FLUSH_MAX_PENDING'
+DEFAULT_MAX_PENDING = 256
+
+# After a failed flush the background flusher waits twice as long before
+# each retry, up to this many seconds, so a locked or full disk isn't
+# hammered; reads and full buffers still flush their user straight away
+MAX_RETRY_DELAY = 60
+
+
+def _merge(pending, operation):
+    """Fold a new write into the one already buffered for the same key; None cancels both"""
+    if pending is None:
+        return operation
+    method, args = operation
+    if method == 'delete_record':
+        # The record never reached storage, so there is nothing to delete
+        return None if pending[0] == 'insert_record' else operation
+    if method == 'update_record' and pending[0] == 'insert_record':
+        return 'insert_record', args
+    if method == 'add_rollup':
+        username, metric, day, amount = args
+        return method, (username, metric, day, pending[1][3] + amount)
+    return operation
+
+
+class WriteBehindStorage:
+    """Buffers a storage backend's single-record writes per user and flushes them in one transaction.
+
+    UserData already holds every change in memory, so pages read the
+    buffered state without touching storage. Reads that do go to storage
+    flush that user's buffer first. Repeated writes to one record are
+    coalesced: toggling a task five times writes it once, and a task added
+    and deleted before the flush is never written at all.
+    """
+
+    def __init__(self, backend, flush_interval=DEFAULT_FLUSH_INTERVAL, max_pending=DEFAULT_MAX_PENDING):
+        self.backend = backend
+        self.flush_interval = flush_interval
+        self.max_pending = max_pending
+        self._lock = threading.Lock()
+        # username -> {key: (backend method, args)} in first-write order
+        self._pending = {}
+        # One flush at a time per user keeps that user's batches in order
+        self._flush_locks = {}
+        self._closed = threading.Event()
+        self._flusher = threading.Thread(target=self._flush_loop, name='write-behind', daemon=True)
+        self._flusher.start()
+        atexit.register(self.close)
+
+    def _queue(self, username, key, method, *args):
+        with self._lock:
+            pending = self._pending.setdefault(username, {})
+            merged = _merge(pending.get(key), (method, args))
+            if merged is None:
+                del pending[key]
+            else:
+                pending[key] = merged
+            full = len(pending) >= self.max_pending
+        if full:
+            self.flush(username)
+
+    def _requeue(self, username, operations):
+        """Put a failed batch back in front of anything buffered since"""
+        with self._lock:
+            merged = dict(operations)
+            for key, operation in self._pending.get(username, {}).items():
+                operation = _merge(merged.get(key), operation)
+                if operation is None:
+                    merged.pop(key, None)
+                else:
+                    merged[key] = operation
+            self._pending[username] = merged
+
+    def flush(self, username=None):
+        """Write out one user's buffer, or everyone's.
+
+        A user whose batch fails keeps it buffered and the others are still
+        written; the first failure is raised once every user has been tried.
+        """
+        with self._lock:
+            usernames = [username] if username is not None else list(self._pending)
+        failure = None
+        for user in usernames:
+            with self._lock:
+                flush_lock = self._flush_locks.setdefault(user, threading.Lock())
+            with flush_lock:
+                with self._lock:
+                    operations = self._pending.pop(user, None)
+                if not operations:
+                    continue
+                try:
+                    self.backend.write_batch(list(operations.values()))
+                except Exception as exc:
+                    self._requeue(user, operations)
+                    failure = failure or exc
+                except BaseException:
+                    self._requeue(user, operations)
+                    raise
+        if failure is not None:
+            raise failure
+
+    def pending(self, username):
+        """Number of buffered writes for a user"""
+        with self._lock:
+            return len(self._pending.get(username, {}))
+
+    def _flush_loop(self):
+        delay = self.flush_interval
+        while not self._closed.wait(delay):
+            try:
+                self.flush()
+                delay = self.flush_interval
+            except Exception as exc:
+                # Left buffered; retried after the delay, or by the next read
+                delay = min(delay * 2, MAX_RETRY_DELAY)
+                with self._lock:
+                    buffered = sum(len(pending) for pending in self._pending.values())
+                print(f"Write-behind flush failed ({exc!r}); {buffered} writes still buffered, "
+                      f"retrying in {delay:g}s", file=sys.stderr)
+
+    # Reads see everything written before them
+    def get_user(self, username):
+        self.flush(username)
+        return self.backend.get_user(username)
+
+    def load_records(self, kind, username):
+        self.flush(username)
+        return self.backend.load_records(kind, username)
+
+    def iter_records(self, kind, username, *args, **kwargs):
+        self.flush(username)
+        return self.backend.iter_records(kind, username, *args, **kwargs)
+
+    def load_note_terms(self, username):
+        self.flush(username)
+        return self.backend.load_note_terms(username)
+
+    def load_rollups(self, username):
+        self.flush(username)
+        return self.backend.load_rollups(username)
+
+    # Buffered writes
+    def save_user(self, username, profile, preferences):
+        self._queue(username, ('user',), 'save_user', username, profile, preferences)
+
+    def insert_record(self, kind, username, record):
+        self._queue(username, (kind, record['id']), 'insert_record', kind, username, record)
+
+    def update_record(self, kind, username, record):
+        self._queue(username, (kind, record['id']), 'update_record', kind, username, record)
+
+    def delete_record(self, kind, username, record_id):
+        self._queue(username, (kind, record_id), 'delete_record', kind, username, record_id)
+
+    def save_note_terms(self, username, note_id, frequencies):
+        self._queue(username, ('note_terms', note_id), 'save_note_terms', username, note_id, frequencies)
+
+    def delete_note_terms(self, username, note_id):
+        self._queue(username, ('note_terms', note_id), 'delete_note_terms', username, note_id)
+
+    def add_rollup(self, username, metric, day, amount):
+        self._queue(username, ('rollup', metric, day), 'add_rollup', username, metric, day, amount)
+
+    # Bulk writes are already batched, so they go straight through
+    def insert_records(self, kind, username, records):
+        self.flush(username)
+        self.backend.insert_records(kind, username, records)
+
+    def save_note_terms_many(self, username, entries):
+        self.flush(username)
+        self.backend.save_note_terms_many(username, entries)
+
+    # Reminder claims must reach the shared backend at once to settle which process delivers
+    def load_fired_reminders(self, username):
+        return self.backend.load_fired_reminders(username)
+
+    def claim_reminder(self, username, task_id, kind, due, notification=None):
+        return self.backend.claim_reminder(username, task_id, kind, due, notification)
+
+    def pop_notifications(self, username):
+        return self.backend.pop_notifications(username)
+
+    def close(self):
+        if self._closed.is_set():
+            return
+        self._closed.set()
+        self._flusher.join()
+        try:
+            # Raises if anything can't be written, rather than dropping it quietly
+            self.flush()
+        finally:
+            self.backend.close()
+            atexit.unregister(self.close)
+
+
+def wrap(backend):
+    """Put backend behind a write-behind buffer configured from the environment, unless it's switched off"""
+    flush_interval = float(os.environ.get(FLUSH_INTERVAL_ENV, DEFAULT_FLUSH_INTERVAL))
+    if flush_interval <= 0:
+        return backend
+    max_pending = int(os.environ.get(MAX_PENDING_ENV, DEFAULT_MAX_PENDING))
+    return WriteBehindStorage(backend, flush_interval, max_pending)